@@ -0,0 +1,44 @@
+"""
+Add BackgroundJob table to the database
+Run this script to enable background jobs (organization/course deletion, bulk assignment, notification fan-out) on an existing database
+"""
+
+from app import app
+from models import db, BackgroundJob
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+def add_background_job_table():
+    """Add the BackgroundJob table to the database"""
+    with app.app_context():
+        try:
+            # Create the background_job table with its status/run_after index
+            BackgroundJob.__table__.create(db.engine, checkfirst=True)
+            
+            print("✅ BackgroundJob table added successfully!")
+            print("\nBackgroundJob table schema:")
+            print("- id (String, 32, Primary Key)")
+            print("- job_type (String, 50)")
+            print("- payload (Text, JSON)")
+            print("- status (queued, running, completed, failed)")
+            print("- attempts / max_attempts (Integer)")
+            print("- progress_current / progress_total / progress_message")
+            print("- result (Text, JSON) / error (Text)")
+            print("- requested_by (Foreign Key -> User, Optional)")
+            print("- run_after, locked_by, heartbeat_at")
+            print("- created_at / started_at / finished_at (DateTime)")
+            
+            print("\nJobs run in each web process by default; set JOB_WORKER_IN_PROCESS=false")
+            print("and run 'python job_worker.py' to run them in a dedicated process instead.")
+            
+        except Exception as e:
+            print(f"❌ Error adding background job table: {str(e)}")
+            print(f"Error details: {type(e).__name__}")
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    print("Adding BackgroundJob table to database...")
+    add_background_job_table()
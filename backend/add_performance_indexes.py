@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Script to add composite indexes on the columns the API filters and sorts on.
+New databases get them from models.py via db.create_all(); this adds them to
+existing databases. Safe to run more than once (CREATE INDEX IF NOT EXISTS).
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY so tables
+stay writable while they build. Duplicate course_progress rows (same user and
+course) are removed before the unique index is created, keeping the most
+advanced row, and the progress rollup is rebuilt if any were removed.
+"""
+
+from app import app
+from models import db
+from sqlalchemy import text
+from progress_rollup import rebuild_progress_rollup
+
+# (index name, table, columns, unique)
+PERFORMANCE_INDEXES = [
+    ('uq_course_progress_user_course', 'course_progress', ('user_id', 'course_id'), True),
+    ('ix_notification_recipient_unread_created', 'notification', ('recipient_id', 'is_read', 'created_at'), False),
+    ('ix_user_org_role', 'user', ('org_id', 'role'), False),
+    ('ix_quiz_attempt_user_content', 'quiz_attempt', ('user_id', 'quiz_content_id'), False),
+    ('ix_simulation_attempt_user_simulation', 'simulation_attempt', ('user_id', 'simulation_id', 'attempt_number'), False),
+    ('ix_audit_log_timestamp', 'audit_log', ('timestamp',), False),
+    ('ix_module_content_module_order', 'module_content', ('module_id', 'order'), False),
+    ('ix_module_course_order', 'module', ('course_id', 'order'), False),
+]
+
+
+def create_index_sql(name, table, columns, unique, concurrently=False):
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    return (f'CREATE {"UNIQUE " if unique else ""}INDEX {"CONCURRENTLY " if concurrently else ""}'
+            f'IF NOT EXISTS {name} ON "{table}" ({column_list})')
+
+
+def remove_duplicate_course_progress():
+    """Delete all but the most advanced progress row per user and course. Returns the number removed."""
+    result = db.session.execute(text("""
+        DELETE FROM course_progress WHERE id IN (
+            SELECT cp.id FROM course_progress cp
+            WHERE EXISTS (
+                SELECT 1 FROM course_progress other
+                WHERE other.user_id = cp.user_id
+                  AND other.course_id = cp.course_id
+                  AND (COALESCE(other.progress_percentage, 0) > COALESCE(cp.progress_percentage, 0)
+                       OR (COALESCE(other.progress_percentage, 0) = COALESCE(cp.progress_percentage, 0)
+                           AND other.id > cp.id))
+            )
+        )
+    """))
+    db.session.commit()
+    return result.rowcount
+
+
+def add_performance_indexes():
+    """Create the missing performance indexes"""
+
+    with app.app_context():
+        print("🔧 Adding performance indexes...")
+        concurrently = db.engine.dialect.name == 'postgresql'
+
+        try:
+            removed = remove_duplicate_course_progress()
+            if removed:
+                print(f"Removed {removed} duplicate course_progress rows, rebuilding progress rollup...")
+                rebuild_progress_rollup()
+
+            # CONCURRENTLY cannot run inside a transaction block
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                for name, table, columns, unique in PERFORMANCE_INDEXES:
+                    print(f"Creating {name} on {table} ({', '.join(columns)})...")
+                    connection.execute(text(create_index_sql(name, table, columns, unique, concurrently)))
+                if concurrently:
+                    connection.execute(text("ANALYZE"))
+
+            print("✅ All performance indexes are in place!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error adding indexes: {str(e)}")
+            if concurrently:
+                print("A failed concurrent build leaves an INVALID index; drop it and run this script again.")
+            raise
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Performance Index Migration Script")
+    print("=" * 60)
+    add_performance_indexes()
+    print("\n🎉 Database migration completed!")
@@ -0,0 +1,41 @@
+"""
+Add RevokedToken table to the database
+Run this script to enable token revocation (logout, password changes) on an existing database
+"""
+
+from app import app
+from models import db, RevokedToken
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+def add_token_revocation_table():
+    """Add the RevokedToken table to the database"""
+    with app.app_context():
+        try:
+            # Create the revoked_token table
+            RevokedToken.__table__.create(db.engine, checkfirst=True)
+            
+            print("✅ RevokedToken table added successfully!")
+            print("\nRevokedToken table schema:")
+            print("- id (Primary Key)")
+            print("- jti (String, 64, Unique, Optional) - one revoked token")
+            print("- user_id (Foreign Key -> User, Optional)")
+            print("- revoked_before (DateTime, Optional) - all tokens of user_id issued earlier")
+            print("- reason (String, 50, Optional)")
+            print("- expires_at (DateTime) - row is pruned after this")
+            print("- created_at (DateTime)")
+            
+            print("\nTokens issued before this change carry no jti; they can only be")
+            print("revoked per user (password change or reset) until they expire.")
+            
+        except Exception as e:
+            print(f"❌ Error adding token revocation table: {str(e)}")
+            print(f"Error details: {type(e).__name__}")
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    print("Adding RevokedToken table to database...")
+    add_token_revocation_table()
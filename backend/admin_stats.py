@@ -1,6 +1,8 @@
-from models import db, User, Organization, Course, Module, CourseProgress, QuizAttempt
-from sqlalchemy import func, extract, and_, case
+from models import db, User, Organization, Course, Module, CourseProgress, QuizAttempt, OrganizationCourseProgress
+from progress_rollup import ensure_progress_rollup
+from sqlalchemy import func, extract
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 from flask import Blueprint, jsonify
 import json
 
@@ -16,36 +18,48 @@ def get_organization_stats():
         orgs = Organization.query.all()
         print(f"Found {len(orgs)} organizations")
 
-        # Query to get organization stats
-        org_stats = db.session.query(
-            Organization.id,
-            Organization.name,
-            Organization.status,
-            Organization.created,
-            func.count(func.distinct(User.id)).label('total_employees'),
-            func.count(func.distinct(CourseProgress.id)).label('total_completions'),
-            func.avg(CourseProgress.risk_score).label('avg_risk_score'),
-            func.count(func.distinct(case((CourseProgress.progress_percentage == 100, CourseProgress.id))))
-                .label('courses_completed'),
-            func.count(func.distinct(case(
-                (and_(CourseProgress.progress_percentage < 100, CourseProgress.progress_percentage > 0),
-                    CourseProgress.id)
-            ))).label('in_progress_courses'),
-            func.count(func.distinct(case((CourseProgress.risk_score >= 8, CourseProgress.id))))
-                .label('high_risk_count'),
-            func.count(func.distinct(case(
-                (and_(CourseProgress.risk_score >= 5, CourseProgress.risk_score < 8),
-                    CourseProgress.id)
-            ))).label('medium_risk_count'),
-            func.count(func.distinct(case((CourseProgress.risk_score < 5, CourseProgress.id))))
-                .label('low_risk_count')
-        ).outerjoin(
-            User, User.org_id == Organization.id
-        ).outerjoin(
-            CourseProgress, CourseProgress.user_id == User.id
-        ).group_by(
-            Organization.id, Organization.name, Organization.status, Organization.created
-        ).all()
+        # Employee counts per organization
+        employee_counts = dict(db.session.query(
+            User.org_id, func.count(User.id)
+        ).filter(User.org_id.isnot(None)).group_by(User.org_id).all())
+
+        # Progress totals per organization from the organization x course rollup
+        ensure_progress_rollup()
+        rollup_totals = {
+            row.org_id: row
+            for row in db.session.query(
+                OrganizationCourseProgress.org_id,
+                func.sum(OrganizationCourseProgress.enrolled_count).label('total_completions'),
+                func.sum(OrganizationCourseProgress.completed_count).label('courses_completed'),
+                func.sum(OrganizationCourseProgress.in_progress_count).label('in_progress_courses'),
+                func.sum(OrganizationCourseProgress.risk_score_sum).label('risk_score_sum'),
+                func.sum(OrganizationCourseProgress.high_risk_count).label('high_risk_count'),
+                func.sum(OrganizationCourseProgress.medium_risk_count).label('medium_risk_count'),
+                func.sum(OrganizationCourseProgress.low_risk_count).label('low_risk_count')
+            ).filter(
+                OrganizationCourseProgress.org_id.isnot(None)
+            ).group_by(OrganizationCourseProgress.org_id).all()
+        }
+
+        org_stats = []
+        for org in orgs:
+            totals = rollup_totals.get(org.id)
+            scored_rows = sum(int(getattr(totals, column) or 0) for column in
+                              ('high_risk_count', 'medium_risk_count', 'low_risk_count')) if totals else 0
+            org_stats.append(SimpleNamespace(
+                id=org.id,
+                name=org.name,
+                status=org.status,
+                created=org.created,
+                total_employees=employee_counts.get(org.id, 0),
+                total_completions=int(totals.total_completions or 0) if totals else 0,
+                avg_risk_score=(int(totals.risk_score_sum or 0) / scored_rows) if scored_rows else 0,
+                courses_completed=int(totals.courses_completed or 0) if totals else 0,
+                in_progress_courses=int(totals.in_progress_courses or 0) if totals else 0,
+                high_risk_count=int(totals.high_risk_count or 0) if totals else 0,
+                medium_risk_count=int(totals.medium_risk_count or 0) if totals else 0,
+                low_risk_count=int(totals.low_risk_count or 0) if totals else 0
+            ))
         
         print(f"Query executed, found {len(org_stats)} results")
 
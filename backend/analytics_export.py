@@ -0,0 +1,419 @@
+"""
+Streaming analytics exports.
+
+Rows are read with a server-side cursor (yield_per) and written out one
+chunk at a time, so an export uses the same memory for a thousand rows as for
+ten million. Exports are either streamed straight into a chunked HTTP
+response or, for the dashboard, generated by a background thread into
+ANALYTICS_EXPORT_DIR and fetched from /api/analytics/download/<filename>.
+
+Formats:
+    csv      always available
+    parquet  columnar, one row group per chunk (requires the optional ``pyarrow`` package)
+    arrow    Arrow IPC stream (requires ``pyarrow``)
+
+While a background export runs its file carries a .part suffix; a failed
+export leaves a .error file with the message. Finished files are removed after
+ANALYTICS_EXPORT_RETENTION_HOURS.
+
+Configuration (environment variables):
+    ANALYTICS_EXPORT_DIR               where background exports are written
+                                       (default: analytics-exports in the system temp directory)
+    ANALYTICS_EXPORT_CHUNK_SIZE        rows fetched and written per chunk (default 5000)
+    ANALYTICS_EXPORT_WORKERS           background export threads (default 2)
+    ANALYTICS_EXPORT_RETENTION_HOURS   hours finished exports are kept (default 24)
+"""
+
+import csv
+import datetime
+import io
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, Response, current_app, jsonify, request, send_from_directory, stream_with_context
+from sqlalchemy import select
+from werkzeug.utils import secure_filename
+from models import db, User, Organization, Course, CourseProgress, QuizAttempt, SimulationAttempt, AuditLog
+from auth_middleware import admin_required
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency: CSV exports only
+    pa = None
+    pq = None
+
+# Outside the source tree, so exports never end up in commits or container images
+EXPORT_DIR = os.getenv('ANALYTICS_EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'analytics-exports'))
+EXPORT_CHUNK_SIZE = int(os.getenv('ANALYTICS_EXPORT_CHUNK_SIZE', 5000))
+EXPORT_RETENTION_HOURS = float(os.getenv('ANALYTICS_EXPORT_RETENTION_HOURS', 24))
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+# Export dataset behind each analytics dashboard tab
+TAB_DATASETS = {
+    'overview': 'course_progress',
+    'users': 'course_progress',
+    'courses': 'course_progress',
+    'organizations': 'course_progress',
+    'learning': 'quiz_attempts',
+    'compliance': 'course_progress',
+    'system': 'audit_log'
+}
+
+# Dashboard tabs without an exportable dataset, with the reason given to the client
+UNEXPORTABLE_TABS = {
+    'financial': 'The financial tab shows placeholder data only and cannot be exported'
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+analytics_export_bp = Blueprint('analytics_export', __name__)
+
+
+class ExportError(Exception):
+    """Invalid export request"""
+
+
+# Column definitions: (name, column expression, type) with type one of int, float, str, datetime
+def _course_progress_dataset():
+    columns = [
+        ('id', CourseProgress.id, 'int'),
+        ('user_id', CourseProgress.user_id, 'int'),
+        ('username', User.username, 'str'),
+        ('organization_id', User.org_id, 'int'),
+        ('organization', Organization.name, 'str'),
+        ('course_id', CourseProgress.course_id, 'int'),
+        ('course', Course.title, 'str'),
+        ('progress_percentage', CourseProgress.progress_percentage, 'float'),
+        ('completed_modules', CourseProgress.completed_modules, 'int'),
+        ('total_modules', CourseProgress.total_modules, 'int'),
+        ('risk_score', CourseProgress.risk_score, 'int'),
+        ('last_activity', CourseProgress.last_activity, 'datetime'),
+        ('completion_date', CourseProgress.completion_date, 'datetime'),
+    ]
+    statement = select(*[column for _, column, _ in columns]) \
+        .join(User, User.id == CourseProgress.user_id) \
+        .outerjoin(Organization, Organization.id == User.org_id) \
+        .join(Course, Course.id == CourseProgress.course_id) \
+        .order_by(CourseProgress.id)
+    return columns, statement, CourseProgress.last_activity
+
+
+def _quiz_attempts_dataset():
+    columns = [
+        ('id', QuizAttempt.id, 'int'),
+        ('user_id', QuizAttempt.user_id, 'int'),
+        ('username', User.username, 'str'),
+        ('organization_id', User.org_id, 'int'),
+        ('quiz_content_id', QuizAttempt.quiz_content_id, 'int'),
+        ('attempt_number', QuizAttempt.attempt_number, 'int'),
+        ('score', QuizAttempt.score, 'float'),
+        ('correct_answers', QuizAttempt.correct_answers, 'int'),
+        ('total_questions', QuizAttempt.total_questions, 'int'),
+        ('time_taken_minutes', QuizAttempt.time_taken_minutes, 'int'),
+        ('started_at', QuizAttempt.started_at, 'datetime'),
+        ('completed_at', QuizAttempt.completed_at, 'datetime'),
+    ]
+    statement = select(*[column for _, column, _ in columns]) \
+        .join(User, User.id == QuizAttempt.user_id) \
+        .order_by(QuizAttempt.id)
+    return columns, statement, QuizAttempt.started_at
+
+
+def _simulation_attempts_dataset():
+    columns = [
+        ('id', SimulationAttempt.id, 'int'),
+        ('user_id', SimulationAttempt.user_id, 'int'),
+        ('username', User.username, 'str'),
+        ('organization_id', User.org_id, 'int'),
+        ('simulation_id', SimulationAttempt.simulation_id, 'int'),
+        ('attempt_number', SimulationAttempt.attempt_number, 'int'),
+        ('score', SimulationAttempt.score, 'float'),
+        ('completed_steps', SimulationAttempt.completed_steps, 'int'),
+        ('total_steps', SimulationAttempt.total_steps, 'int'),
+        ('time_taken_minutes', SimulationAttempt.time_taken_minutes, 'int'),
+        ('started_at', SimulationAttempt.started_at, 'datetime'),
+        ('completed_at', SimulationAttempt.completed_at, 'datetime'),
+    ]
+    statement = select(*[column for _, column, _ in columns]) \
+        .join(User, User.id == SimulationAttempt.user_id) \
+        .order_by(SimulationAttempt.id)
+    return columns, statement, SimulationAttempt.started_at
+
+
+def _audit_log_dataset():
+    columns = [
+        ('id', AuditLog.id, 'int'),
+        ('user_id', AuditLog.user_id, 'int'),
+        ('username', User.username, 'str'),
+        ('organization_id', User.org_id, 'int'),
+        ('action', AuditLog.action, 'str'),
+        ('resource_type', AuditLog.resource_type, 'str'),
+        ('resource_id', AuditLog.resource_id, 'int'),
+        ('details', AuditLog.details, 'str'),
+        ('ip_address', AuditLog.ip_address, 'str'),
+        ('timestamp', AuditLog.timestamp, 'datetime'),
+    ]
+    statement = select(*[column for _, column, _ in columns]) \
+        .outerjoin(User, User.id == AuditLog.user_id) \
+        .order_by(AuditLog.id)
+    return columns, statement, AuditLog.timestamp
+
+
+DATASETS = {
+    'course_progress': _course_progress_dataset,
+    'quiz_attempts': _quiz_attempts_dataset,
+    'simulation_attempts': _simulation_attempts_dataset,
+    'audit_log': _audit_log_dataset
+}
+
+
+def available_formats():
+    return ['csv', 'parquet', 'arrow'] if pa is not None else ['csv']
+
+
+def validate_export(dataset, format_type):
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown dataset '{dataset}'. Available: {', '.join(DATASETS)}")
+    if format_type not in available_formats():
+        raise ExportError(f"Unsupported format '{format_type}'. Available: {', '.join(available_formats())}")
+
+
+def iter_row_chunks(dataset, organization_id=None, since=None):
+    """Yield the rows of a dataset in chunks read through a server-side cursor."""
+    _, statement, time_column = DATASETS[dataset]()
+    if organization_id is not None:
+        statement = statement.where(User.org_id == organization_id)
+    if since is not None:
+        statement = statement.where(time_column >= since)
+    result = db.session.execute(statement.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+def _write_csv(columns, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _, _ in columns])
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue().encode('utf-8')
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only file object whose written bytes are drained after every chunk."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_ARROW_TYPES = {
+    'int': lambda: pa.int64(),
+    'float': lambda: pa.float64(),
+    'str': lambda: pa.string(),
+    'datetime': lambda: pa.timestamp('us')
+}
+
+
+def _arrow_batch(schema, rows):
+    values = list(zip(*rows)) if rows else [()] * len(schema)
+    return pa.record_batch([pa.array(column_values, type=field.type)
+                            for column_values, field in zip(values, schema)], schema=schema)
+
+
+def _write_arrow(columns, chunks, format_type):
+    schema = pa.schema([(name, _ARROW_TYPES[type_name]()) for name, _, type_name in columns])
+    sink = _StreamSink()
+    output = pa.PythonFile(sink, mode='w')
+    writer = pq.ParquetWriter(output, schema) if format_type == 'parquet' else pa.ipc.new_stream(output, schema)
+    try:
+        for rows in chunks:
+            batch = _arrow_batch(schema, rows)
+            if format_type == 'parquet':
+                writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def generate_export(dataset, format_type, organization_id=None, since=None):
+    """Yield the encoded export file in chunks."""
+    columns = DATASETS[dataset]()[0]
+    chunks = iter_row_chunks(dataset, organization_id, since)
+    if format_type == 'csv':
+        return _write_csv(columns, chunks)
+    return _write_arrow(columns, chunks, format_type)
+
+
+def _export_path(filename):
+    return os.path.join(EXPORT_DIR, filename)
+
+
+def _prune_old_exports():
+    cutoff = time.time() - EXPORT_RETENTION_HOURS * 3600
+    for name in os.listdir(EXPORT_DIR):
+        path = _export_path(name)
+        if not name.endswith('.part') and os.path.getmtime(path) < cutoff:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv('ANALYTICS_EXPORT_WORKERS', 2)),
+                thread_name_prefix='analytics-export'
+            )
+        return _executor
+
+
+def _run_export_job(app, filename, dataset, format_type, organization_id, since):
+    path = _export_path(filename)
+    with app.app_context():
+        try:
+            with open(path + '.part', 'wb') as f:
+                for data in generate_export(dataset, format_type, organization_id, since):
+                    f.write(data)
+            os.replace(path + '.part', path)
+        except Exception as e:
+            print(f"Analytics export {filename} failed: {str(e)}")
+            with open(path + '.error', 'w') as f:
+                f.write(str(e))
+            if os.path.exists(path + '.part'):
+                os.remove(path + '.part')
+        finally:
+            db.session.remove()
+
+
+def submit_export_job(app, dataset, format_type, organization_id=None, since=None):
+    """Start a background export and return the filename it will be downloadable as."""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _prune_old_exports()
+    timestamp = datetime.datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    filename = f"analytics_{dataset}_{timestamp}_{uuid.uuid4().hex[:8]}.{format_type}"
+    # Mark the export as pending before returning so the download URL never 404s
+    open(_export_path(filename) + '.part', 'wb').close()
+    _get_executor().submit(_run_export_job, app, filename, dataset, format_type, organization_id, since)
+    return filename
+
+
+def _export_arguments(values):
+    organization_id = values.get('organization_id')
+    since = values.get('since')
+    try:
+        organization_id = int(organization_id) if organization_id not in (None, '') else None
+        since = datetime.datetime.fromisoformat(since) if since else None
+    except (TypeError, ValueError):
+        raise ExportError('organization_id must be an integer and since an ISO date')
+    return organization_id, since
+
+
+@analytics_export_bp.route('/api/analytics/export/<dataset>', methods=['GET'])
+@admin_required
+def stream_analytics_export(dataset):
+    """Stream an export as a chunked response.
+
+    Query parameters: format (csv, parquet, arrow), organization_id, since (ISO date)
+    """
+    try:
+        format_type = request.args.get('format', 'csv')
+        validate_export(dataset, format_type)
+        organization_id, since = _export_arguments(request.args)
+    except ExportError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    timestamp = datetime.datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    return Response(
+        stream_with_context(generate_export(dataset, format_type, organization_id, since)),
+        mimetype=CONTENT_TYPES[format_type],
+        headers={'Content-Disposition': f'attachment; filename=analytics_{dataset}_{timestamp}.{format_type}'}
+    )
+
+
+@analytics_export_bp.route('/api/analytics/export', methods=['POST'])
+@admin_required
+def export_analytics():
+    """Generate an export in the background and return its download URL
+
+    Body: type (dataset or dashboard tab), format, organization_id, since
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        export_type = data.get('type', 'overview')
+        if export_type in UNEXPORTABLE_TABS:
+            raise ExportError(UNEXPORTABLE_TABS[export_type])
+        dataset = TAB_DATASETS.get(export_type, export_type)
+        format_type = data.get('format', 'csv')
+        validate_export(dataset, format_type)
+        organization_id, since = _export_arguments(data)
+
+        filename = submit_export_job(current_app._get_current_object(), dataset, format_type, organization_id, since)
+        return jsonify({
+            'success': True,
+            'message': f'Analytics export started: {filename}',
+            'filename': filename,
+            'download_url': f'/api/analytics/download/{filename}'
+        }), 202
+
+    except ExportError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@analytics_export_bp.route('/api/analytics/download/<filename>', methods=['GET'])
+@admin_required
+def download_analytics_export(filename):
+    """Download a background export; 202 while it is still being generated"""
+    if secure_filename(filename) != filename:
+        return jsonify({'success': False, 'error': 'Invalid filename'}), 400
+    path = _export_path(filename)
+    if os.path.exists(path):
+        extension = filename.rsplit('.', 1)[-1]
+        return send_from_directory(EXPORT_DIR, filename, as_attachment=True,
+                                   mimetype=CONTENT_TYPES.get(extension, 'application/octet-stream'))
+    if os.path.exists(path + '.part'):
+        return jsonify({'success': True, 'status': 'pending', 'message': 'Export is still being generated'}), 202
+    if os.path.exists(path + '.error'):
+        with open(path + '.error') as f:
+            return jsonify({'success': False, 'status': 'failed', 'error': f.read()}), 500
+    return jsonify({'success': False, 'error': 'Export not found'}), 404
@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request, send_from_directory, send_file
+from flask import Flask, jsonify, request, send_from_directory, send_file, abort
 from flask_cors import CORS
 from flask_mail import Mail, Message
 from dotenv import load_dotenv
@@ -7,11 +7,11 @@ import string
 import secrets
 import subprocess
 import json
-import bcrypt
 import jwt
 import datetime
+import time
 from sqlalchemy import extract, func, case, text
-from models import db, User, Organization, Course, Module, ModuleContent, QuizQuestion, QuizOption, Task, organization_courses, CourseRequest, CourseProgress, SystemSettings, AuditLog, EmailTemplate, SystemAnnouncement, UserSession, PageView, QuizAttempt, ContentInteraction, CourseEnrollment, SystemMetrics, EmailMetrics, FeatureUsage, APIUsage, Simulation, SimulationScenario, SimulationStep, SimulationAttempt, Notification
+from models import db, User, Organization, Course, Module, ModuleContent, QuizQuestion, QuizOption, Task, organization_courses, CourseRequest, CourseProgress, SystemSettings, AuditLog, EmailTemplate, SystemAnnouncement, UserSession, PageView, QuizAttempt, ContentInteraction, CourseEnrollment, SystemMetrics, EmailMetrics, FeatureUsage, APIUsage, Simulation, SimulationScenario, SimulationStep, SimulationAttempt, Notification, OrganizationCourseProgress, user_courses
 
 # Load environment variables from .env file
 load_dotenv()
@@ -21,8 +21,11 @@ from auth_middleware import (
     generate_tokens, decode_token, token_required, role_required, 
     admin_required, portal_admin_required, employee_required,
     admin_or_portal_admin_required, validate_organization_access,
-    optional_token, AuthError, JWT_SECRET_KEY
+    optional_token, AuthError, JWT_SECRET_KEY, JWT_REFRESH_TOKEN_EXPIRES
 )
+from token_revocation import revoke_token, revoke_user_tokens
+from password_hashing import (hash_password, verify_password, timed_verify_password, needs_rehash,
+                              rehash_in_background, PasswordHasherBusy)
 
 
 app = Flask(__name__)
@@ -87,6 +90,15 @@ def check_file_exists():
     response.headers['Access-Control-Allow-Origin'] = '*'
     return response
 
+from organization_statistics import get_organization_statistics
+from progress_rollup import progress_snapshot, record_progress_change, ensure_progress_rollup
+from response_cache import analytics_cache
+from course_tree import load_course_tree, load_course_trees, count_quiz_questions
+from query_instrumentation import init_query_instrumentation
+from quiz_grading import get_quiz_content, is_course_assigned, load_quiz_questions, grade_quiz, record_quiz_attempt, answer_key_cache
+from progress_events import publish_progress_event
+from course_assignment import assign_course_to_org_employees, get_course_assignment_flags, get_course_assignment_matrix
+
 # Register blueprints
 from mark_course_complete import bp as mark_course_complete_bp
 from admin_stats import bp as admin_stats_bp
@@ -95,6 +107,10 @@ from simulation_module import simulation_bp
 from portal_admin_dashboard import portal_admin_dashboard_bp
 from certificate_module import certificate_bp
 from notification_module import notification_bp
+from analytics_export import analytics_export_bp
+from job_queue import init_job_queue, job_handler, enqueue_job
+from email_queue import mail_queue, queue_email
+from employee_import import import_employees
 
 app.register_blueprint(mark_course_complete_bp)
 app.register_blueprint(admin_stats_bp)
@@ -103,30 +119,8 @@ app.register_blueprint(simulation_bp)
 app.register_blueprint(portal_admin_dashboard_bp)
 app.register_blueprint(certificate_bp)
 app.register_blueprint(notification_bp)
-
-def verify_password(stored_password, provided_password):
-    """Verify a stored password against provided password."""
-    try:
-        # Check if stored_password is already bytes (shouldn't need encoding)
-        if isinstance(stored_password, bytes):
-            hashed = stored_password
-        else:
-            # If it's a string, encode it
-            hashed = stored_password.encode('utf-8')
-            
-        # Always encode the provided password
-        password = provided_password.encode('utf-8')
-        
-        # Use bcrypt to check
-        return bcrypt.checkpw(password, hashed)
-    except Exception as e:
-        print(f"Password verification error: {str(e)}")
-        # In case of error, fall back to string comparison for development
-        return stored_password == provided_password
-
-def hash_password(password):
-    """Hash a password for storing."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+app.register_blueprint(analytics_export_bp)
+init_job_queue(app)
 
 # Assign a course to all employees in an organization
 @app.route('/api/portal_admin/assign_course_to_all', methods=['POST'])
@@ -155,25 +149,28 @@ def assign_course_to_all_employees():
         if not course:
             return jsonify({'error': 'Course not found'}), 404
 
-        # Get all employees in this organization
-        employees = User.query.filter_by(org_id=organization.id, role='employee').all()
-        assigned_count = 0
-        for employee in employees:
-            if course not in employee.courses:
-                employee.courses.append(course)
-                assigned_count += 1
-
-        db.session.commit()
+        job_id = enqueue_job('assign_course_to_org',
+                             {'org_id': organization.id, 'course_id': course.id},
+                             requested_by=user.id)
 
         return jsonify({
             'success': True,
-            'message': f'Course "{course.title}" assigned to {assigned_count} employees in {organization.name}',
-            'assigned_count': assigned_count
-        }), 200
+            'message': f'Assigning course "{course.title}" to all employees in {organization.name}',
+            'job_id': job_id,
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to assign course to all: {str(e)}'}), 500
 
+@job_handler('assign_course_to_org')
+def assign_course_to_org_job(payload, job):
+    """Insert the missing assignments of a course for an organization's employees in one statement"""
+    assigned_count, employee_count = assign_course_to_org_employees(payload['org_id'], payload['course_id'])
+    db.session.commit()
+    job.progress(employee_count, employee_count)
+    return {'assigned_count': assigned_count, 'already_assigned_count': employee_count - assigned_count}
+
 # --- Portal Admin: Unassign Course from Employee ---
 @app.route('/api/portal_admin/unassign_course_from_employee', methods=['POST'])
 def unassign_course_from_employee():
@@ -279,6 +276,7 @@ cors_origins = [origin.strip() for origin in cors_origins]
 # Initialize extensions
 db.init_app(app)
 mail = Mail(app)
+mail_queue.init_app(app, mail)
 
 # Initialize CORS with configuration
 if cors_origins and cors_origins != ['*']:
@@ -288,6 +286,9 @@ else:
     print("CORS configured to allow all origins (*)")
     CORS(app)
 
+# Opt-in per-request SQL query counting and N+1 detection (SQL_INSTRUMENTATION=true)
+init_query_instrumentation(app)
+
 # Function to serve files with proper headers
 def serve_file_with_headers(filename, uploads_dir):
     """Helper function to serve files with proper headers"""
@@ -405,20 +406,8 @@ def get_course_assignments(course_id):
         if not course:
             return jsonify({'success': False, 'error': 'Course not found'}), 404
 
-        # Get all employees in org
-        employees = User.query.filter_by(org_id=org_id, role='employee').all()
-
-        # For each employee, check if course is in their courses
-        employee_assignments = []
-        for emp in employees:
-            is_assigned = course in emp.courses
-            employee_assignments.append({
-                'id': emp.id,
-                'username': emp.username,
-                'email': emp.email,
-                'designation': emp.designation,
-                'is_assigned': is_assigned
-            })
+        # Employees with their assignment flag from one outer join
+        employee_assignments = get_course_assignment_flags(org_id, course_id)
 
         return jsonify({
             'success': True,
@@ -436,6 +425,44 @@ def get_course_assignments(course_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/portal_admin/course_assignments', methods=['GET'])
+def get_course_assignment_grid():
+    """Return the employee x course assignment matrix of an organization in columnar form.
+
+    Query params:
+        organization_id: required
+        course_ids: optional comma separated course ids (defaults to the organization's courses)
+    """
+    try:
+        org_id = request.args.get('organization_id', type=int)
+        if not org_id:
+            return jsonify({'success': False, 'error': 'organization_id is required'}), 400
+
+        organization = db.session.get(Organization, org_id)
+        if not organization:
+            return jsonify({'success': False, 'error': 'Organization not found'}), 404
+
+        course_ids = None
+        course_ids_param = request.args.get('course_ids')
+        if course_ids_param:
+            try:
+                course_ids = [int(value) for value in course_ids_param.split(',') if value.strip()]
+            except ValueError:
+                return jsonify({'success': False, 'error': 'course_ids must be comma separated integers'}), 400
+
+        matrix = get_course_assignment_matrix(org_id, course_ids)
+        return jsonify({
+            'success': True,
+            'organization': {
+                'id': organization.id,
+                'name': organization.name
+            },
+            **matrix
+        }), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 import jwt
 import datetime
 import secrets
@@ -600,69 +627,92 @@ def assign_courses_to_organization(org_id):
 def delete_organization(org_id):
     try:
         org = Organization.query.get_or_404(org_id)
-        
-        # Get all users in this organization before deletion
-        users_to_delete = User.query.filter_by(org_id=org_id).all()
-        user_ids = [user.id for user in users_to_delete]
-        
-        # Delete all content interactions for users in this organization
-        if user_ids:
-            ContentInteraction.query.filter(ContentInteraction.user_id.in_(user_ids)).delete(synchronize_session=False)
-            db.session.flush()
-        
-        # Delete all quiz attempts for users in this organization
-        if user_ids:
-            QuizAttempt.query.filter(QuizAttempt.user_id.in_(user_ids)).delete(synchronize_session=False)
-            db.session.flush()
-        
-        # Delete all user sessions for users in this organization
-        if user_ids:
-            UserSession.query.filter(UserSession.user_id.in_(user_ids)).delete(synchronize_session=False)
-            db.session.flush()
-        
-        # Delete all page views for users in this organization
-        if user_ids:
-            PageView.query.filter(PageView.user_id.in_(user_ids)).delete(synchronize_session=False)
-            db.session.flush()
-        
-        # Delete all course progress records for users in this organization
-        if user_ids:
-            CourseProgress.query.filter(CourseProgress.user_id.in_(user_ids)).delete(synchronize_session=False)
-            db.session.flush()
-        
-        employees = User.query.filter_by(org_id=org_id, role='employee').all()
-        for employee in employees:
-            employee.courses.clear()
-        db.session.flush()
-        
-        # Delete all course requests associated with this organization
-        course_requests_to_delete = CourseRequest.query.filter_by(organization_id=org_id).all()
-        for request in course_requests_to_delete:
-            db.session.delete(request)
-        db.session.flush()
-        
-        # Remove all course assignments from the organization
-        org.courses.clear()
-        db.session.flush()
-        
-        # Delete all users associated with this organization
-        for user in users_to_delete:
-            db.session.delete(user)
-        db.session.flush()  # Ensure users are deleted before deleting org
-        
-        # Finally, delete the organization
-        db.session.delete(org)
-        db.session.commit()
+        job_id = enqueue_job('delete_organization', {'org_id': org_id})
         
         return jsonify({
             "success": True, 
-            "message": f"Organization, {len(users_to_delete)} user(s), and {len(course_requests_to_delete)} course request(s) deleted successfully"
-        })
+            "message": f"Deleting organization {org.name} and its users",
+            "job_id": job_id,
+            "status_url": f"/api/jobs/{job_id}"
+        }), 202
         
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "message": f"Failed to delete organization: {str(e)}"}), 500
 
+@job_handler('delete_organization')
+def delete_organization_job(payload, job):
+    """Delete an organization with its users and their activity"""
+    org_id = payload['org_id']
+    org = db.session.get(Organization, org_id)
+    if not org:
+        # Already deleted by an earlier attempt
+        return {'users_deleted': 0, 'course_requests_deleted': 0}
+    
+    # Get all users in this organization before deletion
+    users_to_delete = User.query.filter_by(org_id=org_id).all()
+    user_ids = [user.id for user in users_to_delete]
+    job.progress(0, 4, f'Deleting activity of {len(user_ids)} user(s)')
+    
+    # Delete all content interactions for users in this organization
+    if user_ids:
+        ContentInteraction.query.filter(ContentInteraction.user_id.in_(user_ids)).delete(synchronize_session=False)
+        db.session.flush()
+    
+    # Delete all quiz attempts for users in this organization
+    if user_ids:
+        QuizAttempt.query.filter(QuizAttempt.user_id.in_(user_ids)).delete(synchronize_session=False)
+        db.session.flush()
+    
+    # Delete all user sessions for users in this organization
+    if user_ids:
+        UserSession.query.filter(UserSession.user_id.in_(user_ids)).delete(synchronize_session=False)
+        db.session.flush()
+    
+    # Delete all page views for users in this organization
+    if user_ids:
+        PageView.query.filter(PageView.user_id.in_(user_ids)).delete(synchronize_session=False)
+        db.session.flush()
+    
+    # Delete all course progress records for users in this organization
+    if user_ids:
+        CourseProgress.query.filter(CourseProgress.user_id.in_(user_ids)).delete(synchronize_session=False)
+        db.session.flush()
+    
+    # Delete the organization's progress rollup rows
+    OrganizationCourseProgress.query.filter_by(org_id=org_id).delete(synchronize_session=False)
+    db.session.flush()
+    job.progress(1, 4, 'Removing course assignments')
+    
+    employees = User.query.filter_by(org_id=org_id, role='employee').all()
+    for employee in employees:
+        employee.courses.clear()
+    db.session.flush()
+    
+    # Delete all course requests associated with this organization
+    course_requests_to_delete = CourseRequest.query.filter_by(organization_id=org_id).all()
+    for course_request in course_requests_to_delete:
+        db.session.delete(course_request)
+    db.session.flush()
+    
+    # Remove all course assignments from the organization
+    org.courses.clear()
+    db.session.flush()
+    job.progress(2, 4, f'Deleting {len(users_to_delete)} user(s)')
+    
+    # Delete all users associated with this organization
+    for user in users_to_delete:
+        db.session.delete(user)
+    db.session.flush()  # Ensure users are deleted before deleting org
+    job.progress(3, 4, 'Deleting organization')
+    
+    # Finally, delete the organization
+    db.session.delete(org)
+    db.session.commit()
+    job.progress(4, 4, 'Done')
+    
+    return {'users_deleted': len(users_to_delete), 'course_requests_deleted': len(course_requests_to_delete)}
+
 @app.route('/api/organizations/<int:org_id>/status', methods=['PATCH'])
 def update_organization_status(org_id):
     data = request.get_json()
@@ -730,7 +780,9 @@ def create_course():
 
 @app.route('/api/courses/<int:course_id>', methods=['GET'])
 def get_course(course_id):
-    course = Course.query.get_or_404(course_id)
+    course = load_course_tree(course_id)
+    if not course:
+        abort(404)
     
     modules = [
         {
@@ -747,10 +799,10 @@ def get_course(course_id):
                     "url": f"/api/{content.file_path}" if content.file_path else None,
                     "file_path": content.file_path
                 }
-                for content in sorted(module.contents, key=lambda x: x.order)
+                for content in module.contents
             ]
         }
-        for module in sorted(course.modules, key=lambda x: x.order)
+        for module in course.modules
     ]
     
     course_data = {
@@ -812,85 +864,109 @@ def update_course(course_id):
 def delete_course(course_id):
     try:
         course = Course.query.get_or_404(course_id)
+        job_id = enqueue_job('delete_course', {'course_id': course_id})
         
-        # Get all module content IDs for this course
-        content_ids = []
-        for module in course.modules:
-            for content in module.contents:
-                content_ids.append(content.id)
-        
-        # Handle foreign key constraints before deleting the course
-        
-        # 1. Delete content interactions for all content in this course
-        if content_ids:
-            ContentInteraction.query.filter(ContentInteraction.content_id.in_(content_ids)).delete(synchronize_session=False)
-            db.session.flush()
-        
-        # 2. Delete quiz attempts for all content in this course
-        if content_ids:
-            QuizAttempt.query.filter(QuizAttempt.quiz_content_id.in_(content_ids)).delete(synchronize_session=False)
-            db.session.flush()
-        
-        # 2.5. Delete simulation attempts for all simulations in this course
-        if content_ids:
-            # Get all simulation IDs for content in this course
-            simulation_ids = db.session.query(Simulation.id).filter(Simulation.content_id.in_(content_ids)).all()
-            simulation_ids = [s[0] for s in simulation_ids]
-            if simulation_ids:
-                SimulationAttempt.query.filter(SimulationAttempt.simulation_id.in_(simulation_ids)).delete(synchronize_session=False)
-                db.session.flush()
-        
-        # 3. Delete course enrollments for this course
-        CourseEnrollment.query.filter_by(course_id=course_id).delete(synchronize_session=False)
-        db.session.flush()
-        
-        # 4. Delete certificates for this course
-        # Note: Certificate table does not exist in current schema, skipping
-        # db.session.execute(text(f"DELETE FROM certificate WHERE course_id = {course_id}"))
-        # db.session.flush()
-        
-        # 5. Delete related course requests
-        course_requests = CourseRequest.query.filter_by(course_id=course_id).all()
-        for request in course_requests:
-            db.session.delete(request)
-        
-        # 6. Remove course from organization associations
-        from models import organization_courses
-        db.session.execute(
-            organization_courses.delete().where(organization_courses.c.course_id == course_id)
-        )
-        
-        # 7. Remove course from user assignments
-        from models import user_courses
-        db.session.execute(
-            user_courses.delete().where(user_courses.c.course_id == course_id)
-        )
-        
-        # 8. Delete course progress records
-        progress_records = CourseProgress.query.filter_by(course_id=course_id).all()
-        for progress in progress_records:
-            db.session.delete(progress)
-        
-        # 9. Delete course enrollments
-        enrollments = CourseEnrollment.query.filter_by(course_id=course_id).all()
-        for enrollment in enrollments:
-            db.session.delete(enrollment)
-        
-        # 10. Delete tasks related to this course
-        tasks = Task.query.filter_by(course_id=course_id).all()
-        for task in tasks:
-            db.session.delete(task)
-        
-        # Now safe to delete the course (modules, content, questions, options will be cascade deleted)
-        db.session.delete(course)
-        db.session.commit()
-        
-        return jsonify({"success": True, "message": "Course deleted successfully"})
+        return jsonify({
+            "success": True,
+            "message": f"Deleting course {course.title}",
+            "job_id": job_id,
+            "status_url": f"/api/jobs/{job_id}"
+        }), 202
         
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "message": f"Failed to delete course: {str(e)}"}), 500
 
+@job_handler('delete_course')
+def delete_course_job(payload, job):
+    """Delete a course with its modules, content and learner activity"""
+    course_id = payload['course_id']
+    course = db.session.get(Course, course_id)
+    if not course:
+        # Already deleted by an earlier attempt
+        return {'deleted': False}
+    
+    # Get all module content IDs for this course
+    content_ids = []
+    for module in course.modules:
+        for content in module.contents:
+            content_ids.append(content.id)
+    
+    job.progress(0, 2, f'Deleting activity for {len(content_ids)} content item(s)')
+    
+    # Handle foreign key constraints before deleting the course
+    
+    # 1. Delete content interactions for all content in this course
+    if content_ids:
+        ContentInteraction.query.filter(ContentInteraction.content_id.in_(content_ids)).delete(synchronize_session=False)
+        db.session.flush()
+    
+    # 2. Delete quiz attempts for all content in this course
+    if content_ids:
+        QuizAttempt.query.filter(QuizAttempt.quiz_content_id.in_(content_ids)).delete(synchronize_session=False)
+        db.session.flush()
+    
+    # 2.5. Delete simulation attempts for all simulations in this course
+    if content_ids:
+        # Get all simulation IDs for content in this course
+        simulation_ids = db.session.query(Simulation.id).filter(Simulation.content_id.in_(content_ids)).all()
+        simulation_ids = [s[0] for s in simulation_ids]
+        if simulation_ids:
+            SimulationAttempt.query.filter(SimulationAttempt.simulation_id.in_(simulation_ids)).delete(synchronize_session=False)
+            db.session.flush()
+    
+    # 3. Delete course enrollments for this course
+    CourseEnrollment.query.filter_by(course_id=course_id).delete(synchronize_session=False)
+    db.session.flush()
+    
+    # 4. Delete certificates for this course
+    # Note: Certificate table does not exist in current schema, skipping
+    # db.session.execute(text(f"DELETE FROM certificate WHERE course_id = {course_id}"))
+    # db.session.flush()
+    
+    # 5. Delete related course requests
+    course_requests = CourseRequest.query.filter_by(course_id=course_id).all()
+    for course_request in course_requests:
+        db.session.delete(course_request)
+    
+    # 6. Remove course from organization associations
+    from models import organization_courses
+    db.session.execute(
+        organization_courses.delete().where(organization_courses.c.course_id == course_id)
+    )
+    
+    # 7. Remove course from user assignments
+    from models import user_courses
+    db.session.execute(
+        user_courses.delete().where(user_courses.c.course_id == course_id)
+    )
+    
+    # 8. Delete course progress records
+    progress_records = CourseProgress.query.filter_by(course_id=course_id).all()
+    for progress in progress_records:
+        db.session.delete(progress)
+    OrganizationCourseProgress.query.filter_by(course_id=course_id).delete(synchronize_session=False)
+    
+    # 9. Delete course enrollments
+    enrollments = CourseEnrollment.query.filter_by(course_id=course_id).all()
+    for enrollment in enrollments:
+        db.session.delete(enrollment)
+    
+    # 10. Delete tasks related to this course
+    tasks = Task.query.filter_by(course_id=course_id).all()
+    for task in tasks:
+        db.session.delete(task)
+    
+    job.progress(1, 2, 'Deleting course')
+    
+    # Now safe to delete the course (modules, content, questions, options will be cascade deleted)
+    db.session.delete(course)
+    db.session.commit()
+    
+    job.progress(2, 2, 'Done')
+    
+    return {'deleted': True}
+
 # Module API endpoints
 @app.route('/api/courses/<int:course_id>/modules', methods=['POST'])
 def create_module(course_id):
@@ -1344,6 +1420,7 @@ def create_quiz_question(content_id):
             db.session.add(option)
         
         db.session.commit()
+        answer_key_cache.invalidate(content_id)
         
         return jsonify({
             "success": True, 
@@ -1470,6 +1547,7 @@ def update_quiz_question(question_id):
                 db.session.add(option)
         
         db.session.commit()
+        answer_key_cache.invalidate(question.content_id)
         
         # Return updated question data
         options_data = []
@@ -1507,8 +1585,10 @@ def delete_quiz_question(question_id):
         QuizOption.query.filter_by(question_id=question.id).delete()
         
         # Delete the question
+        content_id = question.content_id
         db.session.delete(question)
         db.session.commit()
+        answer_key_cache.invalidate(content_id)
         
         return jsonify({
             "success": True,
@@ -1771,7 +1851,12 @@ def submit_simulation_attempt(simulation_id):
 
 @app.route('/api/login', methods=['POST'])
 def login():
-    """Authenticate user and return JWT tokens"""
+    """Authenticate user and return JWT tokens
+
+    Stage timings are returned in a Server-Timing header.
+    """
+    timings = {}
+    started = time.perf_counter()
     try:
         data = request.get_json()
         username = data.get('username')
@@ -1780,58 +1865,66 @@ def login():
         if not username or not password:
             return jsonify({'success': False, 'message': 'Username and password are required'}), 400
         
-        print(f"Login attempt - Username: {username}")  # Debug log
+        # User and organization name in one query
+        row = db.session.query(User, Organization.name).outerjoin(
+            Organization, Organization.id == User.org_id
+        ).filter(User.username == username).first()
+        timings['db'] = (time.perf_counter() - started) * 1000
         
-        # Find user by username only
-        user = User.query.filter_by(username=username).first()
+        if not row:
+            print(f"Login failed, user not found: {username}")
+            return _login_response({'success': False, 'message': 'Invalid credentials'}, 401, timings)
+        user, org_name = row
         
-        if not user:
-            print(f"User not found: {username}")  # Debug log
-            return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
+        # Verify password using bcrypt on the bounded hashing pool
+        try:
+            password_valid, timings['bcrypt_wait'], timings['bcrypt'] = timed_verify_password(user.password, password)
+        except PasswordHasherBusy:
+            response = _login_response({'success': False, 'message': 'Server busy, please retry'}, 503, timings)
+            response.headers['Retry-After'] = '1'
+            return response
         
-        print(f"User found - Role: {user.role}, Email: {user.email}")  # Debug log
+        if not password_valid:
+            print(f"Login failed for user: {username}")
+            return _login_response({'success': False, 'message': 'Invalid credentials'}, 401, timings)
         
-        # Verify password using bcrypt
-        password_valid = verify_password(user.password, password)
-        print(f"Password verification result: {password_valid}")  # Debug log
+        if needs_rehash(user.password):
+            rehash_in_background(app, user.id, user.password, password)
         
-        if password_valid:
-            # Generate JWT access and refresh tokens
-            access_token, refresh_token = generate_tokens(user)
-            
-            print(f"Login successful for user: {username}")  # Debug log
-            
-            # Get organization name
-            org_name = None
-            if user.org_id:
-                org = Organization.query.get(user.org_id)
-                if org:
-                    org_name = org.name
-            
-            return jsonify({
-                'success': True, 
-                'message': 'Login successful',
-                'access_token': access_token,
-                'refresh_token': refresh_token,
-                'token': access_token,  # Keep for backward compatibility
+        # Generate JWT access and refresh tokens
+        tokens_started = time.perf_counter()
+        access_token, refresh_token = generate_tokens(user, org_name=org_name)
+        timings['tokens'] = (time.perf_counter() - tokens_started) * 1000
+        
+        print(f"Login successful for user: {username} ({', '.join(f'{stage} {ms:.1f}ms' for stage, ms in timings.items())})")
+        
+        return _login_response({
+            'success': True, 
+            'message': 'Login successful',
+            'access_token': access_token,
+            'refresh_token': refresh_token,
+            'token': access_token,  # Keep for backward compatibility
+            'role': user.role,
+            'user': {
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
                 'role': user.role,
-                'user': {
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'role': user.role,
-                    'org_id': user.org_id,
-                    'org_name': org_name
-                }
-            })
-        else:
-            print(f"Login failed for user: {username}")  # Debug log
-            return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
+                'org_id': user.org_id,
+                'org_name': org_name
+            }
+        }, 200, timings)
             
     except Exception as e:
         print(f"Login error: {str(e)}")
         return jsonify({'success': False, 'message': 'Internal server error'}), 500
 
+def _login_response(body, status, timings):
+    response = jsonify(body)
+    response.status_code = status
+    response.headers['Server-Timing'] = ', '.join(f'{stage};dur={ms:.1f}' for stage, ms in timings.items())
+    return response
+
 @app.route('/api/refresh', methods=['POST'])
 def refresh_token():
     """Refresh access token using refresh token"""
@@ -1872,15 +1965,24 @@ def refresh_token():
 @app.route('/api/logout', methods=['POST'])
 @token_required
 def logout():
-    """Logout user (token blacklisting would be implemented here in production)"""
+    """Logout user: revoke the access token and, if given, the refresh token"""
     try:
-        # In a production system, you would add the token to a blacklist
-        # For now, we just return success and let the client remove the token
+        revoke_token(request.token_payload)
+        refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+        if refresh_token:
+            try:
+                refresh_payload = decode_token(refresh_token)
+                if refresh_payload.get('user_id') == request.token_payload['user_id']:
+                    revoke_token(refresh_payload)
+            except AuthError:
+                pass  # Already expired or revoked
+        db.session.commit()
         return jsonify({
             'success': True,
             'message': 'Logged out successfully'
         })
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': 'Logout failed'}), 500
 
 @app.route('/api/verify-token', methods=['GET'])
@@ -1906,7 +2008,7 @@ def generate_temp_password(length=12):
     return ''.join(secrets.choice(characters) for _ in range(length))
 
 def send_invite_email(user_email, user_name, org_name, temp_password, login_url="http://localhost:5174/login"):
-    """Send invitation email to new employee"""
+    """Queue invitation email to new employee"""
     try:
         msg = Message(
             subject=f'Welcome to {org_name} - Learning Management Portal',
@@ -1946,15 +2048,15 @@ Best regards,
 The {org_name} Team"""
         )
         
-        mail.send(msg)
-        return True, "Email sent successfully"
+        # Delivered by the mail queue's sender thread over a pooled SMTP connection
+        return queue_email(msg, 'invite')
         
     except Exception as e:
         print(f"Failed to send email: {str(e)}")
         return False, f"Failed to send email: {str(e)}"
 
 def send_password_reset_email(user_email, user_name, org_name, new_password, reset_type="Password Reset"):
-    """Send password reset email"""
+    """Queue password reset email"""
     try:
         msg = Message(
             subject=f'{reset_type} - {org_name} Learning Portal',
@@ -1997,8 +2099,7 @@ Best regards,
 The {org_name} Team"""
         )
         
-        mail.send(msg)
-        return True, "Password reset email sent successfully"
+        return queue_email(msg, 'password_reset')
         
     except Exception as e:
         print(f"Failed to send password reset email: {str(e)}")
@@ -2033,8 +2134,9 @@ def admin_reset_portal_admin_password():
         # Generate new password
         new_password = generate_temp_password()
         
-        # Update password in database with proper hashing
+        # Update password in database with proper hashing and sign out existing sessions
         portal_admin.password = hash_password(new_password)
+        revoke_user_tokens(portal_admin.id, JWT_REFRESH_TOKEN_EXPIRES, reason='password_reset')
         db.session.commit()
         
         # Send email notification
@@ -2088,8 +2190,9 @@ def portal_admin_reset_employee_password():
         # Generate new password
         new_password = generate_temp_password()
         
-        # Update password in database with proper hashing
+        # Update password in database with proper hashing and sign out existing sessions
         employee.password = hash_password(new_password)
+        revoke_user_tokens(employee.id, JWT_REFRESH_TOKEN_EXPIRES, reason='password_reset')
         db.session.commit()
         
         # Send email notification
@@ -2138,8 +2241,9 @@ def change_password():
         if not user or not verify_password(user.password, current_password):
             return jsonify({'success': False, 'error': 'Invalid username or current password'}), 401
             
-        # Update password with proper hashing
+        # Update password with proper hashing and sign out existing sessions
         user.password = hash_password(new_password)
+        revoke_user_tokens(user.id, JWT_REFRESH_TOKEN_EXPIRES, reason='password_change')
         db.session.commit()
         
         return jsonify({
@@ -2178,8 +2282,9 @@ def portal_admin_reset_my_password():
         # Generate new password
         new_password = generate_temp_password()
         
-        # Update password in database with proper hashing
+        # Update password in database with proper hashing and sign out existing sessions
         portal_admin.password = hash_password(new_password)
+        revoke_user_tokens(portal_admin.id, JWT_REFRESH_TOKEN_EXPIRES, reason='password_reset')
         db.session.commit()
         
         # Send email notification
@@ -2366,6 +2471,10 @@ def delete_employee(employee_id):
         if employee.role != 'employee':
             return jsonify({'error': 'Can only delete employees'}), 400
         
+        # Remove the employee's progress rows from the organization rollup
+        for progress in employee.progress_records:
+            record_progress_change(employee.org_id, progress.course_id, progress_snapshot(progress), None)
+        
         db.session.delete(employee)
         db.session.commit()
         
@@ -2515,6 +2624,50 @@ def create_employee():
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@app.route('/api/portal_admin/import_employees', methods=['POST'])
+@portal_admin_required
+def import_employees_csv():
+    """Create employees from a CSV upload (multipart field 'file', or a text/csv body)"""
+    try:
+        user = request.current_user
+        if not user.org_id:
+            return jsonify({'error': 'Portal admin not associated with an organization'}), 404
+        
+        organization = db.session.get(Organization, user.org_id)
+        if not organization:
+            return jsonify({'error': 'Organization not found'}), 404
+        org_name = organization.name
+        
+        # Read the upload as a stream instead of loading it into memory
+        if request.mimetype == 'text/csv':
+            stream = request.stream
+        else:
+            upload = request.files.get('file')
+            if not upload:
+                return jsonify({'error': 'CSV file is required'}), 400
+            stream = upload.stream
+        
+        def send_invite(email, username, password):
+            return send_invite_email(
+                user_email=email,
+                user_name=username.replace('.', ' ').replace('_', ' ').title(),
+                org_name=org_name,
+                temp_password=password
+            )
+        
+        report = import_employees(stream, organization.id, generate_temp_password, send_invite)
+        
+        status_code = 400 if report['error'] and not report['created'] else 200
+        return jsonify({
+            'success': report['error'] is None,
+            'message': f"{report['created']} employee(s) created, {report['skipped']} skipped, {report['invalid']} invalid",
+            **report
+        }), status_code
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to import employees: {str(e)}'}), 500
+
 @app.route('/api/portal_admin/all_courses', methods=['GET'])
 def get_portal_admin_courses():
     """Get all courses and assigned courses for a portal admin's organization"""
@@ -3112,6 +3265,7 @@ def get_all_users():
 def portal_admin_organization_statistics():
     """
     Returns organization statistics for the portal admin dashboard.
+    Optional risk_threshold and low_progress_threshold query params override the defaults.
     """
     username = request.args.get('username')
     if not username:
@@ -3128,120 +3282,27 @@ def portal_admin_organization_statistics():
     if not organization:
         return jsonify({'success': False, 'error': 'Organization not found'}), 404
 
-    # Employees
-    employees = User.query.filter_by(org_id=organization.id, role='employee').all()
-    total_employees = len(employees)
-
-    # Courses assigned to org
-    assigned_courses = organization.courses
-    total_courses = len(assigned_courses)
-
-    # Course progress for employees
-    employee_ids = [e.id for e in employees]
-    progresses = CourseProgress.query.filter(CourseProgress.user_id.in_(employee_ids)).all()
-
-    # Completion stats
-    completed_courses = sum(1 for p in progresses if p.completion_date)
-    in_progress_courses = sum(1 for p in progresses if p.progress_percentage > 0 and not p.completion_date)
-    not_started_courses = sum(1 for p in progresses if p.progress_percentage == 0)
-    avg_progress = round(sum(p.progress_percentage for p in progresses) / len(progresses), 2) if progresses else 0
-
-    # Employees at risk (example: risk_score > 70)
-    employees_at_risk = []
-    for emp in employees:
-        emp_progress = CourseProgress.query.filter_by(user_id=emp.id).all()
-        risk_courses = []
-        for prog in emp_progress:
-            if hasattr(prog, "risk_score") and prog.risk_score and prog.risk_score > 70:
-                course = Course.query.get(prog.course_id)
-                risk_courses.append({
-                    "course_id": prog.course_id,
-                    "title": course.title if course else "",
-                    "progress": prog.progress_percentage,
-                    "risk_score": prog.risk_score
-                })
-        if risk_courses:
-            employees_at_risk.append({
-                "id": emp.id,
-                "username": emp.username,
-                "email": emp.email,
-                "risk_courses": risk_courses
-            })
-
-    # Course statistics
-    course_statistics = []
-    for course in assigned_courses:
-        course_progresses = [p for p in progresses if p.course_id == course.id]
-        enrolled_count = len(course_progresses)
-        completed_count = sum(1 for p in course_progresses if p.completion_date)
-        avg_course_progress = round(sum(p.progress_percentage for p in course_progresses) / enrolled_count, 2) if enrolled_count else 0
-        at_risk_count = sum(1 for p in course_progresses if hasattr(p, "risk_score") and p.risk_score and p.risk_score > 70)
-        completion_rate = round((completed_count / enrolled_count) * 100, 2) if enrolled_count else 0
-        course_statistics.append({
-            "id": course.id,
-            "title": course.title,
-            "enrolled_count": enrolled_count,
-            "completed_count": completed_count,
-            "avg_progress": avg_course_progress,
-            "at_risk_count": at_risk_count,
-            "completion_rate": completion_rate
-        })
-
-    # Employee statistics
-    employee_statistics = []
-    for emp in employees:
-        emp_progresses = [p for p in progresses if p.user_id == emp.id]
-        assigned_count = len(emp_progresses)
-        completed_count = sum(1 for p in emp_progresses if p.completion_date)
-        avg_emp_progress = round(sum(p.progress_percentage for p in emp_progresses) / assigned_count, 2) if assigned_count else 0
-        high_risk_count = sum(1 for p in emp_progresses if hasattr(p, "risk_score") and p.risk_score and p.risk_score > 70)
-        employee_statistics.append({
-            "id": emp.id,
-            "username": emp.username,
-            "email": emp.email,
-            "designation": emp.designation,
-            "assigned_count": assigned_count,
-            "completed_count": completed_count,
-            "avg_progress": avg_emp_progress,
-            "high_risk_count": high_risk_count
-        })
-
-    # Completion by course for analytics
-    completion_by_course = []
-    for course in assigned_courses:
-        course_progresses = [p for p in progresses if p.course_id == course.id]
-        enrolled_count = len(course_progresses)
-        completion_rate = round(
-            (sum(1 for p in course_progresses if p.completion_date) / enrolled_count) * 100, 2
-        ) if enrolled_count else 0
-        completion_by_course.append({
-            "course_id": course.id,
-            "title": course.title,
-            "completion_rate": completion_rate
-        })
-
-    # Overall completion rate
-    overall_completion_rate = round(
-        (sum(1 for p in progresses if p.completion_date) / len(progresses)) * 100, 2
-    ) if progresses else 0
-
-    # Employees at risk count for analytics
-    employees_at_risk_count = len(employees_at_risk)
+    stats = get_organization_statistics(
+        organization,
+        risk_threshold=request.args.get('risk_threshold', type=int),
+        low_progress_threshold=request.args.get('low_progress_threshold', type=float)
+    )
+    totals = stats['totals']
 
     return jsonify({
         "success": True,
         "organization": {
             "id": organization.id,
             "name": organization.name,
-            "total_employees": total_employees,
-            "total_courses": total_courses,
-            "overall_completion_rate": overall_completion_rate,
-            "employees_at_risk": employees_at_risk_count
+            "total_employees": totals['total_employees'],
+            "total_courses": totals['total_courses'],
+            "overall_completion_rate": totals['overall_completion_rate'],
+            "employees_at_risk": totals['employees_at_risk']
         },
-        "course_statistics": course_statistics,
-        "employee_statistics": employee_statistics,
-        "completion_by_course": completion_by_course,
-        "employees_at_risk": employees_at_risk
+        "course_statistics": stats['course_statistics'],
+        "employee_statistics": stats['employee_statistics'],
+        "completion_by_course": stats['completion_by_course'],
+        "employees_at_risk": stats['employees_at_risk']
     }), 200
 
 @app.route('/api/portal_admin/assign_course_to_employee', methods=['POST'])
@@ -3335,21 +3396,32 @@ def get_employee_course_detail(course_id):
     if not user:
         return jsonify({'success': False, 'error': 'Employee not found'}), 404
     # Check if course is assigned to this user
-    course = Course.query.get(course_id)
-    if not course or course not in user.courses:
+    is_assigned = db.session.query(user_courses.c.course_id).filter(
+        user_courses.c.user_id == user.id,
+        user_courses.c.course_id == course_id
+    ).first() is not None
+    course = load_course_tree(course_id) if is_assigned else None
+    if not course:
         return jsonify({'success': False, 'error': 'Course not assigned to employee'}), 404
+    question_counts = count_quiz_questions(
+        content.id for module in course.modules for content in module.contents
+        if content.content_type == 'quiz'
+    )
     # Build modules and contents
     modules = []
     for module in course.modules:
         contents = []
         for content in module.contents:
-            contents.append({
+            content_data = {
                 'id': content.id,
                 'title': content.title,
                 'content_type': content.content_type,
                 'file_path': content.file_path,
                 'order': content.order
-            })
+            }
+            if content.content_type == 'quiz':
+                content_data['question_count'] = question_counts.get(content.id, 0)
+            contents.append(content_data)
         modules.append({
             'id': module.id,
             'title': module.title,
@@ -3358,11 +3430,7 @@ def get_employee_course_detail(course_id):
             'contents': contents
         })
     # Progress info
-    progress_record = None
-    for pr in user.progress_records:
-        if pr.course_id == course.id:
-            progress_record = pr
-            break
+    progress_record = CourseProgress.query.filter_by(user_id=user.id, course_id=course.id).first()
     progress = None
     completed_modules = 0
     module_progress = {}
@@ -3391,21 +3459,31 @@ def get_employee_my_courses():
     # Get current user from token
     user = request.current_user
     
-    # Get user's organization to ensure we only show courses assigned to the organization
-    organization = None
+    # Assigned course ids; with an organization, only courses still assigned to the organization
+    course_ids_query = db.session.query(user_courses.c.course_id).filter(user_courses.c.user_id == user.id)
     if user.org_id:
-        organization = Organization.query.get(user.org_id)
+        course_ids_query = course_ids_query.join(
+            organization_courses,
+            (organization_courses.c.course_id == user_courses.c.course_id) &
+            (organization_courses.c.organization_id == user.org_id)
+        )
+    course_ids = [row.course_id for row in course_ids_query.order_by(user_courses.c.course_id).all()]
+    courses = load_course_trees(course_ids)
     
-    # Filter courses to only include those currently assigned to the user's organization
-    if organization:
-        org_course_ids = [course.id for course in organization.courses]
-        courses = [course for course in user.courses if course.id in org_course_ids]
-    else:
-        # If no organization, show all user courses (fallback)
-        courses = user.courses
+    # Progress info (optional, if available) for all courses in one query
+    progress_records = {
+        pr.course_id: pr
+        for pr in CourseProgress.query.filter(
+            CourseProgress.user_id == user.id,
+            CourseProgress.course_id.in_(course_ids)
+        ).all()
+    } if course_ids else {}
     
     result = []
-    for course in courses:
+    for course_id in course_ids:
+        course = courses.get(course_id)
+        if not course:
+            continue
         modules = []
         for module in course.modules:
             contents = []
@@ -3422,12 +3500,7 @@ def get_employee_my_courses():
                 'description': module.description,
                 'contents': contents
             })
-        # Progress info (optional, if available)
-        progress_record = None
-        for pr in user.progress_records:
-            if pr.course_id == course.id:
-                progress_record = pr
-                break
+        progress_record = progress_records.get(course.id)
         progress = None
         completed_modules = 0
         if progress_record:
@@ -3465,19 +3538,17 @@ def get_employee_quiz(quiz_id):
         if not user:
             return jsonify({'success': False, 'error': 'Employee not found'}), 404
         
-        # Get the quiz content
-        content = ModuleContent.query.get(quiz_id)
-        if not content or content.content_type != 'quiz':
+        # Get the quiz content together with its course id
+        content, course_id = get_quiz_content(quiz_id)
+        if not content:
             return jsonify({'success': False, 'error': 'Quiz content not found'}), 404
         
         # Check if employee has access to this content through course assignment
-        module = content.module
-        course = module.course if module else None
-        if course and course not in user.courses:
+        if course_id and not is_course_assigned(user.id, course_id):
             return jsonify({'success': False, 'error': 'Quiz not assigned to employee'}), 403
         
-        # Get questions
-        questions = QuizQuestion.query.filter_by(content_id=quiz_id).order_by(QuizQuestion.order).all()
+        # Get questions with their options in one query
+        questions = load_quiz_questions(quiz_id)
         
         questions_data = []
         for question in questions:
@@ -3512,104 +3583,72 @@ def get_employee_quiz(quiz_id):
 
 @app.route('/api/employee/submit_quiz', methods=['POST'])
 def submit_employee_quiz():
-    """Submit quiz answers and get results"""
+    """Submit quiz answers, record the attempt and get results"""
     try:
         data = request.json
         username = data.get('username')
         content_id = data.get('content_id')
         answers = data.get('answers', [])
+        time_taken_minutes = data.get('time_taken_minutes')
         
         if not username or not content_id:
             return jsonify({'success': False, 'error': 'Username and content_id are required'}), 400
         
+        # Stored in an Integer column and used to derive started_at
+        if time_taken_minutes in (None, ''):
+            time_taken_minutes = None
+        else:
+            try:
+                time_taken_minutes = int(time_taken_minutes)
+            except (TypeError, ValueError):
+                time_taken_minutes = -1
+            if time_taken_minutes < 0:
+                return jsonify({'success': False, 'error': 'time_taken_minutes must be a non-negative integer'}), 400
+        
         # Find the user
         user = User.query.filter_by(username=username, role='employee').first()
         if not user:
             return jsonify({'success': False, 'error': 'Employee not found'}), 404
         
-        # Get the quiz content
-        content = ModuleContent.query.get(content_id)
-        if not content or content.content_type != 'quiz':
+        # Get the quiz content together with its course id
+        content, course_id = get_quiz_content(content_id)
+        if not content:
             return jsonify({'success': False, 'error': 'Quiz content not found'}), 404
         
         # Check if employee has access
-        module = content.module
-        course = module.course if module else None
-        if course and course not in user.courses:
+        if course_id and not is_course_assigned(user.id, course_id):
             return jsonify({'success': False, 'error': 'Quiz not assigned to employee'}), 403
         
-        # Get all questions for this quiz
-        questions = QuizQuestion.query.filter_by(content_id=content_id).order_by(QuizQuestion.order).all()
-        if not questions:
+        # Compiled answer key (cached per quiz) and grading in memory
+        answer_key = answer_key_cache.get_answer_key(content.id)
+        if not answer_key:
             return jsonify({'success': False, 'error': 'No questions found for this quiz'}), 404
         
-        # Calculate score
-        total_questions = len(questions)
-        correct_answers = 0
-        question_results = []
-        
-        # Create a map of answers for easy lookup
-        answer_map = {}
-        for answer in answers:
-            question_id = answer.get('question_id')
-            selected_options = answer.get('selected_options', [])
-            answer_map[question_id] = selected_options
+        results = grade_quiz(answer_key, answers)
         
-        for question in questions:
-            user_answer = answer_map.get(question.id, [])
-            
-            # Get correct options for this question
-            correct_options = QuizOption.query.filter_by(
-                question_id=question.id,
-                is_correct=True
-            ).all()
-            correct_option_ids = [opt.id for opt in correct_options]
-            
-            # Check if answer is correct
-            is_correct = False
-            if question.question_type in ['single-choice', 'multiple-choice']:
-                if question.question_type == 'single-choice':
-                    # For single choice, user should select exactly one correct option
-                    is_correct = (len(user_answer) == 1 and 
-                                user_answer[0] in correct_option_ids)
-                else:
-                    # For multiple choice, user should select all correct options and no incorrect ones
-                    is_correct = (set(user_answer) == set(correct_option_ids))
-            elif question.question_type == 'true-false':
-                # For true/false, should select exactly one correct option
-                is_correct = (len(user_answer) == 1 and 
-                            user_answer[0] in correct_option_ids)
-            
-            if is_correct:
-                correct_answers += 1
-            
-            question_results.append({
-                'question_id': question.id,
-                'question_text': question.question_text,
-                'user_answer': user_answer,
-                'correct_options': correct_option_ids,
-                'is_correct': is_correct
-            })
-        
-        # Calculate percentage and determine if passed (70% threshold)
-        percentage = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
-        passed = percentage >= 70
-        
-        results = {
-            'score': correct_answers,
-            'total_questions': total_questions,
-            'percentage': round(percentage, 2),
-            'passed': passed,
-            'question_results': question_results
-        }
+        # Persist the attempt
+        attempt = record_quiz_attempt(user.id, content.id, results, answers, time_taken_minutes)
+        db.session.flush()
+        results['attempt_id'] = attempt.id
+        results['attempt_number'] = attempt.attempt_number
+        publish_progress_event(user, 'quiz_attempt', {
+            'course_id': course_id,
+            'content_id': content.id,
+            'attempt_id': attempt.id,
+            'attempt_number': attempt.attempt_number,
+            'percentage': results['percentage'],
+            'passed': results['passed']
+        })
+        db.session.commit()
         
         return jsonify({
             'success': True,
             'results': results,
-            'message': f'Quiz submitted successfully! Score: {correct_answers}/{total_questions} ({percentage:.1f}%)'
+            'message': f"Quiz submitted successfully! Score: {results['score']}/{results['total_questions']} ({results['percentage']:.1f}%)"
         }), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'error': f'Failed to submit quiz: {str(e)}'}), 500
 
 # System Settings Management Endpoints
@@ -3892,6 +3931,7 @@ def log_audit_action(user_id, action, resource_type, resource_id=None, details=N
 # Analytics Endpoints
 
 @app.route('/api/analytics/overview', methods=['GET'])
+@analytics_cache.cached(depends_on=('user', 'organization', 'course', 'course_progress', 'quiz_attempt'))
 def get_analytics_overview():
     """Get comprehensive analytics overview"""
     try:
@@ -3958,6 +3998,7 @@ def get_analytics_overview():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/analytics/users', methods=['GET'])
+@analytics_cache.cached(depends_on=('user', 'course_progress'))
 def get_user_analytics():
     """Get detailed user analytics"""
     try:
@@ -4025,6 +4066,7 @@ def get_user_analytics():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/analytics/courses', methods=['GET'])
+@analytics_cache.cached(depends_on=('course', 'course_progress'))
 def get_course_analytics():
     """Get detailed course analytics"""
     try:
@@ -4101,6 +4143,7 @@ def get_course_analytics():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/analytics/organizations', methods=['GET'])
+@analytics_cache.cached(depends_on=('organization', 'user', 'organization_courses'))
 def get_organization_analytics():
     """Get organization analytics"""
     try:
@@ -4146,6 +4189,7 @@ def get_organization_analytics():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/analytics/learning', methods=['GET'])
+@analytics_cache.cached(depends_on=('quiz_attempt', 'module_content', 'user', 'course_progress'))
 def get_learning_analytics():
     """Get learning progress analytics"""
     try:
@@ -4215,6 +4259,7 @@ def get_learning_analytics():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/analytics/system', methods=['GET'])
+@analytics_cache.cached(depends_on=('course_progress', 'module_content'))
 def get_system_analytics():
     """Get system performance analytics"""
     try:
@@ -4285,25 +4330,29 @@ def get_financial_analytics():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/analytics/compliance', methods=['GET'])
+@analytics_cache.cached(depends_on=('course', 'course_progress', 'organization_course_progress'))
 def get_compliance_analytics():
     """Get compliance and certification analytics"""
     try:
-        # Certification completion rates - using actual course data
+        # Certification completion rates - read from the organization progress rollup
+        ensure_progress_rollup()
         cert_stats = db.session.query(
             Course.title,
-            func.count(CourseProgress.id).label('enrolled'),
-            func.count(case((CourseProgress.progress_percentage == 100, 1))).label('certified')
+            func.sum(OrganizationCourseProgress.enrolled_count).label('enrolled'),
+            func.sum(OrganizationCourseProgress.completed_count).label('certified')
         ).join(
-            CourseProgress, Course.id == CourseProgress.course_id
-        ).group_by(Course.id, Course.title).all()
+            OrganizationCourseProgress, Course.id == OrganizationCourseProgress.course_id
+        ).group_by(Course.id, Course.title).having(
+            func.sum(OrganizationCourseProgress.enrolled_count) > 0
+        ).all()
         
         certification_data = []
         for stat in cert_stats:
             completion_rate = (stat.certified / stat.enrolled * 100) if stat.enrolled > 0 else 0
             certification_data.append({
                 'course': stat.title,
-                'enrolled': stat.enrolled,
-                'certified': stat.certified,
+                'enrolled': int(stat.enrolled),
+                'certified': int(stat.certified),
                 'completion_rate': round(completion_rate, 2)
             })
         
@@ -4319,28 +4368,13 @@ def get_compliance_analytics():
         print(f"Error in compliance analytics: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/analytics/export', methods=['POST'])
-def export_analytics():
-    """Export analytics data to CSV/Excel"""
-    try:
-        data = request.json
-        export_type = data.get('type', 'overview')
-        format_type = data.get('format', 'csv')
-        
-        # Generate filename
-        timestamp = datetime.datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-        filename = f"analytics_{export_type}_{timestamp}.{format_type}"
-        
-        # This would generate and return file download
-        # For now, return success message
-        return jsonify({
-            'success': True,
-            'message': f'Analytics export prepared: {filename}',
-            'download_url': f'/api/analytics/download/{filename}'
-        })
-        
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+@app.route('/api/analytics/cache_stats', methods=['GET'])
+def get_analytics_cache_stats():
+    """Get hit/miss counters of the analytics response cache"""
+    return jsonify({
+        'success': True,
+        'cache': analytics_cache.stats()
+    })
 
 # Start the Flask app when this file is run directly
 if __name__ == '__main__':
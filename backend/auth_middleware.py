@@ -1,13 +1,31 @@
 """
 Authentication middleware and decorators for JWT token-based authentication
+
+Stateless mode (AUTH_STATELESS=true) skips the per-request User lookup: the
+decorators authorize from the access token claims and request.current_user is
+a LazyUser that serves id, username, email, role and org_id from the claims.
+Touching any other attribute loads the user once per request, backed by a
+small TTL cache of column values that is evicted when a User row is committed.
+Role changes and deleted users then only take effect when the access token
+expires, which is why the mode is opt-in.
+
+Configuration (environment variables):
+    AUTH_STATELESS                true to enable (default false)
+    AUTH_USER_CACHE_TTL           seconds a cached user stays valid (default 60)
+    AUTH_USER_CACHE_MAX_ENTRIES   users kept in the cache (default 10000)
 """
 
 import os
 import jwt
+import uuid
 import datetime
 from functools import wraps
 from flask import request, jsonify, current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
 from models import User, db
+from response_cache import MemoryCacheBackend
+from token_revocation import revocation_list
 
 # JWT Configuration
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-super-secret-jwt-key-change-in-production')
@@ -15,22 +33,36 @@ JWT_ALGORITHM = 'HS256'
 JWT_ACCESS_TOKEN_EXPIRES = datetime.timedelta(hours=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES_HOURS', 8)))
 JWT_REFRESH_TOKEN_EXPIRES = datetime.timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES_DAYS', 30)))
 
+# Stateless authentication
+AUTH_STATELESS = os.getenv('AUTH_STATELESS', 'false').lower() == 'true'
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 60))
+user_cache = MemoryCacheBackend(int(os.getenv('AUTH_USER_CACHE_MAX_ENTRIES', 10000)))
+
+# Access token claim for each User attribute it carries
+USER_CLAIMS = {'id': 'user_id', 'username': 'username', 'email': 'email', 'role': 'role', 'org_id': 'org_id'}
+
 class AuthError(Exception):
     """Custom authentication error"""
     def __init__(self, error, status_code):
         self.error = error
         self.status_code = status_code
 
-def generate_tokens(user):
-    """Generate access and refresh tokens for a user"""
+_LOOKUP = object()
+
+def generate_tokens(user, org_name=_LOOKUP):
+    """Generate access and refresh tokens for a user
+
+    Pass org_name when the caller already loaded it to skip the organization lookup.
+    """
     from models import Organization
     
     # Get organization name if user has org_id
-    org_name = None
-    if user.org_id:
-        org = Organization.query.get(user.org_id)
-        if org:
-            org_name = org.name
+    if org_name is _LOOKUP:
+        org_name = None
+        if user.org_id:
+            org = Organization.query.get(user.org_id)
+            if org:
+                org_name = org.name
     
     # Access token payload
     access_payload = {
@@ -41,6 +73,7 @@ def generate_tokens(user):
         'org_id': user.org_id,
         'org_name': org_name,
         'token_type': 'access',
+        'jti': uuid.uuid4().hex,
         'exp': datetime.datetime.utcnow() + JWT_ACCESS_TOKEN_EXPIRES,
         'iat': datetime.datetime.utcnow()
     }
@@ -50,6 +83,7 @@ def generate_tokens(user):
         'user_id': user.id,
         'username': user.username,
         'token_type': 'refresh',
+        'jti': uuid.uuid4().hex,
         'exp': datetime.datetime.utcnow() + JWT_REFRESH_TOKEN_EXPIRES,
         'iat': datetime.datetime.utcnow()
     }
@@ -60,14 +94,16 @@ def generate_tokens(user):
     return access_token, refresh_token
 
 def decode_token(token):
-    """Decode and validate JWT token"""
+    """Decode and validate JWT token, including the revocation list"""
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         raise AuthError('Token has expired', 401)
     except jwt.InvalidTokenError:
         raise AuthError('Invalid token', 401)
+    if revocation_list.is_revoked(payload):
+        raise AuthError('Token has been revoked', 401)
+    return payload
 
 def get_token_from_header():
     """Extract token from Authorization header"""
@@ -83,8 +119,92 @@ def get_token_from_header():
     except ValueError:
         raise AuthError('Invalid Authorization header format', 401)
 
+def get_stream_token_payload():
+    """Validate the access token of an event stream request without loading the user.
+    
+    EventSource cannot send headers, so the token may also be passed as ?access_token=.
+    """
+    token = request.args.get('access_token') or get_token_from_header()
+    payload = decode_token(token)
+    if payload.get('token_type') != 'access':
+        raise AuthError('Invalid token type', 401)
+    return payload
+
+class LazyUser:
+    """Stand-in for the authenticated User that only queries the database when needed.
+
+    Claim attributes come from the token, other columns from user_cache, and
+    anything else (relationships, ORM use) from the User loaded in this request.
+    """
+
+    def __init__(self, payload):
+        self._payload = payload
+        self._instance = None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        claim = USER_CLAIMS.get(name)
+        if claim and claim in self._payload:
+            return self._payload[claim]
+        user_id = self._payload['user_id']
+        columns = user_cache.get(user_id)
+        if columns is not None and name in columns:
+            return columns[name]
+        return getattr(self.get_instance(), name)
+
+    def get_instance(self):
+        """Load the User row; raises AuthError if it no longer exists."""
+        if self._instance is None:
+            user = db.session.get(User, self._payload['user_id'])
+            if not user:
+                raise AuthError('User not found', 401)
+            user_cache.set(user.id, {column.key: getattr(user, column.key) for column in inspect(User).column_attrs},
+                           AUTH_USER_CACHE_TTL)
+            self._instance = user
+        return self._instance
+
+    def __repr__(self):
+        return f"<LazyUser {self._payload.get('user_id')}>"
+
+def _changed_user_ids(session):
+    return session.info.setdefault('auth_changed_user_ids', set())
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = _changed_user_ids(session)
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.id)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_user_changes(orm_execute_state):
+    # query.update()/delete() on users bypass the flush; drop the whole cache
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) == User.__tablename__:
+            _changed_user_ids(orm_execute_state.session).add(None)
+
+@event.listens_for(Session, 'after_commit')
+def _evict_committed_users(session):
+    changed = session.info.pop('auth_changed_user_ids', None)
+    if not changed:
+        return
+    if None in changed:
+        user_cache.clear()
+        return
+    for user_id in changed:
+        user_cache.delete(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_users(session):
+    session.info.pop('auth_changed_user_ids', None)
+
 def get_current_user():
-    """Get current user from JWT token"""
+    """Get current user from JWT token
+
+    In stateless mode the user is a LazyUser built from the token claims.
+    """
     try:
         token = get_token_from_header()
         payload = decode_token(token)
@@ -93,6 +213,9 @@ def get_current_user():
         if payload.get('token_type') != 'access':
             raise AuthError('Invalid token type', 401)
         
+        if AUTH_STATELESS:
+            return LazyUser(payload), payload
+        
         # Get user from database
         user = User.query.get(payload['user_id'])
         if not user:
@@ -0,0 +1,7 @@
+"""
+Benchmark scripts for the LMS backend.
+
+Run from the backend directory, e.g. ``python -m benchmarks.org_statistics``.
+When no database is configured the benchmarks fall back to a throwaway
+in-memory SQLite database.
+"""
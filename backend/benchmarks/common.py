@@ -0,0 +1,54 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Importing this module sets scratch-database defaults for the settings that
+app.py requires, so it must be imported before ``app``.
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Scratch database defaults so the app module can be imported without a .env file
+for key, value in {
+    'DB_HOST': 'localhost', 'DB_PORT': '5432', 'DB_USER': 'bench',
+    'DB_PASSWORD': 'bench', 'DB_NAME': 'bench',
+    'DATABASE_URL': 'sqlite://',
+    'JWT_SECRET_KEY': 'benchmark-jwt-secret-key-not-for-production', 'FLASK_SECRET_KEY': 'benchmark-secret',
+    # The in-process job poller would add its own statements to the recorded query counts
+    'JOB_WORKER_IN_PROCESS': 'false',
+}.items():
+    os.environ.setdefault(key, value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+
+class QueryRecorder:
+    """Collects the SQL statements executed while it is active."""
+
+    def __init__(self):
+        self.statements = []
+        self.elapsed = 0.0
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def record_queries(engine):
+    """Context manager yielding a QueryRecorder for statements run on ``engine``."""
+    recorder = QueryRecorder()
+    event.listen(engine, 'before_cursor_execute', recorder._record)
+    started = time.perf_counter()
+    try:
+        yield recorder
+    finally:
+        recorder.elapsed = time.perf_counter() - started
+        event.remove(engine, 'before_cursor_execute', recorder._record)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the course tree endpoints.
+
+Seeds courses with a growing number of modules and contents and checks that
+the admin course detail and the employee course endpoints issue the same
+number of SQL statements regardless of the size of the tree.
+
+Usage:
+    python -m benchmarks.course_tree [--shapes 1x1,10x10,50x20]
+"""
+
+import argparse
+import datetime
+import sys
+
+from benchmarks.common import record_queries
+
+from sqlalchemy import insert
+
+from app import app
+from auth_middleware import generate_tokens
+from models import db, User, Organization, Course, Module, ModuleContent, QuizQuestion, organization_courses, user_courses
+
+
+def seed_course(index, module_count, content_count, employee):
+    """Insert a course with module_count modules of content_count contents each."""
+    course = Course(title=f'Bench course {index}', status='published')
+    db.session.add(course)
+    db.session.flush()
+    db.session.execute(insert(Module), [
+        {'title': f'Module {n}', 'order': module_count - n, 'course_id': course.id}
+        for n in range(module_count)
+    ])
+    module_ids = [row.id for row in db.session.query(Module.id).filter_by(course_id=course.id)]
+    db.session.execute(insert(ModuleContent), [
+        {'title': f'Content {n}', 'content_type': 'quiz' if n % 3 == 0 else 'video',
+         'order': n, 'module_id': module_id}
+        for module_id in module_ids for n in range(content_count)
+    ])
+    quiz_ids = [row.id for row in db.session.query(ModuleContent.id).filter(
+        ModuleContent.module_id.in_(module_ids), ModuleContent.content_type == 'quiz')]
+    if quiz_ids:
+        db.session.execute(insert(QuizQuestion), [
+            {'question_text': 'Q', 'question_type': 'single-choice', 'content_id': content_id}
+            for content_id in quiz_ids
+        ])
+    db.session.execute(insert(organization_courses), [{'organization_id': employee.org_id, 'course_id': course.id}])
+    db.session.execute(insert(user_courses), [{'user_id': employee.id, 'course_id': course.id}])
+    db.session.commit()
+    return course.id
+
+
+def measure(client, url, headers=None):
+    with app.app_context():
+        engine = db.engine
+    with record_queries(engine) as queries:
+        response = client.get(url, headers=headers)
+    return response.status_code, queries.count, queries.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shapes', default='1x1,10x10,50x20',
+                        help='Comma separated MODULESxCONTENTS course shapes')
+    args = parser.parse_args()
+    shapes = [tuple(int(part) for part in shape.split('x')) for shape in args.shapes.split(',') if shape]
+
+    with app.app_context():
+        db.create_all()
+        org = Organization(name='bench-org', portal_admin='bench-admin', org_domain='bench',
+                           created=datetime.date.today())
+        db.session.add(org)
+        db.session.flush()
+        employee = User(username='bench-employee', password='x', role='employee',
+                        email='employee@bench', org_id=org.id)
+        db.session.add(employee)
+        db.session.commit()
+        access_token, _ = generate_tokens(employee)
+        course_ids = [seed_course(index, modules, contents, employee)
+                      for index, (modules, contents) in enumerate(shapes)]
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {access_token}'}
+    print(f"{'shape':>8} {'endpoint':<28} {'queries':>8} {'ms':>8}")
+    query_counts = {}
+    for (modules, contents), course_id in zip(shapes, course_ids):
+        for name, url, request_headers in (
+            ('admin course detail', f'/api/courses/{course_id}', None),
+            ('employee course detail', f'/api/employee/course/{course_id}?username=bench-employee', None),
+        ):
+            status, count, elapsed = measure(client, url, request_headers)
+            if status != 200:
+                print(f"{name} failed with status {status}")
+                return 1
+            query_counts.setdefault(name, set()).add(count)
+            print(f"{modules:>3}x{contents:<4} {name:<28} {count:>8} {elapsed * 1000:>8.1f}")
+
+    status, count, elapsed = measure(client, '/api/employee/my_courses', headers)
+    if status != 200:
+        print(f"my_courses failed with status {status}")
+        return 1
+    print(f"{'all':>8} {'employee my_courses':<28} {count:>8} {elapsed * 1000:>8.1f}")
+
+    growing = [name for name, counts in query_counts.items() if len(counts) > 1]
+    if growing:
+        print(f"Query count depends on course size for: {', '.join(growing)}")
+        return 1
+    print("Query counts are independent of module/content count")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Synthetic dataset for the endpoint benchmarks.
+
+Everything is written with chunked multi-row INSERTs so that tens of
+thousands of rows seed in seconds on SQLite and PostgreSQL alike. The data is
+generated from a fixed random seed, so two runs with the same sizes produce
+the same rows and comparable query counts.
+"""
+
+import datetime
+import random
+from dataclasses import dataclass, field
+
+from sqlalchemy import insert
+
+from models import (db, User, Organization, Course, Module, ModuleContent, QuizQuestion, CourseProgress,
+                    NotificationMessage, NotificationDelivery, organization_courses, user_courses)
+from progress_rollup import rebuild_progress_rollup
+
+CHUNK_SIZE = 5000
+
+
+@dataclass
+class DatasetSize:
+    organizations: int = 5
+    employees: int = 200  # per organization
+    courses: int = 20
+    courses_per_org: int = 10
+    modules: int = 5  # per course
+    contents: int = 4  # per module
+    notifications: int = 10  # broadcasts per organization
+
+
+@dataclass
+class Dataset:
+    """Ids and usernames of the seeded rows that the benchmarks request."""
+    size: DatasetSize
+    admin_username: str
+    org_id: int
+    portal_admin_username: str
+    employee_username: str
+    course_id: int
+    row_counts: dict = field(default_factory=dict)
+
+
+def bulk_insert(target, rows):
+    """Insert rows into a model or table in chunks of CHUNK_SIZE."""
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert(target), rows[start:start + CHUNK_SIZE])
+
+
+def _seed_courses(size):
+    bulk_insert(Course, [{'title': f'Bench course {n}', 'status': 'published'} for n in range(size.courses)])
+    course_ids = [row.id for row in db.session.query(Course.id).order_by(Course.id)]
+    bulk_insert(Module, [
+        {'title': f'Module {n}', 'order': n, 'course_id': course_id}
+        for course_id in course_ids for n in range(size.modules)
+    ])
+    module_ids = [row.id for row in db.session.query(Module.id)]
+    bulk_insert(ModuleContent, [
+        {'title': f'Content {n}', 'content_type': 'quiz' if n % 2 else 'video', 'order': n, 'module_id': module_id}
+        for module_id in module_ids for n in range(size.contents)
+    ])
+    bulk_insert(QuizQuestion, [
+        {'question_text': f'Question {n}', 'question_type': 'single-choice', 'content_id': row.id}
+        for row in db.session.query(ModuleContent.id).filter_by(content_type='quiz') for n in range(3)
+    ])
+    return course_ids
+
+
+def _seed_organization(index, size, course_ids, admin_id, rng, now):
+    org = Organization(name=f'bench-org-{index}', portal_admin=f'bench-admin-{index}',
+                       org_domain=f'org{index}.bench', created=now.date(), status='active')
+    db.session.add(org)
+    db.session.flush()
+    org_course_ids = rng.sample(course_ids, min(size.courses_per_org, len(course_ids)))
+    bulk_insert(organization_courses, [{'organization_id': org.id, 'course_id': course_id}
+                                       for course_id in org_course_ids])
+
+    bulk_insert(User, [{
+        'username': f'bench-admin-{index}', 'password': 'x', 'role': 'portal_admin',
+        'email': f'admin@org{index}.bench', 'org_id': org.id,
+    }] + [{
+        'username': f'bench-{index}-emp-{n}', 'password': 'x', 'role': 'employee',
+        'email': f'emp{n}@org{index}.bench', 'designation': 'Engineer', 'org_id': org.id,
+    } for n in range(size.employees)])
+    employee_ids = [row.id for row in db.session.query(User.id).filter_by(org_id=org.id, role='employee')]
+
+    bulk_insert(user_courses, [{'user_id': user_id, 'course_id': course_id}
+                               for user_id in employee_ids for course_id in org_course_ids])
+    progress_rows = []
+    for user_id in employee_ids:
+        for course_id in org_course_ids:
+            progress = rng.choice((0, 25, 50, 75, 100))
+            progress_rows.append({
+                'user_id': user_id, 'course_id': course_id, 'total_modules': size.modules,
+                'completed_modules': size.modules * progress // 100, 'progress_percentage': progress,
+                'completion_date': now if progress == 100 else None,
+                'risk_score': rng.randint(0, 100), 'module_progress': '{}',
+            })
+    bulk_insert(CourseProgress, progress_rows)
+
+    for n in range(size.notifications):
+        created_at = now - datetime.timedelta(hours=n)
+        message = NotificationMessage(title=f'Bench broadcast {n}', message='Benchmark notification',
+                                      notification_type='general', sender_id=admin_id, organization_id=org.id,
+                                      recipients_count=len(employee_ids), created_at=created_at)
+        db.session.add(message)
+        db.session.flush()
+        bulk_insert(NotificationDelivery, [
+            {'message_id': message.id, 'recipient_id': user_id, 'is_read': rng.random() < 0.5,
+             'created_at': created_at}
+            for user_id in employee_ids
+        ])
+    db.session.commit()
+    return org.id, org_course_ids
+
+
+def seed_dataset(size):
+    """Seed a synthetic dataset of the given DatasetSize into an empty schema and return a Dataset."""
+    rng = random.Random(42)
+    now = datetime.datetime.utcnow()
+
+    admin = User(username='bench-admin', password='x', role='admin', email='admin@bench')
+    db.session.add(admin)
+    db.session.flush()
+    course_ids = _seed_courses(size)
+    organizations = [_seed_organization(index, size, course_ids, admin.id, rng, now)
+                     for index in range(size.organizations)]
+    rebuild_progress_rollup()
+
+    probe = size.organizations // 2
+    org_id, org_course_ids = organizations[probe]
+    return Dataset(
+        size=size,
+        admin_username='bench-admin',
+        org_id=org_id,
+        portal_admin_username=f'bench-admin-{probe}',
+        employee_username=f'bench-{probe}-emp-{size.employees // 2}',
+        course_id=org_course_ids[0],
+        row_counts={
+            'users': db.session.query(User.id).count(),
+            'course_progress': db.session.query(CourseProgress.id).count(),
+            'notification_deliveries': db.session.query(NotificationDelivery.id).count(),
+            'module_contents': db.session.query(ModuleContent.id).count(),
+        }
+    )
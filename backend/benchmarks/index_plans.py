@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the performance indexes added by add_performance_indexes.py.
+
+Builds the schema without those indexes, seeds it with realistic row counts,
+and prints the query plan and timing of the hot lookups before and after
+running the migration. Fails when a lookup still uses a sequential scan
+once the indexes exist.
+
+Works with the default in-memory SQLite database (EXPLAIN QUERY PLAN) or a
+PostgreSQL database given through DATABASE_URL (EXPLAIN), which must be a
+scratch database: its tables are dropped and recreated.
+
+Usage:
+    python -m benchmarks.index_plans [--employees 20000] [--repeat 20]
+"""
+
+import argparse
+import datetime
+import random
+import sys
+import time
+
+from benchmarks.common import record_queries  # noqa: F401  (sets the scratch database defaults)
+
+from sqlalchemy import text
+
+from app import app
+from models import (db, User, Organization, Course, Module, ModuleContent, Simulation, CourseProgress,
+                    Notification, QuizAttempt, SimulationAttempt, AuditLog)
+from add_performance_indexes import PERFORMANCE_INDEXES, add_performance_indexes
+from benchmarks.dataset import bulk_insert
+
+# (label, statement, parameters) of the lookups the indexes are meant for
+PROBES = [
+    ('course_progress by user+course',
+     "SELECT * FROM course_progress WHERE user_id = :user_id AND course_id = :course_id", {}),
+    ('notification unread by recipient',
+     "SELECT id FROM notification WHERE recipient_id = :user_id AND is_read = :is_read "
+     "ORDER BY created_at DESC LIMIT 50", {'is_read': False}),
+    ('user by org+role',
+     "SELECT id FROM \"user\" WHERE org_id = :org_id AND role = 'employee'", {}),
+    ('quiz_attempt by user+content',
+     "SELECT id FROM quiz_attempt WHERE user_id = :user_id AND quiz_content_id = :content_id", {}),
+    ('simulation_attempt by user+simulation',
+     "SELECT id FROM simulation_attempt WHERE user_id = :user_id AND simulation_id = :simulation_id "
+     "ORDER BY attempt_number DESC", {}),
+    ('audit_log latest',
+     "SELECT id FROM audit_log ORDER BY timestamp DESC LIMIT 50", {}),
+    ('module_content by module',
+     "SELECT id FROM module_content WHERE module_id = :module_id ORDER BY \"order\"", {}),
+]
+
+
+def seed(employees, organizations, courses, modules_per_course, contents_per_module):
+    """Insert the synthetic dataset and return the ids used as probe parameters."""
+    rng = random.Random(42)
+    now = datetime.datetime.utcnow()
+
+    bulk_insert(Organization, [
+        {'name': f'Org {n}', 'portal_admin': f'admin{n}', 'org_domain': f'org{n}.test', 'created': now.date()}
+        for n in range(organizations)
+    ])
+    org_ids = [row.id for row in db.session.query(Organization.id)]
+    bulk_insert(User, [
+        {'username': f'user{n}', 'password': 'x', 'email': f'user{n}@bench.test',
+         'role': 'employee' if n % 50 else 'portal_admin', 'org_id': org_ids[n % organizations]}
+        for n in range(employees)
+    ])
+    user_ids = [row.id for row in db.session.query(User.id)]
+
+    bulk_insert(Course, [{'title': f'Course {n}', 'status': 'published'} for n in range(courses)])
+    course_ids = [row.id for row in db.session.query(Course.id)]
+    bulk_insert(Module, [
+        {'title': f'Module {n}', 'order': n, 'course_id': course_id}
+        for course_id in course_ids for n in range(modules_per_course)
+    ])
+    module_ids = [row.id for row in db.session.query(Module.id)]
+    bulk_insert(ModuleContent, [
+        {'title': f'Content {n}', 'content_type': 'quiz' if n % 2 else 'simulation', 'order': n, 'module_id': module_id}
+        for module_id in module_ids for n in range(contents_per_module)
+    ])
+    quiz_ids = [row.id for row in db.session.query(ModuleContent.id).filter_by(content_type='quiz')]
+    simulation_content_ids = [row.id for row in db.session.query(ModuleContent.id).filter_by(content_type='simulation')]
+    bulk_insert(Simulation, [{'content_id': content_id, 'simulation_type': 'interactive'}
+                             for content_id in simulation_content_ids])
+    simulation_ids = [row.id for row in db.session.query(Simulation.id)]
+
+    bulk_insert(CourseProgress, [
+        {'user_id': user_id, 'course_id': course_id, 'total_modules': modules_per_course,
+         'completed_modules': 0, 'progress_percentage': rng.choice((0, 25, 50, 100)), 'risk_score': 0}
+        for user_id in user_ids for course_id in rng.sample(course_ids, min(3, len(course_ids)))
+    ])
+    bulk_insert(Notification, [
+        {'title': 'Bench', 'message': 'Bench notification', 'notification_type': 'general',
+         'sender_id': user_ids[0], 'recipient_id': user_id, 'is_read': bool(n % 2),
+         'created_at': now - datetime.timedelta(minutes=n)}
+        for user_id in user_ids for n in range(3)
+    ])
+    bulk_insert(QuizAttempt, [
+        {'user_id': user_id, 'quiz_content_id': rng.choice(quiz_ids), 'attempt_number': 1,
+         'total_questions': 10, 'correct_answers': rng.randint(0, 10)}
+        for user_id in user_ids
+    ])
+    bulk_insert(SimulationAttempt, [
+        {'user_id': user_id, 'simulation_id': rng.choice(simulation_ids), 'attempt_number': 1, 'total_steps': 5}
+        for user_id in user_ids[::2]
+    ])
+    bulk_insert(AuditLog, [
+        {'user_id': rng.choice(user_ids), 'action': 'login', 'resource_type': 'user',
+         'timestamp': now - datetime.timedelta(seconds=n)}
+        for n in range(employees * 2)
+    ])
+    db.session.commit()
+
+    probe_user = user_ids[len(user_ids) // 2]
+    progress = db.session.query(CourseProgress.course_id).filter_by(user_id=probe_user).first()
+    quiz = db.session.query(QuizAttempt.quiz_content_id).filter_by(user_id=probe_user).first()
+    return {
+        'user_id': probe_user,
+        'course_id': progress.course_id,
+        'org_id': org_ids[len(org_ids) // 2],
+        'content_id': quiz.quiz_content_id,
+        'simulation_id': simulation_ids[0],
+        'module_id': module_ids[len(module_ids) // 2]
+    }
+
+
+def explain(connection, statement, parameters):
+    """Return (plan text, uses_seq_scan) for a statement."""
+    if connection.dialect.name == 'postgresql':
+        lines = [row[0] for row in connection.execute(text(f"EXPLAIN {statement}"), parameters)]
+        plan = ' | '.join(line.strip() for line in lines)
+        return plan, 'Seq Scan' in plan
+    details = [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {statement}"), parameters)]
+    plan = ' | '.join(details)
+    return plan, any(detail.startswith('SCAN') and 'USING' not in detail for detail in details)
+
+
+def time_query(connection, statement, parameters, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        connection.execute(text(statement), parameters).fetchall()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def run_probes(parameters, repeat):
+    results = {}
+    with db.engine.connect() as connection:
+        connection.execute(text("ANALYZE"))
+        for label, statement, extra in PROBES:
+            probe_parameters = {**parameters, **extra}
+            plan, seq_scan = explain(connection, statement, probe_parameters)
+            results[label] = (plan, seq_scan, time_query(connection, statement, probe_parameters, repeat))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--employees', type=int, default=20000)
+    parser.add_argument('--organizations', type=int, default=20)
+    parser.add_argument('--courses', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20, help='Timed executions per query')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        # Start from the pre-migration schema
+        for name, table, columns, unique in PERFORMANCE_INDEXES:
+            db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        db.session.commit()
+
+        print(f"Seeding {args.employees} users...")
+        started = time.perf_counter()
+        parameters = seed(args.employees, args.organizations, args.courses, 10, 4)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s on {db.engine.dialect.name}")
+
+        before = run_probes(parameters, args.repeat)
+    add_performance_indexes()
+    with app.app_context():
+        after = run_probes(parameters, args.repeat)
+
+    still_scanning = []
+    for label, _, _ in PROBES:
+        plan_before, _, ms_before = before[label]
+        plan_after, seq_after, ms_after = after[label]
+        print(f"\n{label}: {ms_before:.3f} ms -> {ms_after:.3f} ms")
+        print(f"  before: {plan_before}")
+        print(f"  after:  {plan_after}")
+        if seq_after:
+            still_scanning.append(label)
+
+    if still_scanning:
+        print(f"\nStill using sequential scans after migration: {', '.join(still_scanning)}")
+        return 1
+    print("\nAll probes use index scans after the migration")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
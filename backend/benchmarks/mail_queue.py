@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the outbound mail queue against a local SMTP stand-in.
+
+Starts an aiosmtpd server on localhost (pip install aiosmtpd), then sends the
+same number of invite emails synchronously (one SMTP connection per message,
+as before the queue existed) and through the mail queue. Reports the time
+the caller is blocked, the total delivery time and the number of SMTP
+connections used, and fails unless every queued message arrives and is
+recorded in EmailMetrics.
+
+Usage:
+    python -m benchmarks.mail_queue [--messages 200] [--latency-ms 5]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+from benchmarks.common import record_queries  # noqa: F401  (sets the scratch database defaults)
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class RecordingHandler:
+    """Accepts every message, optionally after a delay, and remembers who sent it."""
+
+    def __init__(self, latency_seconds):
+        self.latency_seconds = latency_seconds
+        self.recipients = []
+        self.peers = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)  # Simulates a slow relay
+        self.recipients.extend(envelope.rcpt_tos)
+        self.peers.add(session.peer)
+        return '250 Message accepted for delivery'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=5, help='Delay the stand-in adds per message')
+    args = parser.parse_args()
+
+    if Controller is None:
+        print("aiosmtpd is not installed (pip install aiosmtpd)")
+        return 1
+
+    port = free_port()
+    os.environ.update({'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': str(port),
+                       'MAIL_USE_TLS': 'false', 'MAIL_USE_SSL': 'false',
+                       'MAIL_USERNAME': '', 'MAIL_PASSWORD': ''})
+
+    from app import app, mail, send_invite_email
+    from flask_mail import Message
+    from email_queue import mail_queue
+    from models import db, EmailMetrics
+
+    handler = RecordingHandler(args.latency_ms / 1000)
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    try:
+        with app.app_context():
+            db.create_all()
+
+            started = time.perf_counter()
+            for n in range(args.messages):
+                mail.send(Message(subject='Sync', recipients=[f'sync{n}@bench.test'], body='x'))
+            sync_elapsed = time.perf_counter() - started
+            sync_connections = len(handler.peers)
+
+            handler.peers.clear()
+            started = time.perf_counter()
+            for n in range(args.messages):
+                queued, message = send_invite_email(f'queued{n}@bench.test', f'User {n}', 'Bench Org', 'temp-password')
+                if not queued:
+                    print(f"Queueing failed: {message}")
+                    return 1
+            enqueue_elapsed = time.perf_counter() - started
+            if not mail_queue.flush(timeout=120):
+                print("Mail queue did not drain within 120 seconds")
+                return 1
+            queue_elapsed = time.perf_counter() - started
+
+            delivered = sum(1 for recipient in handler.recipients if recipient.startswith('queued'))
+            recorded = EmailMetrics.query.filter_by(template_name='invite', status='sent').count()
+    finally:
+        controller.stop()
+
+    print(f"{'mode':<8} {'blocked ms':>12} {'total ms':>10} {'connections':>12}")
+    print(f"{'sync':<8} {sync_elapsed * 1000:>12.1f} {sync_elapsed * 1000:>10.1f} {sync_connections:>12}")
+    print(f"{'queued':<8} {enqueue_elapsed * 1000:>12.1f} {queue_elapsed * 1000:>10.1f} {len(handler.peers):>12}")
+
+    if delivered != args.messages or recorded != args.messages:
+        print(f"Expected {args.messages} queued messages, {delivered} delivered and {recorded} recorded")
+        return 1
+    print("All queued messages were delivered and recorded")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
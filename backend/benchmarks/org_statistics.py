@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the portal admin organization statistics endpoint.
+
+Seeds organizations of increasing size into a scratch database and records
+the number of SQL statements and the latency of one statistics request per
+size. Both should stay flat as the employee count grows.
+
+Usage:
+    python -m benchmarks.org_statistics [--sizes 100,1000,5000] [--courses 10]
+"""
+
+import argparse
+import datetime
+import random
+import sys
+
+from benchmarks.common import record_queries
+
+from sqlalchemy import insert
+
+from app import app, portal_admin_organization_statistics
+from models import db, User, Organization, Course, CourseProgress, organization_courses
+
+
+def seed_organization(index, employee_count, course_ids):
+    """Insert one organization with its portal admin, employees and progress rows."""
+    org = Organization(
+        name=f'bench-org-{index}',
+        portal_admin=f'bench-admin-{index}',
+        org_domain=f'org{index}.bench',
+        created=datetime.date.today(),
+        status='active'
+    )
+    db.session.add(org)
+    db.session.flush()
+
+    db.session.execute(insert(organization_courses), [
+        {'organization_id': org.id, 'course_id': course_id} for course_id in course_ids
+    ])
+    db.session.execute(insert(User), [{
+        'username': f'bench-admin-{index}',
+        'password': 'x',
+        'role': 'portal_admin',
+        'email': f'admin@org{index}.bench',
+        'org_id': org.id,
+    }] + [{
+        'username': f'bench-{index}-emp-{n}',
+        'password': 'x',
+        'role': 'employee',
+        'email': f'emp{n}@org{index}.bench',
+        'designation': 'Engineer',
+        'org_id': org.id,
+    } for n in range(employee_count)])
+
+    employee_ids = [
+        row.id for row in db.session.query(User.id).filter_by(org_id=org.id, role='employee')
+    ]
+    rng = random.Random(index)
+    progress_rows = []
+    for user_id in employee_ids:
+        for course_id in course_ids:
+            progress = rng.choice([0, 25, 50, 75, 100])
+            progress_rows.append({
+                'user_id': user_id,
+                'course_id': course_id,
+                'total_modules': 4,
+                'completed_modules': progress // 25,
+                'progress_percentage': progress,
+                'completion_date': datetime.datetime.utcnow() if progress == 100 else None,
+                'risk_score': rng.randint(0, 100),
+                'module_progress': '{}',
+            })
+    db.session.execute(insert(CourseProgress), progress_rows)
+    db.session.commit()
+    return f'bench-admin-{index}'
+
+
+def run_statistics(username):
+    """Call the statistics view once and return (status, query_count, seconds)."""
+    with app.test_request_context(
+        '/api/portal_admin/organization_statistics', query_string={'username': username}
+    ), record_queries(db.engine) as queries:
+        response, status = portal_admin_organization_statistics()
+    db.session.remove()
+    return status, queries.count, queries.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100,1000,5000',
+                        help='Comma separated employee counts to benchmark')
+    parser.add_argument('--courses', type=int, default=10, help='Courses per organization')
+    parser.add_argument('--repeat', type=int, default=3, help='Requests per size (best is reported)')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    with app.app_context():
+        db.create_all()
+        courses = [Course(title=f'Bench course {n}', status='published') for n in range(args.courses)]
+        db.session.add_all(courses)
+        db.session.commit()
+        course_ids = [course.id for course in courses]
+
+        print(f"{'employees':>10} {'progress rows':>14} {'queries':>8} {'best ms':>9}")
+        for index, size in enumerate(sizes):
+            username = seed_organization(index, size, course_ids)
+            results = [run_statistics(username) for _ in range(args.repeat)]
+            status = results[0][0]
+            if status != 200:
+                print(f"Statistics request failed with status {status}")
+                return 1
+            query_count = max(result[1] for result in results)
+            best_ms = min(result[2] for result in results) * 1000
+            print(f"{size:>10} {size * len(course_ids):>14} {query_count:>8} {best_ms:>9.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
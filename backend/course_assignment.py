@@ -0,0 +1,171 @@
+"""
+Set-based course assignment into the user_courses association table.
+
+Missing (user_id, course_id) pairs are computed with an anti-join and
+written with a single INSERT ... SELECT (with ON CONFLICT DO NOTHING on
+PostgreSQL, so concurrent assignments cannot collide), instead of loading
+every employee and their course list as ORM objects. All functions return
+row counts and leave committing to the caller.
+"""
+
+from sqlalchemy import select, exists, literal, and_, func
+from sqlalchemy.dialects import postgresql
+from models import db, User, Course, organization_courses, user_courses
+
+
+def _insert_pairs(pairs_select):
+    """INSERT the (user_id, course_id) rows produced by pairs_select, skipping existing ones."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        statement = postgresql.insert(user_courses).from_select(
+            ['user_id', 'course_id'], pairs_select
+        ).on_conflict_do_nothing()
+    else:
+        statement = user_courses.insert().from_select(['user_id', 'course_id'], pairs_select)
+    return db.session.execute(statement).rowcount
+
+
+def _not_assigned(user_id_column, course_id_column):
+    return ~exists().where(and_(
+        user_courses.c.user_id == user_id_column,
+        user_courses.c.course_id == course_id_column
+    ))
+
+
+def assign_course_to_org_employees(org_id, course_id):
+    """Assign a course to every employee of an organization who does not have it yet.
+
+    Returns:
+        (assigned_count, employee_count)
+    """
+    employee_count = db.session.query(func.count(User.id)).filter(
+        User.org_id == org_id, User.role == 'employee'
+    ).scalar() or 0
+
+    pairs = select(User.id, literal(course_id)).where(
+        User.org_id == org_id,
+        User.role == 'employee',
+        _not_assigned(User.id, literal(course_id))
+    )
+    return _insert_pairs(pairs), employee_count
+
+
+def sync_employee_courses_with_organizations(org_id=None):
+    """Make each employee's assigned courses equal to their organization's courses.
+
+    Args:
+        org_id: Only sync employees of this organization (all organizations when None)
+
+    Returns:
+        (removed_count, added_count)
+    """
+    employee_filter = [User.role == 'employee', User.org_id.isnot(None)]
+    if org_id is not None:
+        employee_filter.append(User.org_id == org_id)
+
+    # Remove assignments of courses the employee's organization no longer has
+    employee_ids = select(User.id).where(*employee_filter)
+    offered_by_org = exists().where(and_(
+        User.id == user_courses.c.user_id,
+        organization_courses.c.organization_id == User.org_id,
+        organization_courses.c.course_id == user_courses.c.course_id
+    ))
+    removed_count = db.session.execute(
+        user_courses.delete().where(
+            user_courses.c.user_id.in_(employee_ids),
+            ~offered_by_org
+        )
+    ).rowcount
+
+    # Add every organization course the employee is missing
+    pairs = select(User.id, organization_courses.c.course_id).join(
+        organization_courses, organization_courses.c.organization_id == User.org_id
+    ).where(
+        *employee_filter,
+        _not_assigned(User.id, organization_courses.c.course_id)
+    )
+    added_count = _insert_pairs(pairs)
+    return removed_count, added_count
+
+
+def get_course_assignment_flags(org_id, course_id):
+    """Return the organization's employees with an is_assigned flag for one course.
+
+    A single outer join against user_courses replaces loading every
+    employee's course list.
+    """
+    assignment = user_courses.alias('assignment')
+    rows = db.session.query(
+        User.id, User.username, User.email, User.designation,
+        assignment.c.course_id.isnot(None)
+    ).outerjoin(
+        assignment, and_(assignment.c.user_id == User.id, assignment.c.course_id == course_id)
+    ).filter(
+        User.org_id == org_id, User.role == 'employee'
+    ).order_by(User.id).all()
+
+    return [
+        {
+            'id': user_id,
+            'username': username,
+            'email': email,
+            'designation': designation,
+            'is_assigned': bool(is_assigned)
+        }
+        for user_id, username, email, designation, is_assigned in rows
+    ]
+
+
+def get_course_assignment_matrix(org_id, course_ids=None):
+    """Build the employee x course assignment matrix of an organization in columnar form.
+
+    Args:
+        org_id: Organization whose employees form the rows
+        course_ids: Courses forming the columns (the organization's courses when None)
+
+    Returns:
+        A dictionary with 'employees' and 'courses' as column lists and
+        'assigned' as one row of 0/1 flags per employee, in column order
+    """
+    employees = db.session.query(
+        User.id, User.username, User.email, User.designation
+    ).filter(
+        User.org_id == org_id, User.role == 'employee'
+    ).order_by(User.id).all()
+
+    course_query = db.session.query(Course.id, Course.title)
+    if course_ids is None:
+        course_query = course_query.join(
+            organization_courses, organization_courses.c.course_id == Course.id
+        ).filter(organization_courses.c.organization_id == org_id)
+    else:
+        course_query = course_query.filter(Course.id.in_(course_ids))
+    courses = course_query.order_by(Course.id).all()
+
+    column_index = {course_id: index for index, (course_id, _) in enumerate(courses)}
+    row_index = {employee[0]: index for index, employee in enumerate(employees)}
+    assigned = [[0] * len(courses) for _ in employees]
+    if employees and courses:
+        pairs = db.session.query(user_courses.c.user_id, user_courses.c.course_id).join(
+            User, User.id == user_courses.c.user_id
+        ).filter(
+            User.org_id == org_id,
+            User.role == 'employee',
+            user_courses.c.course_id.in_(list(column_index))
+        ).all()
+        for user_id, course_id in pairs:
+            assigned[row_index[user_id]][column_index[course_id]] = 1
+
+    return {
+        'employees': {
+            'id': [employee[0] for employee in employees],
+            'username': [employee[1] for employee in employees],
+            'email': [employee[2] for employee in employees],
+            'designation': [employee[3] for employee in employees]
+        },
+        'courses': {
+            'id': [course[0] for course in courses],
+            'title': [course[1] for course in courses]
+        },
+        'assigned': assigned,
+        'assigned_counts': [sum(row[index] for row in assigned) for index in range(len(courses))]
+    }
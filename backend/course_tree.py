@@ -0,0 +1,68 @@
+"""
+Course tree loader shared by the course detail endpoints.
+
+Loads courses with their modules and module contents in a fixed number of
+queries (courses, modules, contents) instead of lazy loading one module list
+per course and one content list per module. Ordering is done in SQL and the
+loaded children are attached to the ORM objects, so code that walks
+``course.modules`` / ``module.contents`` afterwards issues no further queries.
+"""
+
+from sqlalchemy import func
+from sqlalchemy.orm.attributes import set_committed_value
+from models import db, Course, Module, ModuleContent, QuizQuestion
+
+
+def load_course_trees(course_ids):
+    """Load courses with modules and contents populated in display order.
+
+    Args:
+        course_ids: Iterable of course ids to load
+
+    Returns:
+        A dictionary mapping course id to Course for the courses that exist
+    """
+    course_ids = list(dict.fromkeys(course_ids))
+    if not course_ids:
+        return {}
+
+    courses = Course.query.filter(Course.id.in_(course_ids)).all()
+    modules = Module.query.filter(
+        Module.course_id.in_(course_ids)
+    ).order_by(Module.course_id, Module.order, Module.id).all()
+    contents = ModuleContent.query.join(
+        Module, Module.id == ModuleContent.module_id
+    ).filter(
+        Module.course_id.in_(course_ids)
+    ).order_by(ModuleContent.module_id, ModuleContent.order, ModuleContent.id).all()
+
+    contents_by_module = {}
+    for content in contents:
+        contents_by_module.setdefault(content.module_id, []).append(content)
+
+    modules_by_course = {}
+    for module in modules:
+        set_committed_value(module, 'contents', contents_by_module.get(module.id, []))
+        modules_by_course.setdefault(module.course_id, []).append(module)
+
+    for course in courses:
+        set_committed_value(course, 'modules', modules_by_course.get(course.id, []))
+
+    return {course.id: course for course in courses}
+
+
+def load_course_tree(course_id):
+    """Load a single course tree, or None if the course does not exist."""
+    return load_course_trees([course_id]).get(course_id)
+
+
+def count_quiz_questions(content_ids):
+    """Return a dictionary mapping content id to its number of quiz questions."""
+    content_ids = list(content_ids)
+    if not content_ids:
+        return {}
+    return dict(db.session.query(
+        QuizQuestion.content_id, func.count(QuizQuestion.id)
+    ).filter(
+        QuizQuestion.content_id.in_(content_ids)
+    ).group_by(QuizQuestion.content_id).all())
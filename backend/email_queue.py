@@ -0,0 +1,247 @@
+"""
+Outbound mail queue for invite and password reset emails.
+
+Sending over SMTP inside a request costs a TCP/TLS handshake and login per
+message and blocks the response on the mail server. Requests instead put the
+message on an in-memory queue and return; one sender thread per process
+drains it in batches of up to MAIL_BATCH_SIZE messages over a single SMTP
+connection, which stays open between batches until it has been idle for
+MAIL_CONNECTION_IDLE_SECONDS (Flask-Mail still reconnects after
+MAIL_MAX_EMAILS messages when that is set).
+
+A message that fails with a temporary error (connection lost, 4xx reply) is
+retried with exponential backoff starting at MAIL_RETRY_BACKOFF_SECONDS, up
+to MAIL_MAX_ATTEMPTS attempts; permanent errors (5xx replies, refused
+recipients) are not retried. The outcome of every message is recorded as an
+EmailMetrics row (status sent or failed).
+
+Messages carry plain-text temporary passwords, so they are deliberately
+never written to the database; messages still queued when the process
+exits are flushed for up to MAIL_SHUTDOWN_SECONDS.
+
+Configuration (environment variables):
+    MAIL_QUEUE_MAX_SIZE            messages held before enqueueing fails (default 10000)
+    MAIL_BATCH_SIZE                messages sent per batch (default 50)
+    MAIL_CONNECTION_IDLE_SECONDS   idle time before the SMTP connection is closed (default 30)
+    MAIL_MAX_ATTEMPTS              attempts per message (default 5)
+    MAIL_RETRY_BACKOFF_SECONDS     delay before the first retry, doubled per attempt (default 30)
+    MAIL_SHUTDOWN_SECONDS          time spent flushing the queue at exit (default 10)
+"""
+
+import atexit
+import datetime
+import heapq
+import itertools
+import os
+import queue
+import smtplib
+import threading
+import time
+from sqlalchemy import insert
+from models import db, EmailMetrics
+
+MAIL_QUEUE_MAX_SIZE = int(os.getenv('MAIL_QUEUE_MAX_SIZE', 10000))
+MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', 50))
+MAIL_CONNECTION_IDLE_SECONDS = float(os.getenv('MAIL_CONNECTION_IDLE_SECONDS', 30))
+MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', 5))
+MAIL_RETRY_BACKOFF_SECONDS = float(os.getenv('MAIL_RETRY_BACKOFF_SECONDS', 30))
+MAIL_SHUTDOWN_SECONDS = float(os.getenv('MAIL_SHUTDOWN_SECONDS', 10))
+
+
+class MailQueueFull(Exception):
+    """Raised when the outbound mail queue is full."""
+
+
+class _Outgoing:
+    __slots__ = ('message', 'template_name', 'attempts')
+
+    def __init__(self, message, template_name):
+        self.message = message
+        self.template_name = template_name
+        self.attempts = 0
+
+
+def is_permanent_failure(error):
+    """True for SMTP errors that retrying will not fix."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class MailQueue:
+    """Sends queued Flask-Mail messages from a background thread over a reused SMTP connection."""
+
+    def __init__(self, app=None, mail=None):
+        self.app = app
+        self.mail = mail
+        self._queue = queue.Queue(maxsize=MAIL_QUEUE_MAX_SIZE)
+        self._retries = []  # heap of (due monotonic time, sequence, _Outgoing)
+        self._sequence = itertools.count()
+        self._connection = None
+        self._last_used = 0.0
+        self._in_flight = 0
+        self._idle = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def init_app(self, app, mail):
+        self.app = app
+        self.mail = mail
+        atexit.register(self.stop, MAIL_SHUTDOWN_SECONDS)
+
+    def enqueue(self, message, template_name):
+        """Queue a message for delivery. Raises MailQueueFull if the queue is full."""
+        self._ensure_thread()
+        with self._idle:
+            self._in_flight += 1
+        try:
+            self._queue.put_nowait(_Outgoing(message, template_name))
+        except queue.Full:
+            self._finished(1)
+            raise MailQueueFull('Outbound mail queue is full')
+
+    def flush(self, timeout=None):
+        """Wait until every queued message (including pending retries) is sent or failed.
+
+        Returns False if the timeout expired first.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout)
+
+    def stop(self, timeout=None):
+        """Flush for up to timeout seconds, then stop the sender thread."""
+        self.flush(timeout)
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _finished(self, count):
+        with self._idle:
+            self._in_flight -= count
+            if self._in_flight == 0:
+                self._idle.notify_all()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='mail-sender', daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self):
+        """Block until messages are due and return up to MAIL_BATCH_SIZE of them."""
+        batch = []
+        now = time.monotonic()
+        while self._retries and self._retries[0][0] <= now and len(batch) < MAIL_BATCH_SIZE:
+            batch.append(heapq.heappop(self._retries)[2])
+        if not batch:
+            timeout = MAIL_CONNECTION_IDLE_SECONDS if self._connection else 1.0
+            if self._retries:
+                timeout = min(timeout, max(0.0, self._retries[0][0] - now))
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                return batch
+        while len(batch) < MAIL_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _open(self):
+        if self._connection is None:
+            connection = self.mail.connect()
+            connection.__enter__()
+            self._connection = connection
+        return self._connection
+
+    def _close(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except Exception as e:
+                print(f"Closing SMTP connection failed: {str(e)}")
+
+    def _send(self, item):
+        """Send one message, reconnecting once if the pooled connection has gone away."""
+        for reconnect in (False, True):
+            try:
+                self._open().send(item.message)
+                self._last_used = time.monotonic()
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                self._close()
+                if reconnect:
+                    raise e
+
+    def _run(self):
+        while not (self._stopped.is_set() and self._queue.empty() and not self._retries):
+            batch = self._next_batch()
+            if not batch:
+                if self._connection and time.monotonic() - self._last_used >= MAIL_CONNECTION_IDLE_SECONDS:
+                    self._close()
+                continue
+            try:
+                with self.app.app_context():
+                    self._deliver(batch)
+            except Exception as e:
+                # Never let the sender thread die; the batch is already accounted for in _deliver
+                print(f"Mail sender error: {str(e)}")
+        self._close()
+
+    def _deliver(self, batch):
+        results = []
+        done = 0
+        for item in batch:
+            item.attempts += 1
+            try:
+                self._send(item)
+                results.append(self._result(item, 'sent', None))
+                done += 1
+            except Exception as e:
+                self._close()
+                if is_permanent_failure(e) or item.attempts >= MAIL_MAX_ATTEMPTS:
+                    print(f"Failed to send {item.template_name} email to {item.message.recipients}: {str(e)}")
+                    results.append(self._result(item, 'failed', str(e)))
+                    done += 1
+                else:
+                    delay = MAIL_RETRY_BACKOFF_SECONDS * 2 ** (item.attempts - 1)
+                    heapq.heappush(self._retries, (time.monotonic() + delay, next(self._sequence), item))
+        try:
+            if results:
+                db.session.execute(insert(EmailMetrics.__table__), results)
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Recording email metrics failed: {str(e)}")
+        finally:
+            db.session.remove()
+            self._finished(done)
+
+    @staticmethod
+    def _result(item, status, error):
+        return {
+            'template_name': item.template_name,
+            'recipient_email': ', '.join(item.message.recipients)[:120],
+            'sent_at': datetime.datetime.utcnow(),
+            'status': status,
+            'error_message': error
+        }
+
+
+mail_queue = MailQueue()
+
+
+def queue_email(message, template_name):
+    """Queue a message and return (queued, status message) like the synchronous senders did."""
+    try:
+        mail_queue.enqueue(message, template_name)
+        return True, "Email queued for delivery"
+    except MailQueueFull as e:
+        print(f"Failed to queue {template_name} email: {str(e)}")
+        return False, f"Failed to send email: {str(e)}"
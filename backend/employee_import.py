@@ -0,0 +1,222 @@
+"""
+Bulk employee import from a CSV file.
+
+The upload is read as a stream, one chunk of EMPLOYEE_IMPORT_CHUNK_SIZE rows
+at a time, and never held in memory as a whole. For each chunk:
+
+    1. rows are validated and checked against earlier rows of the file
+    2. usernames and emails are checked against existing users with one
+       IN query each, compared as sets
+    3. passwords are hashed in parallel on the bcrypt pool
+    4. users are written with one bulk INSERT (falling back to one INSERT per
+       row in a savepoint if a concurrent request created a clashing user)
+    5. the organization's courses are assigned with one bulk INSERT
+    6. the chunk is committed and the invite emails are queued
+
+Columns (header row required): email, designation, and optionally username
+(default: the part of the email before @) and password (default: a
+generated temporary password, hashed with TEMP_PASSWORD_BCRYPT_ROUNDS).
+Each data row gets an entry in the report with status created, skipped
+(user already exists or repeated in the file) or invalid.
+
+Configuration (environment variables):
+    EMPLOYEE_IMPORT_CHUNK_SIZE   rows per chunk (default 500)
+"""
+
+import codecs
+import csv
+import os
+from sqlalchemy import insert, func
+from sqlalchemy.exc import IntegrityError
+from models import db, User, organization_courses, user_courses
+from password_hashing import hash_passwords, temp_password_rounds
+
+IMPORT_CHUNK_SIZE = int(os.getenv('EMPLOYEE_IMPORT_CHUNK_SIZE', 500))
+REQUIRED_COLUMNS = ('email', 'designation')
+
+# Column sizes of the User table
+MAX_USERNAME_LENGTH = 80
+MAX_EMAIL_LENGTH = 120
+MAX_DESIGNATION_LENGTH = 120
+
+
+class ImportFileError(ValueError):
+    """Raised when the uploaded file cannot be read as an employee CSV."""
+
+
+def read_rows(stream):
+    """Yield (line number, row dict) for each data row of a CSV byte stream."""
+    # Decode line by line; works for spooled uploads and the raw request stream alike
+    reader = csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig'))
+    columns = [name.strip().lower() for name in reader.fieldnames or []]
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ImportFileError(f"Missing column(s): {', '.join(missing)}")
+    reader.fieldnames = columns
+    for row in reader:
+        if not any((value or '').strip() for key, value in row.items() if key is not None):
+            continue  # Blank line
+        yield reader.line_num, {key: (value or '').strip() for key, value in row.items() if key is not None}
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _validate(line, row):
+    """Return (record, report entry) for a row; record is None when it is invalid."""
+    email = row.get('email', '').lower()
+    username = row.get('username') or email.split('@')[0]
+    entry = {'row': line, 'email': email, 'username': username}
+    error = None
+    if not email:
+        error = 'email is required'
+    elif '@' not in email or '.' not in email:
+        error = 'Invalid email format'
+    elif not row.get('designation'):
+        error = 'designation is required'
+    elif len(email) > MAX_EMAIL_LENGTH:
+        error = f'email is longer than {MAX_EMAIL_LENGTH} characters'
+    elif not username or len(username) > MAX_USERNAME_LENGTH:
+        error = f'username must be 1 to {MAX_USERNAME_LENGTH} characters'
+    elif len(row['designation']) > MAX_DESIGNATION_LENGTH:
+        error = f'designation is longer than {MAX_DESIGNATION_LENGTH} characters'
+    if error:
+        entry.update(status='invalid', error=error)
+        return None, entry
+    return {
+        'username': username,
+        'email': email,
+        'designation': row['designation'],
+        'password': row.get('password') or None
+    }, entry
+
+
+def _insert_users(records):
+    """Insert user rows, returning the records that were written and those that clashed."""
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(User), records)
+        return records, []
+    except IntegrityError:
+        # Someone created one of these users since the lookup; find out which row by row
+        inserted, clashed = [], []
+        for record in records:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(User), [record])
+                inserted.append(record)
+            except IntegrityError:
+                clashed.append(record)
+        return inserted, clashed
+
+
+def import_employees(stream, org_id, generate_password, send_invite, chunk_size=None):
+    """Create employees of an organization from a CSV byte stream.
+
+    Args:
+        stream: Binary file-like object with the CSV
+        org_id: Organization the employees join
+        generate_password: Callable returning a temporary password
+        send_invite: Callable (email, username, password) -> (queued, message),
+            called for each created employee after its chunk is committed
+        chunk_size: Rows per chunk
+
+    Returns:
+        A dictionary with created/skipped/invalid counts, one report entry
+        per data row and an error message if the file could not be read to
+        the end (chunks before the error are kept)
+    """
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    report = {'created': 0, 'skipped': 0, 'invalid': 0, 'rows': [], 'error': None}
+    seen_usernames, seen_emails = set(), set()
+    course_ids = [course_id for (course_id,) in db.session.query(organization_courses.c.course_id).filter(
+        organization_courses.c.organization_id == org_id)]
+
+    try:
+        for chunk in _chunks(read_rows(stream), chunk_size):
+            records, entries = [], []
+            for line, row in chunk:
+                record, entry = _validate(line, row)
+                report['rows'].append(entry)
+                if record is None:
+                    continue
+                if record['username'] in seen_usernames or record['email'] in seen_emails:
+                    entry.update(status='skipped', error='Repeated earlier in the file')
+                    continue
+                seen_usernames.add(record['username'])
+                seen_emails.add(record['email'])
+                records.append(record)
+                entries.append(entry)
+
+            existing_usernames = {username for (username,) in db.session.query(User.username).filter(
+                User.username.in_([record['username'] for record in records]))} if records else set()
+            # Emails from the file are lowercased; existing accounts may be stored in mixed case
+            existing_emails = {email for (email,) in db.session.query(func.lower(User.email)).filter(
+                func.lower(User.email).in_([record['email'] for record in records]))} if records else set()
+
+            new_records, new_entries = [], []
+            for record, entry in zip(records, entries):
+                if record['username'] in existing_usernames:
+                    entry.update(status='skipped', error='Username already exists')
+                elif record['email'] in existing_emails:
+                    entry.update(status='skipped', error='User with this email already exists')
+                else:
+                    new_records.append(record)
+                    new_entries.append(entry)
+            if not new_records:
+                continue
+
+            # Passwords from the file get the full cost; generated ones may use the cheaper temporary cost
+            given = [record for record in new_records if record['password']]
+            generated = [record for record in new_records if not record['password']]
+            for record in generated:
+                record['password'] = generate_password()
+            for records_group, rounds in ((given, None), (generated, temp_password_rounds())):
+                hashes = hash_passwords([record['password'] for record in records_group], rounds)
+                for record, password_hash in zip(records_group, hashes):
+                    record['password_hash'] = password_hash
+
+            inserted, clashed = _insert_users([
+                {
+                    'username': record['username'],
+                    'email': record['email'],
+                    'designation': record['designation'],
+                    'password': record['password_hash'],
+                    'org_id': org_id,
+                    'role': 'employee'
+                }
+                for record in new_records
+            ])
+            inserted_emails = {record['email'] for record in inserted}
+            user_ids = dict(db.session.query(User.email, User.id).filter(
+                User.email.in_(inserted_emails))) if inserted_emails else {}
+
+            if course_ids and user_ids:
+                db.session.execute(insert(user_courses), [
+                    {'user_id': user_id, 'course_id': course_id}
+                    for user_id in user_ids.values() for course_id in course_ids
+                ])
+            db.session.commit()
+
+            for record, entry in zip(new_records, new_entries):
+                if record['email'] not in inserted_emails:
+                    entry.update(status='skipped', error='User already exists')
+                    continue
+                queued, email_message = send_invite(record['email'], record['username'], record['password'])
+                entry.update(status='created', user_id=user_ids.get(record['email']),
+                             email_sent=queued, email_message=email_message)
+    except (ImportFileError, csv.Error, UnicodeDecodeError) as e:
+        db.session.rollback()
+        report['error'] = f'Could not read the file: {str(e)}'
+
+    for entry in report['rows']:
+        report[entry['status']] += 1
+    return report
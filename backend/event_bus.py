@@ -0,0 +1,240 @@
+"""
+Internal publish/subscribe bus for server-sent event streams.
+
+Events are published on named channels (e.g. ``user:42``) and delivered to the
+subscriptions of the current process. Two backends are available:
+    memory   - in-process only, for a single server process (default)
+    postgres - events are sent with NOTIFY on one PostgreSQL channel and every
+               process LISTENs on it, so streams work across several workers
+
+Writers normally use publish_after_commit(), which holds the event until the
+session commits (and drops it on rollback), so subscribers never hear about
+rows they cannot read yet.
+
+Configuration (environment variables):
+    EVENT_BUS_BACKEND       memory | postgres (default memory)
+    EVENT_BUS_PG_CHANNEL    PostgreSQL NOTIFY channel (default lms_events)
+    EVENT_BUS_QUEUE_SIZE    buffered events per subscription (default 100)
+    SSE_HEARTBEAT_SECONDS   keep-alive comment interval on streams (default 15)
+"""
+
+import json
+import os
+import queue
+import select
+import threading
+import time
+from flask import Response, stream_with_context
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+QUEUE_SIZE = int(os.getenv('EVENT_BUS_QUEUE_SIZE', 100))
+HEARTBEAT_SECONDS = int(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+MAX_NOTIFY_PAYLOAD = 7500
+
+
+class Subscription:
+    """Buffered queue of events for one connected client."""
+
+    def __init__(self, channels):
+        self.channels = tuple(channels)
+        self.events = queue.Queue(maxsize=QUEUE_SIZE)
+        self.dropped = 0
+
+    def deliver(self, event_type, data):
+        try:
+            self.events.put_nowait((event_type, data))
+        except queue.Full:
+            # A stalled client loses events rather than blocking publishers
+            self.dropped += 1
+
+    def get(self, timeout):
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class InProcessEventBus:
+    """Delivers events to the subscriptions of this process."""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, *channels):
+        subscription = Subscription(channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({subscription for subscribers in self._subscriptions.values() for subscription in subscribers})
+
+    def dispatch(self, channels, event_type, data):
+        with self._lock:
+            targets = set()
+            for channel in channels:
+                targets.update(self._subscriptions.get(channel, ()))
+        for subscription in targets:
+            subscription.deliver(event_type, data)
+
+    def publish(self, channels, event_type, data):
+        """Publish one event to one or more channels."""
+        self.dispatch(channels, event_type, data)
+
+
+class PostgresEventBus(InProcessEventBus):
+    """Fans events out to every process through PostgreSQL LISTEN/NOTIFY."""
+
+    def __init__(self, pg_channel='lms_events'):
+        super().__init__()
+        self.pg_channel = pg_channel
+        self._engine = None
+        self._listener = None
+
+    def _bind(self):
+        if self._engine is None:
+            from models import db
+            self._engine = db.engine
+        return self._engine
+
+    def _payloads(self, channels, event_type, data):
+        """Split the channel list so every NOTIFY payload stays under the size limit."""
+        base_size = len(json.dumps({'channels': [], 'type': event_type, 'data': data}).encode())
+        batch, size = [], base_size
+        for channel in channels:
+            channel_size = len(json.dumps(channel).encode()) + 2  # Separator ", "
+            if batch and size + channel_size > MAX_NOTIFY_PAYLOAD:
+                yield json.dumps({'channels': batch, 'type': event_type, 'data': data})
+                batch, size = [], base_size
+            batch.append(channel)
+            size += channel_size
+        if batch:
+            yield json.dumps({'channels': batch, 'type': event_type, 'data': data})
+
+    def publish(self, channels, event_type, data):
+        try:
+            with self._bind().connect() as connection:
+                for payload in self._payloads(list(channels), event_type, data):
+                    if len(payload.encode()) > MAX_NOTIFY_PAYLOAD:
+                        print(f"Event bus: dropping oversized {event_type} event")
+                        continue
+                    connection.execute(text("SELECT pg_notify(:channel, :payload)"),
+                                       {'channel': self.pg_channel, 'payload': payload})
+                connection.commit()
+        except Exception as e:
+            # Fall back to local delivery so single-process setups keep working
+            print(f"Event bus NOTIFY failed, delivering locally: {e}")
+            self.dispatch(channels, event_type, data)
+
+    def subscribe(self, *channels):
+        self._ensure_listener()
+        return super().subscribe(*channels)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._bind()
+                self._listener = threading.Thread(target=self._listen, name='event-bus-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        # Dedicated DBAPI connection outside the pool, held for the life of the process
+        dialect = self._engine.dialect
+        while True:
+            connection = None
+            try:
+                cargs, cparams = dialect.create_connect_args(self._engine.url)
+                connection = dialect.loaded_dbapi.connect(*cargs, **cparams)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.pg_channel}"')
+                print(f"Event bus listening on PostgreSQL channel {self.pg_channel}")
+                while True:
+                    if select.select([connection], [], [], HEARTBEAT_SECONDS) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notification = connection.notifies.pop(0)
+                        try:
+                            message = json.loads(notification.payload)
+                            self.dispatch(message['channels'], message['type'], message['data'])
+                        except Exception as e:
+                            print(f"Event bus: ignoring malformed notification: {e}")
+            except Exception as e:
+                print(f"Event bus listener error, reconnecting: {e}")
+                time.sleep(5)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+
+def create_event_bus_from_env():
+    if os.getenv('EVENT_BUS_BACKEND', 'memory').lower() == 'postgres':
+        return PostgresEventBus(os.getenv('EVENT_BUS_PG_CHANNEL', 'lms_events'))
+    return InProcessEventBus()
+
+
+event_bus = create_event_bus_from_env()
+
+
+def publish_after_commit(session, channels, event_type, data):
+    """Queue an event on the session; it is published when the session commits."""
+    session.info.setdefault('event_bus_pending', []).append((list(channels), event_type, data))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_pending_events(session):
+    pending = session.info.pop('event_bus_pending', None)
+    for channels, event_type, data in pending or ():
+        try:
+            event_bus.publish(channels, event_type, data)
+        except Exception as e:
+            print(f"Event bus publish failed: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_events(session):
+    session.info.pop('event_bus_pending', None)
+
+
+def format_sse(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(subscription, initial_events=()):
+    """Stream a subscription as text/event-stream, with heartbeats, until the client disconnects."""
+    def generate():
+        try:
+            for event_type, data in initial_events:
+                yield format_sse(event_type, data)
+            while True:
+                item = subscription.get(timeout=HEARTBEAT_SECONDS)
+                if item is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(*item)
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
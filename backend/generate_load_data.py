@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Generate a large synthetic tenant population for load and performance testing.
+
+Organization sizes follow a Zipf distribution, so a few organizations hold
+most of the employees and the long tail is made of small ones. Per-user
+activity (quiz attempts, simulation attempts, audit events) is skewed the
+same way through an exponential distribution.
+
+Employees are generated organization by organization in chunks of
+--chunk-size users; every row that belongs to a chunk (course assignments,
+progress, attempts, notification deliveries, audit log) is written and
+committed before the next chunk is built, so memory stays bounded no matter
+how many rows are produced. On PostgreSQL rows are written with COPY, on
+other databases with multi-row INSERTs.
+
+Writes to the database configured for the app (DATABASE_URL or DB_*).
+Never run it against a production database.
+
+Usage:
+    python generate_load_data.py --users 1000000 --organizations 2000 [--reset]
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import random
+import sys
+import time
+
+import bcrypt
+from sqlalchemy import insert, text
+
+from app import app
+from models import (db, User, Organization, Course, Module, ModuleContent, Simulation, CourseProgress, QuizAttempt,
+                    SimulationAttempt, NotificationMessage, NotificationDelivery, AuditLog, organization_courses,
+                    user_courses)
+from progress_rollup import rebuild_progress_rollup
+
+AUDIT_ACTIONS = ('login', 'logout', 'view_course', 'complete_module', 'submit_quiz', 'update_profile')
+
+
+class RowWriter:
+    """Writes batches of row dicts to a table, with COPY on PostgreSQL and INSERT elsewhere."""
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        self.use_copy = db.engine.dialect.name == 'postgresql'
+        self.counts = {}
+
+    def write(self, target, rows):
+        table = getattr(target, '__table__', target)
+        for start in range(0, len(rows), self.chunk_size):
+            chunk = rows[start:start + self.chunk_size]
+            if self.use_copy:
+                self._copy(table, chunk)
+            else:
+                db.session.execute(insert(table), chunk)
+        self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+
+    def _copy(self, table, rows):
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([self._csv_value(row[column]) for column in columns])
+        buffer.seek(0)
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        cursor = db.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f'COPY "{table.name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _csv_value(value):
+        # An unquoted empty field is NULL in COPY csv format
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        return value
+
+
+def organization_sizes(users, organizations, skew):
+    """Split users over organizations with Zipf weights; every organization gets at least one employee."""
+    weights = [1 / (rank ** skew) for rank in range(1, organizations + 1)]
+    total = sum(weights)
+    sizes = [max(1, int(users * weight / total)) for weight in weights]
+    sizes[0] += max(0, users - sum(sizes))
+    return sizes
+
+
+def skewed_count(rng, mean):
+    """Non-negative activity count with an exponential (long-tailed) distribution around mean."""
+    return int(rng.expovariate(1 / mean)) if mean > 0 else 0
+
+
+def random_time(rng, now, days):
+    return now - datetime.timedelta(seconds=rng.randint(0, days * 86400))
+
+
+def seed_catalog(writer, courses, modules, contents):
+    """Create the course catalog and return (course_ids, quiz_content_ids, simulation_ids)."""
+    writer.write(Course, [{'title': f'Load course {n}', 'status': 'published'} for n in range(courses)])
+    course_ids = [row.id for row in db.session.query(Course.id).order_by(Course.id)]
+    writer.write(Module, [{'title': f'Module {n}', 'order': n, 'course_id': course_id}
+                          for course_id in course_ids for n in range(modules)])
+    module_ids = [row.id for row in db.session.query(Module.id)]
+    content_types = ('video', 'quiz', 'pdf', 'simulation')
+    writer.write(ModuleContent, [
+        {'title': f'Content {n}', 'content_type': content_types[n % len(content_types)], 'order': n,
+         'module_id': module_id}
+        for module_id in module_ids for n in range(contents)
+    ])
+    quiz_content_ids = [row.id for row in db.session.query(ModuleContent.id).filter_by(content_type='quiz')]
+    writer.write(Simulation, [
+        {'content_id': row.id, 'simulation_type': 'interactive'}
+        for row in db.session.query(ModuleContent.id).filter_by(content_type='simulation')
+    ])
+    simulation_ids = [row.id for row in db.session.query(Simulation.id)]
+    db.session.commit()
+    return course_ids, quiz_content_ids, simulation_ids
+
+
+def seed_employee_chunk(writer, rng, args, org_id, user_ids, org_course_ids, catalog, broadcasts, now):
+    """Write every activity row that belongs to one chunk of employees."""
+    _, quiz_content_ids, simulation_ids = catalog
+    assignments, progress_rows, quiz_rows, simulation_rows, audit_rows = [], [], [], [], []
+    for user_id in user_ids:
+        assigned = rng.sample(org_course_ids, min(len(org_course_ids), max(1, skewed_count(rng, args.courses_per_user))))
+        for course_id in assigned:
+            assignments.append({'user_id': user_id, 'course_id': course_id})
+            progress = rng.choice((0, 0, 10, 25, 50, 75, 90, 100, 100))
+            progress_rows.append({
+                'user_id': user_id, 'course_id': course_id, 'total_modules': args.modules,
+                'completed_modules': args.modules * progress // 100, 'progress_percentage': progress,
+                'last_activity': random_time(rng, now, 90),
+                'completion_date': random_time(rng, now, 90) if progress == 100 else None,
+                'risk_score': rng.randint(0, 100), 'module_progress': '{}'
+            })
+        for attempt in range(skewed_count(rng, args.quiz_attempts_per_user) if quiz_content_ids else 0):
+            correct = rng.randint(0, 10)
+            started_at = random_time(rng, now, 365)
+            quiz_rows.append({
+                'user_id': user_id, 'quiz_content_id': rng.choice(quiz_content_ids), 'attempt_number': attempt + 1,
+                'score': correct * 10.0, 'total_questions': 10, 'correct_answers': correct,
+                'time_taken_minutes': rng.randint(1, 30), 'started_at': started_at,
+                'completed_at': started_at + datetime.timedelta(minutes=rng.randint(1, 30))
+            })
+        for attempt in range(skewed_count(rng, args.simulation_attempts_per_user) if simulation_ids else 0):
+            completed_steps = rng.randint(0, 5)
+            simulation_rows.append({
+                'user_id': user_id, 'simulation_id': rng.choice(simulation_ids), 'attempt_number': attempt + 1,
+                'score': completed_steps * 20.0, 'completed_steps': completed_steps, 'total_steps': 5,
+                'started_at': random_time(rng, now, 365), 'completed_at': None
+            })
+        for _ in range(skewed_count(rng, args.audit_logs_per_user)):
+            audit_rows.append({
+                'user_id': user_id, 'action': rng.choice(AUDIT_ACTIONS), 'resource_type': 'course',
+                'resource_id': rng.choice(org_course_ids), 'ip_address': '10.0.0.1',
+                'timestamp': random_time(rng, now, 365)
+            })
+
+    writer.write(user_courses, assignments)
+    writer.write(CourseProgress, progress_rows)
+    writer.write(QuizAttempt, quiz_rows)
+    writer.write(SimulationAttempt, simulation_rows)
+    writer.write(AuditLog, audit_rows)
+    for message_id, created_at in broadcasts:
+        writer.write(NotificationDelivery, [
+            {'message_id': message_id, 'recipient_id': user_id, 'is_read': rng.random() < 0.6,
+             'created_at': created_at}
+            for user_id in user_ids
+        ])
+    db.session.commit()
+
+
+def seed_organization(writer, rng, args, index, size, catalog, password_hash, now):
+    course_ids = catalog[0]
+    org = Organization(name=f'loadtest-org-{index}', portal_admin=f'loadtest-admin-{index}',
+                       org_domain=f'org{index}.loadtest', created=now.date(), status='active')
+    db.session.add(org)
+    db.session.flush()
+    org_course_ids = rng.sample(course_ids, min(len(course_ids), args.courses_per_org))
+    writer.write(organization_courses, [{'organization_id': org.id, 'course_id': course_id}
+                                        for course_id in org_course_ids])
+    admin = User(username=f'loadtest-admin-{index}', password=password_hash, role='portal_admin',
+                 email=f'admin@org{index}.loadtest', org_id=org.id)
+    db.session.add(admin)
+    db.session.flush()
+
+    broadcasts = []
+    for n in range(args.notifications_per_org):
+        message = NotificationMessage(title=f'Announcement {n}', message='Load test broadcast',
+                                      notification_type='announcement', sender_id=admin.id, organization_id=org.id,
+                                      recipients_count=size, created_at=random_time(rng, now, 180))
+        db.session.add(message)
+        db.session.flush()
+        broadcasts.append((message.id, message.created_at))
+    db.session.commit()
+
+    last_user_id = admin.id
+    for start in range(0, size, args.chunk_size):
+        writer.write(User, [{
+            'username': f'loadtest-{index}-{n}', 'password': password_hash, 'role': 'employee',
+            'email': f'emp{n}@org{index}.loadtest', 'designation': 'Employee', 'org_id': org.id,
+            'created_at': random_time(rng, now, 730)
+        } for n in range(start, min(size, start + args.chunk_size))])
+        user_ids = [row.id for row in db.session.query(User.id).filter(
+            User.org_id == org.id, User.id > last_user_id).order_by(User.id)]
+        last_user_id = user_ids[-1]
+        seed_employee_chunk(writer, rng, args, org.id, user_ids, org_course_ids, catalog, broadcasts, now)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000, help='Total employees over all organizations')
+    parser.add_argument('--organizations', type=int, default=500)
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of organization sizes')
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--modules', type=int, default=6, help='Modules per course')
+    parser.add_argument('--contents', type=int, default=4, help='Contents per module')
+    parser.add_argument('--courses-per-org', type=int, default=30)
+    parser.add_argument('--courses-per-user', type=float, default=5, help='Mean assigned courses per employee')
+    parser.add_argument('--quiz-attempts-per-user', type=float, default=4)
+    parser.add_argument('--simulation-attempts-per-user', type=float, default=1)
+    parser.add_argument('--audit-logs-per-user', type=float, default=10)
+    parser.add_argument('--notifications-per-org', type=int, default=5)
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Employees (and rows per write) per batch')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='Drop and recreate all tables first')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.datetime.utcnow()
+    # Every generated user shares one password, hashed once
+    password_hash = bcrypt.hashpw(b'loadtest-password', bcrypt.gensalt()).decode('utf-8')
+    sizes = organization_sizes(args.users, args.organizations, args.skew)
+    print(f"Largest organizations: {sizes[:5]}, smallest: {sizes[-1]}")
+
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        writer = RowWriter(args.chunk_size)
+        started = time.perf_counter()
+
+        catalog = seed_catalog(writer, args.courses, args.modules, args.contents)
+        for index, size in enumerate(sizes):
+            seed_organization(writer, rng, args, index, size, catalog, password_hash, now)
+            if index % 50 == 0 or index == len(sizes) - 1:
+                rows = sum(writer.counts.values())
+                print(f"{index + 1}/{len(sizes)} organizations, {rows} rows, {time.perf_counter() - started:.0f}s")
+
+        print("Rebuilding progress rollup...")
+        rebuild_progress_rollup()
+        if writer.use_copy:
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                connection.execute(text("ANALYZE"))
+
+        for table, count in sorted(writer.counts.items()):
+            print(f"  {table:<28} {count:>12}")
+        print(f"✅ Generated {sum(writer.counts.values())} rows in {time.perf_counter() - started:.0f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
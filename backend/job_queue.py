@@ -0,0 +1,327 @@
+"""
+Database-backed background job queue for slow administrative operations.
+
+Jobs are rows in the background_job table, so no broker is needed and any
+process with database access can run them. A request enqueues a job and
+returns its id right away; a worker claims queued jobs (a compare-and-set
+UPDATE, with SELECT ... FOR UPDATE SKIP LOCKED on PostgreSQL) and runs them
+on a pool of JOB_WORKER_CONCURRENCY threads.
+
+Handlers are registered with @job_handler('type') and called as
+handler(payload, job) inside an app context; job.progress() records progress
+for the status endpoint. A handler that raises is retried with exponential
+backoff until max_attempts is reached, so handlers must be safe to re-run.
+Running jobs send heartbeats; jobs whose worker stopped sending them for
+JOB_STALE_SECONDS are requeued.
+
+Workers run in-process (started with the first request) unless
+JOB_WORKER_IN_PROCESS=false, in which case run ``python job_worker.py``.
+
+Configuration (environment variables):
+    JOB_WORKER_IN_PROCESS       true to run a worker inside each web process (default true)
+    JOB_WORKER_CONCURRENCY      jobs run at once per worker (default 2)
+    JOB_POLL_SECONDS            idle polling interval (default 2)
+    JOB_RETRY_BACKOFF_SECONDS   delay before the first retry, doubled per attempt (default 10)
+    JOB_STALE_SECONDS           heartbeat age after which a running job is requeued (default 300)
+"""
+
+import datetime
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, jsonify, request
+from models import db, BackgroundJob
+from auth_middleware import token_required
+
+JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', 2))
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', 2))
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv('JOB_RETRY_BACKOFF_SECONDS', 10))
+JOB_STALE_SECONDS = float(os.getenv('JOB_STALE_SECONDS', 300))
+
+# job_type -> (handler, default max_attempts)
+_handlers = {}
+_worker = None
+_worker_lock = threading.Lock()
+
+job_bp = Blueprint('jobs', __name__)
+
+
+def job_handler(job_type, max_attempts=3):
+    """Register a function as the handler of a job type."""
+    def decorator(f):
+        _handlers[job_type] = (f, max_attempts)
+        return f
+    return decorator
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def enqueue_job(job_type, payload, requested_by=None, max_attempts=None, progress_total=None):
+    """Store a queued job, commit it and return its id."""
+    if job_type not in _handlers:
+        raise ValueError(f'No handler registered for job type {job_type}')
+    job = BackgroundJob(
+        id=uuid.uuid4().hex,
+        job_type=job_type,
+        payload=json.dumps(payload, default=_json_default),
+        status='queued',
+        max_attempts=max_attempts or _handlers[job_type][1],
+        requested_by=requested_by,
+        progress_total=progress_total,
+        run_after=datetime.datetime.utcnow()
+    )
+    db.session.add(job)
+    db.session.commit()
+    if _worker is not None:
+        _worker.wake()
+    return job.id
+
+
+def serialize_job(job):
+    return {
+        'job_id': job.id,
+        'job_type': job.job_type,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'progress': {
+            'current': job.progress_current,
+            'total': job.progress_total,
+            'message': job.progress_message
+        },
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.error,
+        'requested_by': job.requested_by,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+def get_job(job_id):
+    """Return a job's status dict, or None if it is unknown."""
+    job = db.session.get(BackgroundJob, job_id)
+    return serialize_job(job) if job else None
+
+
+def _update_job(job_id, **changes):
+    # Own connection and transaction, so job bookkeeping never commits a handler's unfinished work
+    with db.engine.begin() as connection:
+        connection.execute(BackgroundJob.__table__.update().where(BackgroundJob.id == job_id).values(**changes))
+
+
+class JobContext:
+    """Passed to handlers to report progress."""
+
+    def __init__(self, job_id, attempt):
+        self.job_id = job_id
+        self.attempt = attempt
+
+    def progress(self, current, total=None, message=None):
+        changes = {'progress_current': current, 'heartbeat_at': datetime.datetime.utcnow()}
+        if total is not None:
+            changes['progress_total'] = total
+        if message is not None:
+            changes['progress_message'] = message[:255]
+        try:
+            _update_job(self.job_id, **changes)
+        except Exception as e:
+            # Progress is informational; never fail the job over it
+            print(f"Job {self.job_id} progress update failed: {str(e)}")
+
+
+def _heartbeat(job_id, stopped):
+    while not stopped.wait(JOB_STALE_SECONDS / 3):
+        try:
+            _update_job(job_id, heartbeat_at=datetime.datetime.utcnow())
+        except Exception as e:
+            print(f"Job {job_id} heartbeat failed: {str(e)}")
+
+
+def claim_next_job(worker_id):
+    """Mark the oldest runnable job as running for this worker and return its id, or None."""
+    now = datetime.datetime.utcnow()
+    query = db.session.query(BackgroundJob.id).filter(
+        BackgroundJob.status == 'queued', BackgroundJob.run_after <= now
+    ).order_by(BackgroundJob.created_at).limit(1)
+    if db.engine.dialect.name == 'postgresql':
+        query = query.with_for_update(skip_locked=True)
+    row = query.first()
+    if row is None:
+        db.session.rollback()
+        return None
+    claimed = BackgroundJob.query.filter_by(id=row.id, status='queued').update({
+        'status': 'running',
+        'locked_by': worker_id,
+        'heartbeat_at': now,
+        'started_at': now,
+        'attempts': BackgroundJob.attempts + 1
+    }, synchronize_session=False)
+    db.session.commit()
+    return row.id if claimed else None
+
+
+def requeue_stale_jobs():
+    """Requeue running jobs whose worker stopped sending heartbeats. Returns the number requeued."""
+    now = datetime.datetime.utcnow()
+    stale = BackgroundJob.query.filter(
+        BackgroundJob.status == 'running',
+        BackgroundJob.heartbeat_at < now - datetime.timedelta(seconds=JOB_STALE_SECONDS)
+    )
+    # A job that keeps killing its worker must not be retried forever
+    stale.filter(BackgroundJob.attempts >= BackgroundJob.max_attempts).update({
+        'status': 'failed', 'locked_by': None, 'finished_at': now, 'error': 'Worker stopped responding'
+    }, synchronize_session=False)
+    requeued = stale.filter(BackgroundJob.attempts < BackgroundJob.max_attempts).update({
+        'status': 'queued', 'locked_by': None, 'run_after': now, 'error': 'Worker stopped responding'
+    }, synchronize_session=False)
+    db.session.commit()
+    return requeued
+
+
+def run_job(app, job_id):
+    """Run one claimed job and record its outcome."""
+    with app.app_context():
+        try:
+            job = db.session.get(BackgroundJob, job_id)
+            job_type, attempts, max_attempts = job.job_type, job.attempts, job.max_attempts
+            handler, _ = _handlers[job_type]
+            payload = json.loads(job.payload)
+            db.session.commit()
+
+            stopped = threading.Event()
+            threading.Thread(target=_heartbeat, args=(job_id, stopped), daemon=True).start()
+            try:
+                result = handler(payload, JobContext(job_id, attempts))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Job {job_id} ({job_type}) attempt {attempts} failed: {str(e)}")
+                now = datetime.datetime.utcnow()
+                if attempts < max_attempts:
+                    backoff = JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+                    _update_job(job_id, status='queued', locked_by=None, error=str(e),
+                                run_after=now + datetime.timedelta(seconds=backoff))
+                else:
+                    _update_job(job_id, status='failed', locked_by=None, error=str(e), finished_at=now)
+                return
+            finally:
+                stopped.set()
+
+            _update_job(job_id, status='completed', locked_by=None, finished_at=datetime.datetime.utcnow(),
+                        result=json.dumps(result, default=_json_default) if result is not None else None)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Job {job_id} could not be run: {str(e)}")
+            _update_job(job_id, status='failed', locked_by=None, error=str(e),
+                        finished_at=datetime.datetime.utcnow())
+        finally:
+            db.session.remove()
+
+
+class JobWorker:
+    """Polls for queued jobs and runs up to `concurrency` of them at a time."""
+
+    def __init__(self, app, concurrency=JOB_WORKER_CONCURRENCY, poll_seconds=JOB_POLL_SECONDS):
+        self.app = app
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='job-worker')
+        self._slots = threading.Semaphore(concurrency)
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._next_stale_check = 0.0
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        self._executor.shutdown(wait=True)
+
+    def _release_slot(self, _future):
+        self._slots.release()
+        self._wake.set()
+
+    def _claim_jobs(self):
+        with self.app.app_context():
+            try:
+                if time.monotonic() >= self._next_stale_check:
+                    self._next_stale_check = time.monotonic() + JOB_STALE_SECONDS / 2
+                    requeue_stale_jobs()
+                while self._slots.acquire(blocking=False):
+                    job_id = claim_next_job(self.worker_id)
+                    if job_id is None:
+                        self._slots.release()
+                        break
+                    self._executor.submit(run_job, self.app, job_id).add_done_callback(self._release_slot)
+            finally:
+                db.session.remove()
+
+    def run_forever(self):
+        print(f"Job worker {self.worker_id} started ({self.concurrency} concurrent jobs)")
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                self._claim_jobs()
+            except Exception as e:
+                print(f"Job worker poll failed: {str(e)}")
+            self._wake.wait(self.poll_seconds)
+
+
+def start_in_process_worker(app):
+    """Start the background worker thread of this process once, if enabled."""
+    global _worker
+    if os.getenv('JOB_WORKER_IN_PROCESS', 'true').lower() != 'true':
+        return None
+    with _worker_lock:
+        if _worker is None:
+            _worker = JobWorker(app)
+            threading.Thread(target=_worker.run_forever, name='job-worker-poller', daemon=True).start()
+    return _worker
+
+
+def init_job_queue(app):
+    """Register the job endpoints and start the in-process worker with the first request."""
+    app.register_blueprint(job_bp)
+
+    @app.before_request
+    def ensure_job_worker():
+        if _worker is None:
+            start_in_process_worker(app)
+
+
+@job_bp.route('/api/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_job_status(job_id):
+    """Get the status and progress of a background job"""
+    job = get_job(job_id)
+    if not job or (request.token_payload.get('role') != 'admin'
+                   and job['requested_by'] != request.token_payload['user_id']):
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+
+@job_bp.route('/api/jobs', methods=['GET'])
+@token_required
+def list_jobs():
+    """List recent background jobs; admins see all, other users their own"""
+    query = BackgroundJob.query
+    if request.token_payload.get('role') != 'admin':
+        query = query.filter(BackgroundJob.requested_by == request.token_payload['user_id'])
+    status = request.args.get('status')
+    if status:
+        query = query.filter(BackgroundJob.status == status)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    jobs = query.order_by(BackgroundJob.created_at.desc()).limit(limit).all()
+    return jsonify({'success': True, 'jobs': [serialize_job(job) for job in jobs]})
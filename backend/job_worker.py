@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Standalone background job worker.
+
+Runs the jobs queued through job_queue.py outside the web processes. Start one
+or more of these next to the web server and set JOB_WORKER_IN_PROCESS=false
+for the web server so jobs only run here.
+
+Usage:
+    python job_worker.py [--concurrency 4]
+"""
+
+import argparse
+import os
+import signal
+
+# This process is the worker; do not start a second one inside the app
+os.environ['JOB_WORKER_IN_PROCESS'] = 'false'
+
+from app import app
+from job_queue import JobWorker, JOB_WORKER_CONCURRENCY
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run queued background jobs')
+    parser.add_argument('--concurrency', type=int, default=JOB_WORKER_CONCURRENCY,
+                        help='Jobs run at the same time')
+    args = parser.parse_args()
+
+    worker = JobWorker(app, concurrency=args.concurrency)
+
+    def shutdown(signum, frame):
+        print("Stopping job worker after the running jobs finish...")
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    worker.run_forever()
+
+
+if __name__ == '__main__':
+    main()
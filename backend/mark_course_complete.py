@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 from models import User, Course, CourseProgress, db
+from progress_rollup import progress_snapshot, record_progress_change
+from progress_events import publish_course_progress
 import datetime
 
 bp = Blueprint('mark_course_complete', __name__)
@@ -25,6 +27,7 @@ def mark_course_complete():
 
 	# Get or create progress record
 	progress_record = CourseProgress.query.filter_by(user_id=user.id, course_id=course_id).first()
+	rollup_before = progress_snapshot(progress_record)
 	total_modules = len(course.modules)
 	if not progress_record:
 		progress_record = CourseProgress(
@@ -33,6 +36,7 @@ def mark_course_complete():
 			total_modules=total_modules,
 			completed_modules=total_modules,
 			progress_percentage=100,
+			risk_score=0,
 			completion_date=datetime.datetime.utcnow()
 		)
 		db.session.add(progress_record)
@@ -40,6 +44,8 @@ def mark_course_complete():
 		progress_record.completed_modules = total_modules
 		progress_record.progress_percentage = 100
 		progress_record.completion_date = datetime.datetime.utcnow()
+	record_progress_change(user.org_id, course.id, rollup_before, progress_snapshot(progress_record))
+	publish_course_progress(user, progress_record, rollup_before)
 	db.session.commit()
 
 	return jsonify({'success': True, 'message': 'Course marked as completed!', 'progress': {
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Move legacy per-recipient Notification rows into the broadcast storage
+(one NotificationMessage per broadcast + one NotificationDelivery per recipient).
+
+Rows with identical content and sender created within BROADCAST_WINDOW_SECONDS
+of each other are treated as one broadcast. Migrated legacy rows are deleted in
+the same transaction, so the script can be re-run safely.
+"""
+
+import datetime
+from sqlalchemy import insert
+from app import app
+from models import db, Notification, NotificationMessage, NotificationDelivery
+
+BROADCAST_WINDOW_SECONDS = 60
+CHUNK_SIZE = 1000
+
+CONTENT_COLUMNS = ('title', 'message', 'notification_type', 'priority', 'sender_id',
+                   'course_id', 'organization_id', 'action_url', 'extra_data', 'expires_at')
+
+
+def _flush_group(content, rows):
+    message = NotificationMessage(
+        **dict(zip(CONTENT_COLUMNS, content)),
+        recipients_count=len({row.recipient_id for row in rows}),
+        created_at=rows[0].created_at
+    )
+    db.session.add(message)
+    db.session.flush()
+
+    seen = set()
+    deliveries = []
+    for row in rows:
+        if row.recipient_id in seen:
+            continue
+        seen.add(row.recipient_id)
+        deliveries.append({
+            'message_id': message.id,
+            'recipient_id': row.recipient_id,
+            'is_read': bool(row.is_read),
+            'read_at': row.read_at,
+            'created_at': row.created_at or message.created_at
+        })
+    for start in range(0, len(deliveries), CHUNK_SIZE):
+        db.session.execute(insert(NotificationDelivery.__table__), deliveries[start:start + CHUNK_SIZE])
+    return len(deliveries)
+
+
+def migrate_notification_storage():
+    """Copy legacy notifications into message/delivery rows and remove them."""
+    with app.app_context():
+        try:
+            db.create_all()
+
+            legacy_count = Notification.query.count()
+            print(f"Found {legacy_count} legacy notification rows")
+            if not legacy_count:
+                print("✅ Nothing to migrate")
+                return True
+
+            columns = [getattr(Notification, name) for name in CONTENT_COLUMNS]
+            rows = db.session.query(
+                *columns, Notification.recipient_id, Notification.is_read,
+                Notification.read_at, Notification.created_at
+            ).order_by(*columns, Notification.created_at).yield_per(CHUNK_SIZE)
+
+            window = datetime.timedelta(seconds=BROADCAST_WINDOW_SECONDS)
+            messages_created = 0
+            deliveries_created = 0
+            group_content, group_rows = None, []
+            for row in rows:
+                content = tuple(row[:len(CONTENT_COLUMNS)])
+                starts_new_group = (
+                    content != group_content or
+                    (row.created_at and group_rows[0].created_at and
+                     row.created_at - group_rows[0].created_at > window)
+                )
+                if starts_new_group and group_rows:
+                    deliveries_created += _flush_group(group_content, group_rows)
+                    messages_created += 1
+                    group_rows = []
+                group_content = content
+                group_rows.append(row)
+            if group_rows:
+                deliveries_created += _flush_group(group_content, group_rows)
+                messages_created += 1
+
+            Notification.query.delete(synchronize_session=False)
+            db.session.commit()
+
+            print(f"✅ Migrated {legacy_count} rows into {messages_created} messages "
+                  f"and {deliveries_created} deliveries")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error migrating notifications: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+
+if __name__ == '__main__':
+    print("Migrating notifications to broadcast storage...")
+    migrate_notification_storage()
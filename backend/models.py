@@ -17,6 +17,8 @@ class User(db.Model):
     # Progress tracking
     progress_records = db.relationship('CourseProgress', backref='user', lazy=True, cascade="all, delete-orphan")
 
+    __table_args__ = (db.Index('ix_user_org_role', 'org_id', 'role'),)
+
 class Organization(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), unique=True, nullable=False)
@@ -43,6 +45,8 @@ class Module(db.Model):
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     contents = db.relationship('ModuleContent', backref='module', lazy=True, cascade="all, delete-orphan")
 
+    __table_args__ = (db.Index('ix_module_course_order', 'course_id', 'order'),)
+
 class ModuleContent(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(120), nullable=False)
@@ -54,6 +58,8 @@ class ModuleContent(db.Model):
     questions = db.relationship('QuizQuestion', backref='content', lazy=True, cascade="all, delete-orphan")
     simulation = db.relationship('Simulation', backref='content', uselist=False, cascade="all, delete-orphan")
 
+    __table_args__ = (db.Index('ix_module_content_module_order', 'module_id', 'order'),)
+
 class Simulation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content_id = db.Column(db.Integer, db.ForeignKey('module_content.id'), nullable=False)
@@ -105,6 +111,8 @@ class SimulationAttempt(db.Model):
     simulation = db.relationship('Simulation', backref='attempts')
     scenario = db.relationship('SimulationScenario', backref='attempts')
 
+    __table_args__ = (db.Index('ix_simulation_attempt_user_simulation', 'user_id', 'simulation_id', 'attempt_number'),)
+
 class QuizQuestion(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     question_text = db.Column(db.Text, nullable=False)
@@ -179,6 +187,9 @@ class CourseProgress(db.Model):
     # Module progress (JSON field to store module completion status)
     module_progress = db.Column(db.Text, default='{}')  # JSON string: {module_id: {completed: true/false, completion_date: date}}
 
+    # One progress row per user and course
+    __table_args__ = (db.Index('uq_course_progress_user_course', 'user_id', 'course_id', unique=True),)
+
 class SystemSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     category = db.Column(db.String(50), nullable=False)  # email, security, organization, etc.
@@ -206,6 +217,8 @@ class AuditLog(db.Model):
     # Relationship to user
     user = db.relationship('User', backref='audit_logs')
 
+    __table_args__ = (db.Index('ix_audit_log_timestamp', 'timestamp'),)
+
 class EmailTemplate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     template_name = db.Column(db.String(100), unique=True, nullable=False)
@@ -279,6 +292,8 @@ class QuizAttempt(db.Model):
     user = db.relationship('User', backref='quiz_attempts')
     quiz_content = db.relationship('ModuleContent', backref='quiz_attempts')
 
+    __table_args__ = (db.Index('ix_quiz_attempt_user_content', 'user_id', 'quiz_content_id'),)
+
 class ContentInteraction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -348,6 +363,8 @@ class APIUsage(db.Model):
     # Relationship
     user = db.relationship('User', backref='api_usage')
 
+# Legacy storage with one full row per recipient; new notifications are stored as
+# NotificationMessage + NotificationDelivery (see migrate_notification_storage.py)
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -380,3 +397,94 @@ class Notification(db.Model):
     recipient = db.relationship('User', foreign_keys=[recipient_id], backref='received_notifications')
     course = db.relationship('Course', backref='notifications')
     organization = db.relationship('Organization', backref='notifications')
+
+    __table_args__ = (db.Index('ix_notification_recipient_unread_created', 'recipient_id', 'is_read', 'created_at'),)
+
+# Notification content, stored once per broadcast
+class NotificationMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    notification_type = db.Column(db.String(50), nullable=False)  # course_new, course_expiring, course_assigned, general, announcement
+    priority = db.Column(db.String(20), default='normal')  # low, normal, high, urgent
+    sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=True)
+    organization_id = db.Column(db.Integer, db.ForeignKey('organization.id'), nullable=True)
+    action_url = db.Column(db.String(500), nullable=True)  # URL to navigate when clicked
+    extra_data = db.Column(db.Text, nullable=True)  # JSON string for additional data
+    recipients_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=True)
+
+    sender = db.relationship('User', foreign_keys=[sender_id])
+    course = db.relationship('Course')
+    organization = db.relationship('Organization')
+    deliveries = db.relationship('NotificationDelivery', backref='notification_message', lazy='dynamic',
+                                 cascade="all, delete-orphan", passive_deletes=True)
+
+# Per-recipient delivery state of a NotificationMessage; its id is the notification id used by the API
+class NotificationDelivery(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    message_id = db.Column(db.Integer, db.ForeignKey('notification_message.id', ondelete='CASCADE'), nullable=False)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    is_read = db.Column(db.Boolean, nullable=False, default=False)
+    read_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)  # Copied from the message for index-only ordering
+
+    __table_args__ = (
+        db.UniqueConstraint('message_id', 'recipient_id', name='_notification_delivery_uc'),
+        db.Index('ix_notification_delivery_recipient_created', 'recipient_id', 'created_at', 'id'),
+        db.Index('ix_notification_delivery_recipient_unread', 'recipient_id', 'is_read'),
+    )
+
+# Materialized per-organization course progress rollup (maintained by progress_rollup.py)
+class OrganizationCourseProgress(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    org_id = db.Column(db.Integer, db.ForeignKey('organization.id', ondelete='CASCADE'), nullable=True)  # NULL for users without an organization
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id', ondelete='CASCADE'), nullable=False)
+    enrolled_count = db.Column(db.Integer, nullable=False, default=0)  # Number of CourseProgress rows
+    completed_count = db.Column(db.Integer, nullable=False, default=0)  # progress_percentage == 100
+    in_progress_count = db.Column(db.Integer, nullable=False, default=0)  # 0 < progress_percentage < 100
+    not_started_count = db.Column(db.Integer, nullable=False, default=0)  # progress_percentage == 0
+    progress_sum = db.Column(db.Float, nullable=False, default=0.0)
+    risk_score_sum = db.Column(db.Integer, nullable=False, default=0)
+    high_risk_count = db.Column(db.Integer, nullable=False, default=0)
+    medium_risk_count = db.Column(db.Integer, nullable=False, default=0)
+    low_risk_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('org_id', 'course_id', name='_org_course_progress_uc'),)
+
+# Revoked JWTs (maintained by token_revocation.py): one row per revoked token (jti),
+# or one row per user revoking every token issued before revoked_before
+class RevokedToken(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), unique=True, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True)
+    revoked_before = db.Column(db.DateTime, nullable=True)  # Tokens of user_id issued before this are revoked
+    reason = db.Column(db.String(50), nullable=True)  # logout, password_change, password_reset
+    expires_at = db.Column(db.DateTime, nullable=False)  # When the row can be pruned (latest possible token expiry)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+# Background jobs for slow administrative operations (run by job_queue.py workers)
+class BackgroundJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    job_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON arguments for the handler
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    progress_current = db.Column(db.Integer, nullable=False, default=0)
+    progress_total = db.Column(db.Integer, nullable=True)
+    progress_message = db.Column(db.String(255), nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON returned by the handler
+    error = db.Column(db.Text, nullable=True)  # Last error, kept across retries
+    requested_by = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)  # Earliest start (retry backoff)
+    locked_by = db.Column(db.String(100), nullable=True)  # Worker running the job
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # Refreshed while running; stale jobs are requeued
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index('ix_background_job_status_run_after', 'status', 'run_after'),)
@@ -0,0 +1,149 @@
+"""
+Notification fan-out for broadcasts to many recipients.
+
+The audience is described by a recipient filter (role, optionally an
+organization and/or explicit user ids) and resolved by the database: the
+content is stored once as a NotificationMessage and recipients get slim
+NotificationDelivery rows written with INSERT ... SELECT over the users
+table, one statement per chunk of FANOUT_CHUNK_SIZE users (ranges of user id),
+so recipient ids never travel through Python to be written. New deliveries
+are announced to connected clients on their ``user:<id>`` event bus channel
+once committed. Large broadcasts can run as a background job (see
+job_queue); only the filter is stored in the job row. The request returns a
+job id right away and the job status is polled from
+/api/notifications/fanout_jobs/<job_id>.
+
+Configuration (environment variables):
+    NOTIFICATION_FANOUT_CHUNK_SIZE   recipients per INSERT ... SELECT (default 1000)
+"""
+
+import datetime
+import os
+from sqlalchemy import select, literal, func
+from models import db, NotificationMessage, NotificationDelivery, User
+from event_bus import publish_after_commit
+from job_queue import job_handler, enqueue_job, get_job
+
+FANOUT_CHUNK_SIZE = int(os.getenv('NOTIFICATION_FANOUT_CHUNK_SIZE', 1000))
+
+
+def user_channel(user_id):
+    """Event bus channel of one user's notification stream"""
+    return f"user:{user_id}"
+
+
+def recipient_filter(role, org_id=None, user_ids=None):
+    """Describe a broadcast audience as plain JSON-serializable values."""
+    return {'role': role, 'org_id': org_id, 'user_ids': list(user_ids) if user_ids else None}
+
+
+def _recipient_conditions(recipients):
+    conditions = [User.role == recipients['role']]
+    if recipients.get('org_id') is not None:
+        conditions.append(User.org_id == recipients['org_id'])
+    if recipients.get('user_ids'):
+        conditions.append(User.id.in_(recipients['user_ids']))
+    return conditions
+
+
+def count_recipients(recipients):
+    """Number of users a recipient filter matches."""
+    return db.session.query(func.count(User.id)).filter(*_recipient_conditions(recipients)).scalar() or 0
+
+
+def insert_notifications(recipients, fields, chunk_size=None, on_chunk=None):
+    """Store a notification once and deliver it to every user matching a filter (the caller commits).
+
+    Args:
+        recipients: recipient_filter() describing the audience
+        fields: NotificationMessage column values (title, message, sender_id, ...)
+        chunk_size: Recipients per INSERT ... SELECT
+        on_chunk: Optional callback receiving the number of deliveries written so far
+
+    Returns:
+        The number of deliveries inserted
+    """
+    chunk_size = chunk_size or FANOUT_CHUNK_SIZE
+    conditions = _recipient_conditions(recipients)
+    created_at = datetime.datetime.utcnow()
+    notification_message = NotificationMessage(**fields, recipients_count=0, created_at=created_at)
+    db.session.add(notification_message)
+    db.session.flush()
+
+    deliveries = NotificationDelivery.__table__
+    written = 0
+    last_id = 0
+    while True:
+        # Highest user id of the next chunk; None when the rest fits in one chunk
+        upper_id = db.session.query(User.id).filter(*conditions, User.id > last_id).order_by(
+            User.id).offset(chunk_size - 1).limit(1).scalar()
+        chunk_conditions = [*conditions, User.id > last_id]
+        if upper_id is not None:
+            chunk_conditions.append(User.id <= upper_id)
+        written += db.session.execute(deliveries.insert().from_select(
+            ['message_id', 'recipient_id', 'is_read', 'created_at'],
+            select(literal(notification_message.id), User.id, literal(False), literal(created_at)).where(*chunk_conditions)
+        )).rowcount
+        if on_chunk:
+            on_chunk(written)
+        if upper_id is None:
+            break
+        last_id = upper_id
+    notification_message.recipients_count = written
+
+    recipient_ids = db.session.query(deliveries.c.recipient_id).filter(
+        deliveries.c.message_id == notification_message.id)
+    publish_after_commit(db.session, [user_channel(recipient_id) for (recipient_id,) in recipient_ids], 'notification', {
+        'message_id': notification_message.id,
+        'title': notification_message.title,
+        'type': notification_message.notification_type,
+        'priority': notification_message.priority,
+        'course_id': notification_message.course_id,
+        'action_url': notification_message.action_url,
+        'created_at': created_at.isoformat(),
+        'unread_delta': 1
+    })
+    return written
+
+
+@job_handler('notification_fanout')
+def _run_fanout_job(payload, job):
+    fields = dict(payload['fields'])
+    if fields.get('expires_at'):
+        fields['expires_at'] = datetime.datetime.fromisoformat(fields['expires_at'])
+    total = count_recipients(payload['recipients'])
+    # The deliveries are committed together, so a retried job never writes them twice
+    written = insert_notifications(
+        payload['recipients'], fields,
+        on_chunk=lambda count: job.progress(count, total)
+    )
+    db.session.commit()
+    return {'written_count': written}
+
+
+def submit_fanout_job(recipients, fields, recipients_count, requested_by=None):
+    """Queue a background fan-out to a recipient filter and return its job id."""
+    return enqueue_job('notification_fanout', {
+        'recipients': recipients,
+        'fields': dict(fields)
+    }, requested_by=requested_by, progress_total=recipients_count)
+
+
+def get_fanout_job(job_id):
+    """Return a fan-out job's status, or None if it is unknown."""
+    job = get_job(job_id)
+    if not job or job['job_type'] != 'notification_fanout':
+        return None
+    status = job['status']
+    return {
+        'job_id': job['job_id'],
+        'status': status,
+        'requested_by': job['requested_by'],
+        'recipients_count': job['progress']['total'],
+        'written_count': (job['result'] or {}).get('written_count', 0) if status == 'completed'
+                         else job['progress']['current'] or 0,
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at']
+    }
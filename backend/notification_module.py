@@ -1,83 +1,151 @@
 from flask import Blueprint, jsonify, request
+import base64
 import datetime
-from models import db, Notification, User, Course, Organization
-from auth_middleware import token_required, role_required, admin_required, portal_admin_required
+from sqlalchemy import func, case, or_, and_
+from sqlalchemy.orm import aliased
+from models import db, NotificationMessage, NotificationDelivery, User, Course, Organization
+from auth_middleware import token_required, admin_required, portal_admin_required, admin_or_portal_admin_required, AuthError, get_stream_token_payload
+from notification_fanout import recipient_filter, count_recipients, insert_notifications, submit_fanout_job, get_fanout_job, user_channel
+from event_bus import event_bus, publish_after_commit, sse_response
 
 notification_bp = Blueprint('notifications', __name__)
 
+def _active_deliveries(recipient_id):
+    """Deliveries of a user joined to their message, excluding expired messages"""
+    return db.session.query(NotificationDelivery, NotificationMessage).join(
+        NotificationMessage, NotificationMessage.id == NotificationDelivery.message_id
+    ).filter(
+        NotificationDelivery.recipient_id == recipient_id,
+        (NotificationMessage.expires_at.is_(None)) |
+        (NotificationMessage.expires_at > datetime.datetime.utcnow())
+    )
+
+def _get_own_delivery(notification_id):
+    """Return (delivery, error response) for a notification of the current user"""
+    delivery = db.session.get(NotificationDelivery, notification_id)
+    if not delivery:
+        return None, (jsonify({'success': False, 'error': 'Notification not found'}), 404)
+    
+    # Check if user owns this notification
+    if delivery.recipient_id != request.token_payload['user_id']:
+        return None, (jsonify({'success': False, 'error': 'Unauthorized'}), 403)
+    return delivery, None
+
+def _encode_cursor(created_at, notification_id):
+    """Opaque keyset cursor for the (created_at, id) position of a notification"""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{notification_id}".encode()).decode()
+
+def _decode_cursor(cursor):
+    created_at, notification_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.datetime.fromisoformat(created_at), int(notification_id)
+
 @notification_bp.route('/api/notifications', methods=['GET'])
 @token_required
 def get_notifications():
-    """Get all notifications for the current user"""
+    """Get notifications for the current user, newest first.
+
+    Pagination is keyset based: pass the returned next_cursor as ?cursor= to get
+    the following page. ?offset= is still accepted when no cursor is given.
+    """
     try:
         # Get query parameters
         unread_only = request.args.get('unread_only', 'false').lower() == 'true'
         limit = int(request.args.get('limit', 50))
         offset = int(request.args.get('offset', 0))
-        
-        # Build query
-        query = Notification.query.filter_by(recipient_id=request.token_payload['user_id'])
+        cursor = request.args.get('cursor')
+        user_id = request.token_payload['user_id']
+        now = datetime.datetime.utcnow()
+        not_expired = (NotificationMessage.expires_at.is_(None)) | (NotificationMessage.expires_at > now)
+        
+        # Total and unread counts in one aggregate query
+        total_count, unread_count = db.session.query(
+            func.count(NotificationDelivery.id),
+            func.count(case((NotificationDelivery.is_read.is_(False), 1)))
+        ).join(
+            NotificationMessage, NotificationMessage.id == NotificationDelivery.message_id
+        ).filter(
+            NotificationDelivery.recipient_id == user_id,
+            not_expired
+        ).one()
+        if unread_only:
+            total_count = unread_count
+        
+        # Notifications with sender and course columns in one joined query
+        sender = aliased(User)
+        query = db.session.query(
+            NotificationDelivery.id, NotificationDelivery.is_read, NotificationDelivery.read_at,
+            NotificationDelivery.created_at,
+            NotificationMessage.title, NotificationMessage.message, NotificationMessage.notification_type,
+            NotificationMessage.priority, NotificationMessage.action_url, NotificationMessage.expires_at,
+            sender.id.label('sender_id'), sender.username.label('sender_username'), sender.role.label('sender_role'),
+            Course.id.label('course_id'), Course.title.label('course_title')
+        ).join(
+            NotificationMessage, NotificationMessage.id == NotificationDelivery.message_id
+        ).outerjoin(
+            sender, sender.id == NotificationMessage.sender_id
+        ).outerjoin(
+            Course, Course.id == NotificationMessage.course_id
+        ).filter(
+            NotificationDelivery.recipient_id == user_id,
+            not_expired
+        )
         
         if unread_only:
-            query = query.filter_by(is_read=False)
+            query = query.filter(NotificationDelivery.is_read.is_(False))
         
-        # Filter out expired notifications
-        query = query.filter(
-            (Notification.expires_at.is_(None)) | 
-            (Notification.expires_at > datetime.datetime.utcnow())
+        if cursor:
+            try:
+                cursor_created_at, cursor_id = _decode_cursor(cursor)
+            except Exception:
+                return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+            query = query.filter(or_(
+                NotificationDelivery.created_at < cursor_created_at,
+                and_(NotificationDelivery.created_at == cursor_created_at, NotificationDelivery.id < cursor_id)
+            ))
+        
+        query = query.order_by(
+            NotificationDelivery.created_at.desc(),
+            NotificationDelivery.id.desc()
         )
+        if not cursor and offset:
+            query = query.offset(offset)
         
-        # Get total count
-        total_count = query.count()
-        unread_count = Notification.query.filter_by(
-            recipient_id=request.token_payload['user_id'],
-            is_read=False
-        ).count()
-        
-        # Get paginated notifications
-        notifications = query.order_by(
-            Notification.created_at.desc()
-        ).limit(limit).offset(offset).all()
+        # One extra row tells whether another page exists
+        rows = query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
         notifications_data = []
-        for notif in notifications:
-            # Get sender info
-            sender = User.query.get(notif.sender_id)
-            
-            # Get course info if exists
-            course_info = None
-            if notif.course_id:
-                course = Course.query.get(notif.course_id)
-                if course:
-                    course_info = {
-                        'id': course.id,
-                        'title': course.title
-                    }
-            
+        for row in rows:
             notifications_data.append({
-                'id': notif.id,
-                'title': notif.title,
-                'message': notif.message,
-                'type': notif.notification_type,
-                'priority': notif.priority,
+                'id': row.id,
+                'title': row.title,
+                'message': row.message,
+                'type': row.notification_type,
+                'priority': row.priority,
                 'sender': {
-                    'id': sender.id,
-                    'username': sender.username,
-                    'role': sender.role
-                } if sender else None,
-                'course': course_info,
-                'is_read': notif.is_read,
-                'read_at': notif.read_at.isoformat() if notif.read_at else None,
-                'action_url': notif.action_url,
-                'created_at': notif.created_at.isoformat(),
-                'expires_at': notif.expires_at.isoformat() if notif.expires_at else None
+                    'id': row.sender_id,
+                    'username': row.sender_username,
+                    'role': row.sender_role
+                } if row.sender_id else None,
+                'course': {
+                    'id': row.course_id,
+                    'title': row.course_title
+                } if row.course_id else None,
+                'is_read': row.is_read,
+                'read_at': row.read_at.isoformat() if row.read_at else None,
+                'action_url': row.action_url,
+                'created_at': row.created_at.isoformat(),
+                'expires_at': row.expires_at.isoformat() if row.expires_at else None
             })
         
         return jsonify({
             'success': True,
             'notifications': notifications_data,
             'total_count': total_count,
-            'unread_count': unread_count
+            'unread_count': unread_count,
+            'has_more': has_more,
+            'next_cursor': _encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
         })
         
     except Exception as e:
@@ -89,19 +157,19 @@ def get_notifications():
 def mark_notification_read(notification_id):
     """Mark a notification as read"""
     try:
-        notification = Notification.query.get(notification_id)
-        
-        if not notification:
-            return jsonify({'success': False, 'error': 'Notification not found'}), 404
-        
-        # Check if user owns this notification
-        if notification.recipient_id != request.token_payload['user_id']:
-            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+        delivery, error = _get_own_delivery(notification_id)
+        if error:
+            return error
         
         # Mark as read
-        notification.is_read = True
-        notification.read_at = datetime.datetime.utcnow()
-        db.session.commit()
+        if not delivery.is_read:
+            delivery.is_read = True
+            delivery.read_at = datetime.datetime.utcnow()
+            publish_after_commit(db.session, [user_channel(delivery.recipient_id)], 'unread_count', {
+                'delta': -1,
+                'notification_id': delivery.id
+            })
+            db.session.commit()
         
         return jsonify({
             'success': True,
@@ -118,20 +186,24 @@ def mark_notification_read(notification_id):
 def mark_all_notifications_read():
     """Mark all notifications as read for the current user"""
     try:
-        notifications = Notification.query.filter_by(
+        # Single UPDATE on the recipient's unread delivery rows
+        marked_count = NotificationDelivery.query.filter_by(
             recipient_id=request.token_payload['user_id'],
             is_read=False
-        ).all()
-        
-        for notif in notifications:
-            notif.is_read = True
-            notif.read_at = datetime.datetime.utcnow()
-        
+        ).update({
+            NotificationDelivery.is_read: True,
+            NotificationDelivery.read_at: datetime.datetime.utcnow()
+        }, synchronize_session=False)
+        
+        if marked_count:
+            publish_after_commit(db.session, [user_channel(request.token_payload['user_id'])], 'unread_count', {
+                'delta': -marked_count
+            })
         db.session.commit()
         
         return jsonify({
             'success': True,
-            'message': f'Marked {len(notifications)} notifications as read'
+            'message': f'Marked {marked_count} notifications as read'
         })
         
     except Exception as e:
@@ -144,16 +216,23 @@ def mark_all_notifications_read():
 def delete_notification(notification_id):
     """Delete a notification"""
     try:
-        notification = Notification.query.get(notification_id)
-        
-        if not notification:
-            return jsonify({'success': False, 'error': 'Notification not found'}), 404
-        
-        # Check if user owns this notification
-        if notification.recipient_id != request.token_payload['user_id']:
-            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
-        
-        db.session.delete(notification)
+        delivery, error = _get_own_delivery(notification_id)
+        if error:
+            return error
+        
+        message_id = delivery.message_id
+        publish_after_commit(db.session, [user_channel(delivery.recipient_id)], 'notification_deleted', {
+            'notification_id': delivery.id,
+            'unread_delta': 0 if delivery.is_read else -1
+        })
+        db.session.delete(delivery)
+        db.session.flush()
+        
+        # Drop the shared message once its last recipient deleted it
+        NotificationMessage.query.filter(
+            NotificationMessage.id == message_id,
+            ~NotificationMessage.deliveries.any()
+        ).delete(synchronize_session=False)
         db.session.commit()
         
         return jsonify({
@@ -171,12 +250,8 @@ def delete_notification(notification_id):
 def get_unread_count():
     """Get count of unread notifications"""
     try:
-        unread_count = Notification.query.filter_by(
-            recipient_id=request.token_payload['user_id'],
-            is_read=False
-        ).filter(
-            (Notification.expires_at.is_(None)) | 
-            (Notification.expires_at > datetime.datetime.utcnow())
+        unread_count = _active_deliveries(request.token_payload['user_id']).filter(
+            NotificationDelivery.is_read.is_(False)
         ).count()
         
         return jsonify({
@@ -188,6 +263,35 @@ def get_unread_count():
         print(f"Error fetching unread count: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@notification_bp.route('/api/notifications/stream', methods=['GET'])
+def stream_notifications():
+    """Server-sent event stream of the current user's new notifications and unread count changes.
+    
+    EventSource cannot send headers, so the access token may also be passed as ?access_token=.
+    Events: unread_count (absolute on connect, then deltas), notification, notification_deleted.
+    """
+    try:
+        payload = get_stream_token_payload()
+    except AuthError as e:
+        return jsonify({'error': e.error}), e.status_code
+    
+    user_id = payload['user_id']
+    # Subscribe before counting so no change between the two is missed
+    subscription = event_bus.subscribe(user_channel(user_id))
+    try:
+        unread_count = _active_deliveries(user_id).filter(
+            NotificationDelivery.is_read.is_(False)
+        ).count()
+    except Exception as e:
+        event_bus.unsubscribe(subscription)
+        print(f"Error opening notification stream: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        # Give the connection back to the pool for the life of the stream
+        db.session.remove()
+    
+    return sse_response(subscription, [('unread_count', {'unread_count': unread_count})])
+
 # Admin sends notification to Portal Admins
 @notification_bp.route('/api/admin/send_notification_to_portal_admins', methods=['POST'])
 @admin_required
@@ -221,55 +325,34 @@ def admin_send_notification_to_portal_admins():
             except Exception as e:
                 print(f"Error parsing expires_at: {str(e)}")
         
-        # Get recipients - all portal admins or specific ones
+        # Recipients - all portal admins or specific ones
         if recipient_ids:
-            recipients = User.query.filter(
-                User.id.in_(recipient_ids),
-                User.role == 'portal_admin'
-            ).all()
+            recipients = recipient_filter('portal_admin', user_ids=recipient_ids)
+        elif organization_id:
+            # Send to portal admins of specific organization
+            recipients = recipient_filter('portal_admin', org_id=organization_id)
         else:
             # Send to all portal admins
-            if organization_id:
-                # Send to portal admins of specific organization
-                recipients = User.query.filter_by(
-                    role='portal_admin',
-                    org_id=organization_id
-                ).all()
-            else:
-                # Send to all portal admins
-                recipients = User.query.filter_by(role='portal_admin').all()
-        
-        if not recipients:
+            recipients = recipient_filter('portal_admin')
+        
+        recipients_count = count_recipients(recipients)
+        if not recipients_count:
             return jsonify({
                 'success': False,
                 'error': 'No portal admins found'
             }), 404
         
-        # Create notifications for each recipient
-        notifications_created = 0
-        for recipient in recipients:
-            notification = Notification(
-                title=title,
-                message=message,
-                notification_type=notification_type,
-                priority=priority,
-                sender_id=request.token_payload['user_id'],
-                recipient_id=recipient.id,
-                course_id=course_id,
-                organization_id=organization_id,
-                action_url=action_url,
-                expires_at=expires_at_date
-            )
-            db.session.add(notification)
-            notifications_created += 1
-        
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': f'Notification sent to {notifications_created} portal admin(s)',
-            'recipients_count': notifications_created
-        })
+        return _fan_out(recipients, recipients_count, {
+            'title': title,
+            'message': message,
+            'notification_type': notification_type,
+            'priority': priority,
+            'sender_id': request.token_payload['user_id'],
+            'course_id': course_id,
+            'organization_id': organization_id,
+            'action_url': action_url,
+            'expires_at': expires_at_date
+        }, 'portal admin(s)', data.get('background', False))
         
     except Exception as e:
         db.session.rollback()
@@ -309,65 +392,74 @@ def portal_admin_send_notification_to_employees():
                 print(f"Error parsing expires_at: {str(e)}")
         
         # Get portal admin's organization
-        portal_admin = User.query.get(current_user['user_id'])
+        portal_admin = request.current_user
         if not portal_admin.org_id:
             return jsonify({
                 'success': False,
                 'error': 'Portal admin not associated with any organization'
             }), 400
         
-        # Get recipients - all employees in organization or specific ones
-        if recipient_ids:
-            # Send to specific employees in the portal admin's organization
-            recipients = User.query.filter(
-                User.id.in_(recipient_ids),
-                User.role == 'employee',
-                User.org_id == portal_admin.org_id
-            ).all()
-        else:
-            # Send to all employees in the organization
-            recipients = User.query.filter_by(
-                role='employee',
-                org_id=portal_admin.org_id
-            ).all()
+        # Recipients - all employees in organization or specific ones
+        # (specific employees must still be in the portal admin's organization)
+        recipients = recipient_filter('employee', org_id=portal_admin.org_id, user_ids=recipient_ids)
         
-        if not recipients:
+        recipients_count = count_recipients(recipients)
+        if not recipients_count:
             return jsonify({
                 'success': False,
                 'error': 'No employees found in your organization'
             }), 404
         
-        # Create notifications for each recipient
-        notifications_created = 0
-        for recipient in recipients:
-            notification = Notification(
-                title=title,
-                message=message,
-                notification_type=notification_type,
-                priority=priority,
-                sender_id=request.token_payload['user_id'],
-                recipient_id=recipient.id,
-                course_id=course_id,
-                organization_id=portal_admin.org_id,
-                action_url=action_url,
-                expires_at=expires_at_date
-            )
-            db.session.add(notification)
-            notifications_created += 1
-        
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': f'Notification sent to {notifications_created} employee(s)',
-            'recipients_count': notifications_created
-        })
+        return _fan_out(recipients, recipients_count, {
+            'title': title,
+            'message': message,
+            'notification_type': notification_type,
+            'priority': priority,
+            'sender_id': request.token_payload['user_id'],
+            'course_id': course_id,
+            'organization_id': portal_admin.org_id,
+            'action_url': action_url,
+            'expires_at': expires_at_date
+        }, 'employee(s)', data.get('background', False))
         
     except Exception as e:
         db.session.rollback()
         print(f"Error sending notification to employees: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _fan_out(recipients, recipients_count, fields, audience, background):
+    """Write a broadcast now, or queue it as a background job when requested."""
+    if background:
+        job_id = submit_fanout_job(
+            recipients, fields, recipients_count,
+            requested_by=request.token_payload['user_id']
+        )
+        return jsonify({
+            'success': True,
+            'message': f'Notification queued for {recipients_count} {audience}',
+            'recipients_count': recipients_count,
+            'job_id': job_id
+        }), 202
+    
+    notifications_created = insert_notifications(recipients, fields)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'message': f'Notification sent to {notifications_created} {audience}',
+        'recipients_count': notifications_created
+    })
+
+@notification_bp.route('/api/notifications/fanout_jobs/<job_id>', methods=['GET'])
+@admin_or_portal_admin_required
+def get_notification_fanout_job(job_id):
+    """Get the status of a background notification fan-out"""
+    job = get_fanout_job(job_id)
+    if not job or (request.token_payload.get('role') != 'admin'
+                   and job['requested_by'] != request.token_payload['user_id']):
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
 # Get all portal admins (for Admin to select recipients)
 @notification_bp.route('/api/admin/portal_admins', methods=['GET'])
 @admin_required
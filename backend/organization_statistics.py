@@ -0,0 +1,206 @@
+"""
+Organization statistics engine shared by the portal admin dashboard endpoints.
+
+Every breakdown (per course, per employee, at-risk employees and totals) is
+computed with a fixed number of grouped SQL queries, so the cost of a request
+does not grow with the number of employees in the organization. The result is
+a plain JSON-serialisable dictionary, which makes it safe to cache.
+"""
+
+import os
+from sqlalchemy import func, case, or_
+from models import db, User, Course, Module, CourseProgress, organization_courses
+
+# A progress row is "at risk" when its risk score is above this value
+DEFAULT_RISK_THRESHOLD = int(os.getenv('ORG_STATS_RISK_THRESHOLD', 50))
+# Rows below this progress percentage also put an employee on the at-risk list
+DEFAULT_LOW_PROGRESS_THRESHOLD = float(os.getenv('ORG_STATS_LOW_PROGRESS_THRESHOLD', 30))
+
+
+def _average(total, count):
+    return round(total / count, 2) if count else 0
+
+
+def _rate(part, count):
+    return round((part / count) * 100, 2) if count else 0
+
+
+def get_organization_statistics(organization, risk_threshold=None, low_progress_threshold=None):
+    """Compute dashboard statistics for an organization.
+
+    Args:
+        organization: The Organization to report on
+        risk_threshold: Risk score above which a progress row counts as at risk
+        low_progress_threshold: Progress percentage below which a row is listed
+            as an at-risk course for the employee (0 disables the check)
+
+    Returns:
+        A dictionary with organization totals, offered courses, course and
+        employee statistics, completion by course and at-risk employees
+    """
+    if risk_threshold is None:
+        risk_threshold = DEFAULT_RISK_THRESHOLD
+    if low_progress_threshold is None:
+        low_progress_threshold = DEFAULT_LOW_PROGRESS_THRESHOLD
+
+    # Employees (columns only, no ORM objects)
+    employees = db.session.query(
+        User.id, User.username, User.email, User.designation
+    ).filter(
+        User.org_id == organization.id, User.role == 'employee'
+    ).order_by(User.id).all()
+
+    # Courses offered to the organization with their module counts
+    module_counts = db.session.query(
+        Module.course_id, func.count(Module.id).label('module_count')
+    ).group_by(Module.course_id).subquery()
+    offered_courses = db.session.query(
+        Course.id, Course.title, Course.description, Course.status,
+        func.coalesce(module_counts.c.module_count, 0).label('module_count')
+    ).join(
+        organization_courses, organization_courses.c.course_id == Course.id
+    ).outerjoin(
+        module_counts, module_counts.c.course_id == Course.id
+    ).filter(
+        organization_courses.c.organization_id == organization.id
+    ).order_by(Course.id).all()
+
+    # Aggregate columns shared by the per-course and per-employee breakdowns
+    is_completed = CourseProgress.completion_date.isnot(None)
+    is_at_risk = CourseProgress.risk_score > risk_threshold
+    aggregate_columns = (
+        func.count(CourseProgress.id).label('row_count'),
+        func.count(case((is_completed, 1))).label('completed_count'),
+        func.count(case((
+            (CourseProgress.progress_percentage > 0) & CourseProgress.completion_date.is_(None), 1
+        ))).label('in_progress_count'),
+        func.count(case((CourseProgress.progress_percentage == 0, 1))).label('not_started_count'),
+        func.coalesce(func.sum(CourseProgress.progress_percentage), 0).label('progress_sum'),
+        func.count(case((is_at_risk, 1))).label('at_risk_count'),
+    )
+
+    def org_progress_query(*columns):
+        return db.session.query(*columns).join(
+            User, User.id == CourseProgress.user_id
+        ).filter(
+            User.org_id == organization.id, User.role == 'employee'
+        )
+
+    course_rows = {
+        row.course_id: row
+        for row in org_progress_query(CourseProgress.course_id, *aggregate_columns)
+        .group_by(CourseProgress.course_id).all()
+    }
+    employee_rows = {
+        row.user_id: row
+        for row in org_progress_query(CourseProgress.user_id, *aggregate_columns)
+        .group_by(CourseProgress.user_id).all()
+    }
+
+    # At-risk progress rows with course titles in one joined query
+    risk_filter = is_at_risk
+    if low_progress_threshold:
+        risk_filter = or_(is_at_risk, CourseProgress.progress_percentage < low_progress_threshold)
+    risk_courses_by_employee = {}
+    risk_rows = org_progress_query(
+        CourseProgress.user_id,
+        Course.id.label('course_id'),
+        Course.title,
+        CourseProgress.risk_score,
+        CourseProgress.progress_percentage
+    ).join(
+        Course, Course.id == CourseProgress.course_id
+    ).filter(risk_filter).order_by(CourseProgress.user_id, CourseProgress.id).all()
+    for row in risk_rows:
+        risk_courses_by_employee.setdefault(row.user_id, []).append({
+            'course_id': row.course_id,
+            'title': row.title,
+            'risk_score': row.risk_score,
+            'progress': row.progress_percentage
+        })
+
+    course_statistics = []
+    completion_by_course = []
+    for course in offered_courses:
+        row = course_rows.get(course.id)
+        enrolled_count = row.row_count if row else 0
+        completed_count = row.completed_count if row else 0
+        completion_rate = _rate(completed_count, enrolled_count)
+        course_statistics.append({
+            'id': course.id,
+            'title': course.title,
+            'enrolled_count': enrolled_count,
+            'completed_count': completed_count,
+            'completion_rate': completion_rate,
+            'avg_progress': _average(row.progress_sum, enrolled_count) if row else 0,
+            'at_risk_count': row.at_risk_count if row else 0
+        })
+        completion_by_course.append({
+            'course_id': course.id,
+            'title': course.title,
+            'completion_rate': completion_rate
+        })
+
+    employee_statistics = []
+    employees_at_risk = []
+    for employee in employees:
+        row = employee_rows.get(employee.id)
+        assigned_count = row.row_count if row else 0
+        employee_statistics.append({
+            'id': employee.id,
+            'username': employee.username,
+            'email': employee.email,
+            'designation': employee.designation,
+            'assigned_count': assigned_count,
+            'completed_count': row.completed_count if row else 0,
+            'avg_progress': _average(row.progress_sum, assigned_count) if row else 0,
+            'high_risk_count': row.at_risk_count if row else 0
+        })
+        if employee.id in risk_courses_by_employee:
+            employees_at_risk.append({
+                'id': employee.id,
+                'username': employee.username,
+                'email': employee.email,
+                'designation': employee.designation,
+                'risk_courses': risk_courses_by_employee[employee.id]
+            })
+
+    # Every progress row belongs to exactly one employee, so totals are sums of the employee rows
+    progress_rows = sum(row.row_count for row in employee_rows.values())
+    completed_rows = sum(row.completed_count for row in employee_rows.values())
+    progress_sum = sum(row.progress_sum for row in employee_rows.values())
+
+    return {
+        'organization': {
+            'id': organization.id,
+            'name': organization.name
+        },
+        'thresholds': {
+            'risk_threshold': risk_threshold,
+            'low_progress_threshold': low_progress_threshold
+        },
+        'totals': {
+            'total_employees': len(employees),
+            'total_courses': len(offered_courses),
+            'completed_courses': completed_rows,
+            'in_progress_courses': sum(row.in_progress_count for row in employee_rows.values()),
+            'not_started_courses': sum(row.not_started_count for row in employee_rows.values()),
+            'avg_progress': _average(progress_sum, progress_rows),
+            'overall_completion_rate': _rate(completed_rows, progress_rows),
+            'employees_at_risk': len(employees_at_risk)
+        },
+        'offered_courses': [
+            {
+                'id': course.id,
+                'title': course.title,
+                'description': course.description,
+                'status': course.status,
+                'module_count': course.module_count
+            }
+            for course in offered_courses
+        ],
+        'course_statistics': course_statistics,
+        'employee_statistics': employee_statistics,
+        'completion_by_course': completion_by_course,
+        'employees_at_risk': employees_at_risk
+    }
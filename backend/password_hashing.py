@@ -0,0 +1,191 @@
+"""
+Password hashing with bcrypt on a bounded worker pool.
+
+bcrypt is deliberately slow, and a burst of logins can keep every request
+thread busy hashing. Verification and hashing therefore run on a fixed pool
+of PASSWORD_HASH_WORKERS threads (bcrypt releases the GIL while hashing), so
+at most that many cores are spent on bcrypt at once. When more than
+PASSWORD_HASH_MAX_PENDING operations are queued, logins fail fast with
+PasswordHasherBusy instead of piling up; other callers wait for a slot.
+
+New hashes use BCRYPT_ROUNDS. With BCRYPT_ROUNDS=auto the cost is calibrated
+once per process: the highest cost whose hash takes at most
+BCRYPT_TARGET_MS on this machine (clamped to 10..15). After a successful
+login a hash made with a different cost (or a plain-text development
+password) is transparently replaced in the background.
+
+Bulk imports hash many generated temporary passwords at once with
+hash_passwords(). Those are long random strings, so they may use the
+cheaper TEMP_PASSWORD_BCRYPT_ROUNDS; the first login rehashes them with the
+target cost.
+
+Configuration (environment variables):
+    BCRYPT_ROUNDS               cost for new hashes, or auto (default 12)
+    BCRYPT_TARGET_MS            target hash time for auto (default 250)
+    PASSWORD_HASH_WORKERS       bcrypt threads (default: CPU count)
+    PASSWORD_HASH_MAX_PENDING   queued operations before rejecting (default 8 per worker)
+    TEMP_PASSWORD_BCRYPT_ROUNDS cost for generated temporary passwords in bulk imports
+                                (default: same as BCRYPT_ROUNDS)
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+
+MIN_AUTO_ROUNDS = 10
+MAX_AUTO_ROUNDS = 15
+
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', PASSWORD_HASH_WORKERS * 8))
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='bcrypt')
+_pending = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+_rounds = None
+_rounds_lock = threading.Lock()
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the bcrypt queue is full."""
+
+
+def calibrate_rounds(target_ms):
+    """Highest bcrypt cost whose hash takes at most target_ms here."""
+    rounds = MIN_AUTO_ROUNDS
+    started = time.perf_counter()
+    bcrypt.hashpw(b'calibration', bcrypt.gensalt(rounds))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    # Every extra round doubles the work
+    while rounds < MAX_AUTO_ROUNDS and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    return rounds
+
+
+def target_rounds():
+    """Cost used for new hashes, calibrated on first use when BCRYPT_ROUNDS=auto."""
+    global _rounds
+    if _rounds is None:
+        with _rounds_lock:
+            if _rounds is None:
+                configured = os.getenv('BCRYPT_ROUNDS', '12').lower()
+                if configured == 'auto':
+                    _rounds = calibrate_rounds(float(os.getenv('BCRYPT_TARGET_MS', 250)))
+                    print(f"bcrypt cost calibrated to {_rounds} rounds")
+                else:
+                    _rounds = int(configured)
+    return _rounds
+
+
+def hash_rounds(stored_password):
+    """Cost a bcrypt hash was made with ($2b$12$... -> 12), or None if it cannot be parsed."""
+    try:
+        return int(stored_password.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(stored_password):
+    return hash_rounds(stored_password) != target_rounds()
+
+
+def temp_password_rounds():
+    """Cost used for generated temporary passwords."""
+    configured = os.getenv('TEMP_PASSWORD_BCRYPT_ROUNDS')
+    return int(configured) if configured else target_rounds()
+
+
+def _hash(password, rounds=None):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds or target_rounds())).decode('utf-8')
+
+
+def _verify(stored_password, provided_password):
+    try:
+        hashed = stored_password if isinstance(stored_password, bytes) else stored_password.encode('utf-8')
+        return bcrypt.checkpw(provided_password.encode('utf-8'), hashed)
+    except Exception as e:
+        print(f"Password verification error: {str(e)}")
+        # In case of error, fall back to string comparison for development
+        return stored_password == provided_password
+
+
+def submit(fn, *args, wait=False):
+    """Run fn on the bcrypt pool and return its future.
+
+    Raises PasswordHasherBusy if the queue is full, unless wait is true.
+    """
+    if not _pending.acquire(blocking=wait):
+        raise PasswordHasherBusy('Too many password operations in progress')
+    try:
+        future = _executor.submit(fn, *args)
+    except Exception:
+        _pending.release()
+        raise
+    future.add_done_callback(lambda _: _pending.release())
+    return future
+
+
+def hash_password(password):
+    """Hash a password for storing."""
+    return submit(_hash, password, wait=True).result()
+
+
+def hash_passwords(passwords, rounds=None):
+    """Hash many passwords in parallel on the pool, returning the hashes in order.
+
+    At most one operation per worker is queued at a time, so logins keep
+    finding room in the queue while a bulk job runs.
+    """
+    hashes = []
+    for start in range(0, len(passwords), PASSWORD_HASH_WORKERS):
+        futures = [submit(_hash, password, rounds, wait=True)
+                   for password in passwords[start:start + PASSWORD_HASH_WORKERS]]
+        hashes.extend(future.result() for future in futures)
+    return hashes
+
+
+def verify_password(stored_password, provided_password):
+    """Verify a stored password against provided password."""
+    return submit(_verify, stored_password, provided_password, wait=True).result()
+
+
+def timed_verify_password(stored_password, provided_password):
+    """verify_password for the login path: fails fast when busy and returns (valid, queue wait ms, hash ms)."""
+    submitted = time.perf_counter()
+    timings = {}
+
+    def run():
+        started = time.perf_counter()
+        timings['queue_ms'] = (started - submitted) * 1000
+        result = _verify(stored_password, provided_password)
+        timings['hash_ms'] = (time.perf_counter() - started) * 1000
+        return result
+
+    valid = submit(run).result()
+    return valid, timings['queue_ms'], timings['hash_ms']
+
+
+def rehash_in_background(app, user_id, old_hash, password):
+    """Re-hash a password with the target cost after login, without delaying the response.
+
+    The new hash is only stored if the password was not changed in the meantime.
+    """
+    def run():
+        new_hash = _hash(password)
+        with app.app_context():
+            from models import db, User
+            try:
+                User.query.filter_by(id=user_id, password=old_hash).update(
+                    {'password': new_hash}, synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Password rehash failed for user {user_id}: {e}")
+            finally:
+                db.session.remove()
+
+    try:
+        submit(run)
+    except PasswordHasherBusy:
+        pass  # Retried on the next login
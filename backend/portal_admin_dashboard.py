@@ -1,8 +1,13 @@
 from flask import Blueprint, jsonify, request
-from models import db, User, Organization, Course, CourseRequest, CourseProgress, Module, ModuleContent, QuizQuestion, QuizOption, QuizAttempt
+from models import db, User, Organization, Course, CourseRequest, CourseProgress, Module, ModuleContent, QuizQuestion, QuizOption, QuizAttempt, OrganizationCourseProgress
 import json
 from datetime import datetime
 from sqlalchemy import func
+from organization_statistics import get_organization_statistics
+from auth_middleware import AuthError, get_stream_token_payload
+from event_bus import event_bus, sse_response
+from progress_events import org_progress_channel
+from progress_rollup import ensure_progress_rollup
 
 portal_admin_dashboard_bp = Blueprint('portal_admin_dashboard', __name__)
 
@@ -25,118 +30,27 @@ def get_portal_admin_organization_statistics():
         if not organization:
             return jsonify({'error': 'Organization not found'}), 404
 
-        # Get all employees in this organization
-        employees = User.query.filter_by(org_id=organization.id, role='employee').all()
-        total_employees = len(employees)
-
-        # Count by status if status field exists, else skip
-        active_employees = len([e for e in employees if getattr(e, 'status', None) == 'active'])
-        inactive_employees = len([e for e in employees if getattr(e, 'status', None) == 'inactive'])
-        suspended_employees = len([e for e in employees if getattr(e, 'status', None) == 'suspended'])
-
-        # Get all course progresses for employees in this org
-        employee_ids = [e.id for e in employees]
-        progresses = CourseProgress.query.filter(CourseProgress.user_id.in_(employee_ids)).all()
-
-        # Calculate average progress
-        avg_progress = round(sum(p.progress_percentage for p in progresses) / len(progresses), 2) if progresses else 0
-
-        # Count completed courses (where completion_date is not None)
-        completed_courses = sum(1 for p in progresses if p.completion_date)
-        in_progress_courses = sum(1 for p in progresses if p.progress_percentage > 0 and not p.completion_date)
-        not_started_courses = sum(1 for p in progresses if p.progress_percentage == 0)
-
-        # Get all courses offered to this organization
-        offered_courses = organization.courses
-
-        # Course statistics
-        course_statistics = []
-        for course in offered_courses:
-            course_progresses = [p for p in progresses if p.course_id == course.id]
-            enrolled_count = len(course_progresses)
-            completed_count = sum(1 for p in course_progresses if p.completion_date)
-            avg_course_progress = round(sum(p.progress_percentage for p in course_progresses) / len(course_progresses), 2) if course_progresses else 0
-            completion_rate = (completed_count / enrolled_count * 100) if enrolled_count > 0 else 0
-            at_risk_count = sum(1 for p in course_progresses if p.risk_score > 50)
-            
-            course_statistics.append({
-                'id': course.id,
-                'title': course.title,
-                'enrolled_count': enrolled_count,
-                'completed_count': completed_count,
-                'completion_rate': round(completion_rate, 2),
-                'avg_progress': avg_course_progress,
-                'at_risk_count': at_risk_count
-            })
-
-        # Employee statistics
-        employee_statistics = []
-        employees_at_risk = []
-        
-        for employee in employees:
-            emp_progresses = [p for p in progresses if p.user_id == employee.id]
-            assigned_count = len(emp_progresses)
-            completed_count = sum(1 for p in emp_progresses if p.completion_date)
-            avg_emp_progress = round(sum(p.progress_percentage for p in emp_progresses) / len(emp_progresses), 2) if emp_progresses else 0
-            high_risk_count = sum(1 for p in emp_progresses if p.risk_score > 50)
-            
-            employee_statistics.append({
-                'id': employee.id,
-                'username': employee.username,
-                'email': employee.email,
-                'designation': employee.designation if hasattr(employee, 'designation') else None,
-                'assigned_count': assigned_count,
-                'completed_count': completed_count,
-                'avg_progress': avg_emp_progress,
-                'high_risk_count': high_risk_count
-            })
-            
-            # Identify at-risk employees
-            risk_courses = []
-            for p in emp_progresses:
-                # Consider at risk if: low progress (< 30%) or high risk score (> 50)
-                if p.progress_percentage < 30 or p.risk_score > 50:
-                    course = db.session.get(Course, p.course_id)
-                    if course:
-                        risk_courses.append({
-                            'course_id': course.id,
-                            'title': course.title,
-                            'risk_score': p.risk_score,
-                            'progress': p.progress_percentage
-                        })
-            
-            # Add to at-risk list if they have any risk courses
-            if risk_courses:
-                employees_at_risk.append({
-                    'id': employee.id,
-                    'username': employee.username,
-                    'email': employee.email,
-                    'designation': employee.designation if hasattr(employee, 'designation') else None,
-                    'risk_courses': risk_courses
-                })
+        statistics = get_organization_statistics(
+            organization,
+            risk_threshold=request.args.get('risk_threshold', type=int),
+            low_progress_threshold=request.args.get('low_progress_threshold', type=float)
+        )
+        totals = statistics['totals']
 
+        # The User model has no status column, so the status breakdown stays at zero
         stats = {
-            'total_employees': total_employees,
-            'active_employees': active_employees,
-            'inactive_employees': inactive_employees,
-            'suspended_employees': suspended_employees,
-            'completed_courses': completed_courses,
-            'in_progress_courses': in_progress_courses,
-            'not_started_courses': not_started_courses,
-            'avg_progress': avg_progress,
-            'offered_courses': [
-                {
-                    'id': course.id,
-                    'title': course.title,
-                    'description': course.description,
-                    'status': course.status,
-                    'module_count': len(course.modules)
-                }
-                for course in offered_courses
-            ],
-            'course_statistics': course_statistics,
-            'employee_statistics': employee_statistics,
-            'employees_at_risk': employees_at_risk
+            'total_employees': totals['total_employees'],
+            'active_employees': 0,
+            'inactive_employees': 0,
+            'suspended_employees': 0,
+            'completed_courses': totals['completed_courses'],
+            'in_progress_courses': totals['in_progress_courses'],
+            'not_started_courses': totals['not_started_courses'],
+            'avg_progress': totals['avg_progress'],
+            'offered_courses': statistics['offered_courses'],
+            'course_statistics': statistics['course_statistics'],
+            'employee_statistics': statistics['employee_statistics'],
+            'employees_at_risk': statistics['employees_at_risk']
         }
 
         return jsonify({
@@ -150,6 +64,56 @@ def get_portal_admin_organization_statistics():
             'error': f'Failed to get organization statistics: {str(e)}'
         }), 500
 
+@portal_admin_dashboard_bp.route('/api/portal_admin/progress/stream', methods=['GET'])
+def stream_organization_progress():
+    """Server-sent event stream of the organization's learner progress.
+    
+    Portal admins get their own organization; admins pass ?organization_id=.
+    The stream opens with a 'rollup' event holding the per-course progress
+    counters, followed by progress, quiz_attempt and simulation_completed events.
+    """
+    try:
+        payload = get_stream_token_payload()
+    except AuthError as e:
+        return jsonify({'error': e.error}), e.status_code
+
+    if payload.get('role') == 'portal_admin':
+        org_id = payload.get('org_id')
+    elif payload.get('role') == 'admin':
+        org_id = request.args.get('organization_id', type=int)
+    else:
+        return jsonify({'error': 'Insufficient permissions'}), 403
+    if not org_id:
+        return jsonify({'error': 'organization_id is required'}), 400
+
+    # Subscribe before reading the rollup so no change between the two is missed
+    subscription = event_bus.subscribe(org_progress_channel(org_id))
+    try:
+        ensure_progress_rollup()
+        rollup = [
+            {
+                'course_id': row.course_id,
+                'enrolled': row.enrolled_count,
+                'completed': row.completed_count,
+                'in_progress': row.in_progress_count,
+                'not_started': row.not_started_count,
+                'avg_progress': round(row.progress_sum / row.enrolled_count, 2) if row.enrolled_count else 0,
+                'high_risk': row.high_risk_count,
+                'medium_risk': row.medium_risk_count,
+                'low_risk': row.low_risk_count
+            }
+            for row in OrganizationCourseProgress.query.filter_by(org_id=org_id).order_by(OrganizationCourseProgress.course_id).all()
+        ]
+    except Exception as e:
+        event_bus.unsubscribe(subscription)
+        print(f"Error opening progress stream: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        # Give the connection back to the pool for the life of the stream
+        db.session.remove()
+
+    return sse_response(subscription, [('rollup', {'organization_id': org_id, 'courses': rollup})])
+
 @portal_admin_dashboard_bp.route('/api/portal_admin/invite_employee', methods=['POST'])
 def invite_employee():
     """Invite a new employee to the organization"""
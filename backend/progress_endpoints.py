@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 from models import db, User, Course, Module, CourseProgress
+from progress_rollup import progress_snapshot, record_progress_change
+from progress_events import publish_course_progress
 import json
 import datetime
 
@@ -36,6 +38,7 @@ def update_course_progress():
             user_id=user.id, 
             course_id=course_id
         ).first()
+        rollup_before = progress_snapshot(progress_record)
         
         current_time = datetime.datetime.utcnow()
         
@@ -47,6 +50,7 @@ def update_course_progress():
                 total_modules=total_modules,
                 completed_modules=0,
                 progress_percentage=0,
+                risk_score=0,
                 module_progress=json.dumps({}),
                 last_activity=current_time  # Initialize last_activity
             )
@@ -92,6 +96,8 @@ def update_course_progress():
         
         # Save changes
         progress_record.module_progress = json.dumps(module_progress)
+        record_progress_change(user.org_id, course.id, rollup_before, progress_snapshot(progress_record))
+        publish_course_progress(user, progress_record, rollup_before)
         db.session.commit()
         
         return jsonify({
@@ -0,0 +1,57 @@
+"""
+Progress events for live portal admin dashboards.
+
+Progress writers (course progress updates, course completion, quiz
+submissions, simulation completion) publish an event on the event bus
+channel of the learner's organization when their transaction commits.
+Dashboards subscribe to /api/portal_admin/progress/stream and apply the
+events to the figures they already show instead of re-running the full
+organization statistics on a timer.
+
+Event types:
+    progress             course progress changed (with previous values)
+    quiz_attempt         a quiz attempt was graded
+    simulation_completed a simulation attempt was completed
+"""
+
+import datetime
+from models import db
+from event_bus import publish_after_commit
+
+
+def org_progress_channel(org_id):
+    """Event bus channel of an organization's progress stream"""
+    return f"org:{org_id}:progress"
+
+
+def publish_progress_event(user, event_type, data):
+    """Queue a progress event for the user's organization (published on commit)."""
+    if not user.org_id:
+        return
+    publish_after_commit(db.session, [org_progress_channel(user.org_id)], event_type, {
+        'user_id': user.id,
+        'username': user.username,
+        'occurred_at': datetime.datetime.utcnow().isoformat(),
+        **data
+    })
+
+
+def publish_course_progress(user, progress_record, snapshot_before):
+    """Publish the new state of a CourseProgress row.
+
+    Args:
+        user: Learner the progress belongs to
+        progress_record: CourseProgress after the change
+        snapshot_before: progress_snapshot() of the row before the change (None if it was created)
+    """
+    previous_progress, previous_risk = snapshot_before if snapshot_before else (None, None)
+    publish_progress_event(user, 'progress', {
+        'course_id': progress_record.course_id,
+        'progress_percentage': progress_record.progress_percentage,
+        'completed_modules': progress_record.completed_modules,
+        'total_modules': progress_record.total_modules,
+        'risk_score': progress_record.risk_score,
+        'is_completed': progress_record.completed_modules == progress_record.total_modules,
+        'previous_progress_percentage': previous_progress,
+        'previous_risk_score': previous_risk
+    })
@@ -0,0 +1,175 @@
+"""
+Incrementally maintained organization x course progress rollup.
+
+Dashboards read OrganizationCourseProgress (one row per organization and
+course) instead of re-aggregating the whole CourseProgress table. Endpoints
+that write a progress row take a snapshot of the row before changing it and
+call record_progress_change() with the before/after snapshots in the same
+transaction; the difference is applied to the rollup as counter increments.
+
+Run rebuild_progress_rollup.py to rebuild the table from scratch. A full
+rebuild records a SystemSettings marker; until that marker exists the
+dashboards rebuild the table on first read, even if progress writes have
+already created some cells.
+"""
+
+import datetime
+from sqlalchemy import func, case, and_
+from sqlalchemy.exc import IntegrityError
+from models import db, User, CourseProgress, OrganizationCourseProgress, SystemSettings
+
+# SystemSettings row recording that the rollup has been fully built
+ROLLUP_MARKER_CATEGORY = 'system'
+ROLLUP_MARKER_KEY = 'progress_rollup_built'
+
+# Set once this process has seen the marker, so later reads skip the lookup
+_rollup_built = False
+
+# Same risk buckets as /api/admin/org_stats
+HIGH_RISK_MIN = 8
+MEDIUM_RISK_MIN = 5
+
+COUNTER_COLUMNS = (
+    'enrolled_count', 'completed_count', 'in_progress_count', 'not_started_count',
+    'progress_sum', 'risk_score_sum', 'high_risk_count', 'medium_risk_count', 'low_risk_count'
+)
+
+
+def progress_snapshot(progress_record):
+    """Return the values of a progress row that the rollup depends on, or None."""
+    if progress_record is None:
+        return None
+    return (progress_record.progress_percentage or 0, progress_record.risk_score)
+
+
+def _contribution(snapshot):
+    """Counter values a single progress row with this snapshot adds to its rollup cell."""
+    if snapshot is None:
+        return dict.fromkeys(COUNTER_COLUMNS, 0)
+    progress, risk_score = snapshot
+    return {
+        'enrolled_count': 1,
+        'completed_count': int(progress == 100),
+        'in_progress_count': int(0 < progress < 100),
+        'not_started_count': int(progress == 0),
+        'progress_sum': progress,
+        'risk_score_sum': risk_score or 0,
+        'high_risk_count': int(risk_score is not None and risk_score >= HIGH_RISK_MIN),
+        'medium_risk_count': int(risk_score is not None and MEDIUM_RISK_MIN <= risk_score < HIGH_RISK_MIN),
+        'low_risk_count': int(risk_score is not None and risk_score < MEDIUM_RISK_MIN),
+    }
+
+
+def _cell_filter(org_id, course_id):
+    org_clause = OrganizationCourseProgress.org_id.is_(None) if org_id is None else OrganizationCourseProgress.org_id == org_id
+    return and_(org_clause, OrganizationCourseProgress.course_id == course_id)
+
+
+def _aggregate_query():
+    """Grouped CourseProgress query producing rollup rows keyed by (org_id, course_id)."""
+    risk = CourseProgress.risk_score
+    progress = func.coalesce(CourseProgress.progress_percentage, 0)
+    return db.session.query(
+        User.org_id.label('org_id'),
+        CourseProgress.course_id.label('course_id'),
+        func.count(CourseProgress.id).label('enrolled_count'),
+        func.count(case((progress == 100, 1))).label('completed_count'),
+        func.count(case((and_(progress > 0, progress < 100), 1))).label('in_progress_count'),
+        func.count(case((progress == 0, 1))).label('not_started_count'),
+        func.coalesce(func.sum(progress), 0).label('progress_sum'),
+        func.coalesce(func.sum(risk), 0).label('risk_score_sum'),
+        func.count(case((risk >= HIGH_RISK_MIN, 1))).label('high_risk_count'),
+        func.count(case((and_(risk >= MEDIUM_RISK_MIN, risk < HIGH_RISK_MIN), 1))).label('medium_risk_count'),
+        func.count(case((risk < MEDIUM_RISK_MIN, 1))).label('low_risk_count'),
+    ).join(
+        User, User.id == CourseProgress.user_id
+    ).group_by(User.org_id, CourseProgress.course_id)
+
+
+def _rollup_rows(query):
+    return [
+        {'org_id': row.org_id, 'course_id': row.course_id, **{column: getattr(row, column) for column in COUNTER_COLUMNS}}
+        for row in query.all()
+    ]
+
+
+def refresh_rollup_cell(org_id, course_id):
+    """Recompute a single (organization, course) rollup row from CourseProgress."""
+    db.session.flush()
+    org_clause = User.org_id.is_(None) if org_id is None else User.org_id == org_id
+    rows = _rollup_rows(_aggregate_query().filter(org_clause, CourseProgress.course_id == course_id))
+    OrganizationCourseProgress.query.filter(_cell_filter(org_id, course_id)).delete(synchronize_session=False)
+    if rows:
+        db.session.add(OrganizationCourseProgress(**rows[0]))
+        db.session.flush()
+
+
+def record_progress_change(org_id, course_id, before, after):
+    """Apply the change of one progress row to its rollup cell.
+
+    Args:
+        org_id: Organization of the user owning the progress row
+        course_id: Course of the progress row
+        before: progress_snapshot() taken before the change (None for a new row)
+        after: progress_snapshot() taken after the change (None for a deleted row)
+
+    The caller commits the session, so the rollup stays consistent with the
+    progress row it describes.
+    """
+    old, new = _contribution(before), _contribution(after)
+    delta = {column: new[column] - old[column] for column in COUNTER_COLUMNS}
+    if not any(delta.values()):
+        return
+
+    values = {getattr(OrganizationCourseProgress, column): getattr(OrganizationCourseProgress, column) + change
+              for column, change in delta.items() if change}
+    values[OrganizationCourseProgress.updated_at] = datetime.datetime.utcnow()
+
+    def apply_delta():
+        return OrganizationCourseProgress.query.filter(
+            _cell_filter(org_id, course_id)
+        ).update(values, synchronize_session=False)
+
+    if apply_delta():
+        return
+    # No rollup row yet (new cell or the table was never built): derive it from the source rows
+    try:
+        with db.session.begin_nested():
+            refresh_rollup_cell(org_id, course_id)
+    except IntegrityError:
+        # A concurrent first write created the cell from committed rows only; add this change to it
+        apply_delta()
+
+
+def _rollup_marker():
+    return SystemSettings.query.filter_by(category=ROLLUP_MARKER_CATEGORY, setting_key=ROLLUP_MARKER_KEY).first()
+
+
+def rebuild_progress_rollup():
+    """Rebuild the whole rollup table from CourseProgress. Returns the number of rows written."""
+    global _rollup_built
+    rows = _rollup_rows(_aggregate_query())
+    OrganizationCourseProgress.query.delete(synchronize_session=False)
+    if rows:
+        db.session.execute(OrganizationCourseProgress.__table__.insert(), rows)
+
+    marker = _rollup_marker()
+    if marker is None:
+        marker = SystemSettings(category=ROLLUP_MARKER_CATEGORY, setting_key=ROLLUP_MARKER_KEY,
+                                data_type='string', description='Time of the last full progress rollup rebuild')
+        db.session.add(marker)
+    marker.setting_value = datetime.datetime.utcnow().isoformat()
+    db.session.commit()
+    _rollup_built = True
+    return len(rows)
+
+
+def ensure_progress_rollup():
+    """Build the rollup on first use, unless a full rebuild has already been recorded."""
+    global _rollup_built
+    if _rollup_built:
+        return
+    if _rollup_marker() is not None:
+        _rollup_built = True
+        return
+    rebuild_progress_rollup()
@@ -0,0 +1,121 @@
+"""
+Opt-in per-request SQL instrumentation and N+1 detection.
+
+When enabled, every SQL statement executed while handling a request is
+counted and timed through SQLAlchemy engine events. Statements are reduced to
+a fingerprint (literals and bind parameters removed, IN lists collapsed) so
+that the same query run in a loop with different ids is recognised as a
+repeat. A fingerprint repeated at least SQL_N_PLUS_ONE_THRESHOLD times in one
+request is reported as a likely N+1 pattern.
+
+Results are added to every response as headers:
+    X-DB-Query-Count, X-DB-Time-Ms, X-DB-N-Plus-One
+and written as one JSON log line per request.
+
+Configuration (environment variables):
+    SQL_INSTRUMENTATION           true to enable (default false)
+    SQL_N_PLUS_ONE_THRESHOLD      repeats of one fingerprint to flag (default 5)
+    SQL_INSTRUMENTATION_LOG       all | n_plus_one | none (default n_plus_one)
+"""
+
+import json
+import os
+import re
+import time
+from collections import Counter
+from flask import g, request, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_BIND_PARAMETER = re.compile(r"%\(\w+\)s|%s|\?|:\w+")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement):
+    """Normalise a SQL statement so repeats with different values compare equal."""
+    normalised = _STRING_LITERAL.sub('?', statement)
+    normalised = _BIND_PARAMETER.sub('?', normalised)
+    normalised = _NUMBER_LITERAL.sub('?', normalised)
+    normalised = _IN_LIST.sub('IN (?)', normalised)
+    return _WHITESPACE.sub(' ', normalised).strip()
+
+
+def _current_stats():
+    if not has_app_context():
+        return None
+    return g.get('sql_stats')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        conn.info.setdefault('sql_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    if stats is None:
+        return
+    starts = conn.info.get('sql_query_start')
+    elapsed = time.perf_counter() - starts.pop() if starts else 0.0
+    stats['count'] += 1
+    stats['seconds'] += elapsed
+    stats['fingerprints'][fingerprint(statement)] += 1
+
+
+def summarize(stats, threshold):
+    """Build the report for one request from the collected stats."""
+    repeated = [
+        {'fingerprint': statement, 'count': count}
+        for statement, count in stats['fingerprints'].most_common()
+        if count >= threshold
+    ]
+    return {
+        'query_count': stats['count'],
+        'db_time_ms': round(stats['seconds'] * 1000, 2),
+        'distinct_statements': len(stats['fingerprints']),
+        'n_plus_one_suspects': repeated
+    }
+
+
+def init_query_instrumentation(app):
+    """Register the request hooks and engine listeners if SQL_INSTRUMENTATION is enabled."""
+    if os.getenv('SQL_INSTRUMENTATION', 'false').lower() != 'true':
+        return False
+
+    threshold = int(os.getenv('SQL_N_PLUS_ONE_THRESHOLD', 5))
+    log_mode = os.getenv('SQL_INSTRUMENTATION_LOG', 'n_plus_one').lower()
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_sql_stats():
+        g.sql_stats = {'count': 0, 'seconds': 0.0, 'fingerprints': Counter()}
+
+    @app.after_request
+    def report_sql_stats(response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        report = summarize(stats, threshold)
+        response.headers['X-DB-Query-Count'] = str(report['query_count'])
+        response.headers['X-DB-Time-Ms'] = str(report['db_time_ms'])
+        response.headers['X-DB-N-Plus-One'] = str(len(report['n_plus_one_suspects']))
+
+        if log_mode == 'all' or (log_mode == 'n_plus_one' and report['n_plus_one_suspects']):
+            print(json.dumps({
+                'event': 'sql_request_stats',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                **report
+            }))
+        return response
+
+    print(f"SQL instrumentation enabled (N+1 threshold: {threshold}, log: {log_mode})")
+    return True
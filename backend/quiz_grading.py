@@ -0,0 +1,235 @@
+"""
+Quiz loading and grading helpers for the employee quiz endpoints.
+
+All questions of a quiz are loaded together with their options in one query,
+and answers are graded in memory against precomputed sets of correct option
+ids, so fetching and grading cost the same number of queries whatever the
+length of the quiz.
+
+Compiled answer keys are cached per quiz content id (answer_key_cache) and
+invalidated by the quiz question create/update/delete endpoints.
+Configuration (environment variables):
+    QUIZ_ANSWER_KEY_CACHE_BACKEND      memory | redis | none (default memory)
+    QUIZ_ANSWER_KEY_CACHE_URL          Redis URL for the shared backend
+    QUIZ_ANSWER_KEY_CACHE_TTL          seconds a key stays cached (default 600)
+    QUIZ_ANSWER_KEY_CACHE_MAX_ENTRIES  LRU size for the memory backend (default 1024)
+With several workers and the memory backend, an edit is picked up by the
+other workers when their entry expires; use the redis backend to share
+invalidations immediately.
+"""
+
+import datetime
+import json
+import os
+import threading
+from collections import namedtuple
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from models import db, Module, ModuleContent, QuizQuestion, QuizAttempt, user_courses
+from response_cache import MemoryCacheBackend, cache_backend_from_env
+
+# Percentage needed to pass a quiz
+PASSING_PERCENTAGE = 70
+
+# One question of an answer key (keys list questions in quiz order) with the ids of its correct options
+AnswerKeyEntry = namedtuple('AnswerKeyEntry', ['question_id', 'question_text', 'question_type', 'correct_option_ids'])
+
+
+def get_quiz_content(content_id):
+    """Return (content, course_id) for a quiz content, or (None, None) if it is not a quiz."""
+    row = db.session.query(ModuleContent, Module.course_id).outerjoin(
+        Module, Module.id == ModuleContent.module_id
+    ).filter(ModuleContent.id == content_id).first()
+    if not row or row[0].content_type != 'quiz':
+        return None, None
+    return row
+
+
+def is_course_assigned(user_id, course_id):
+    """Check the user_courses association directly instead of loading user.courses."""
+    return db.session.query(user_courses.c.course_id).filter(
+        user_courses.c.user_id == user_id,
+        user_courses.c.course_id == course_id
+    ).first() is not None
+
+
+def load_quiz_questions(content_id):
+    """Load the questions of a quiz with their options in a single query, in quiz order."""
+    return QuizQuestion.query.options(
+        joinedload(QuizQuestion.options)
+    ).filter(
+        QuizQuestion.content_id == content_id
+    ).order_by(QuizQuestion.order, QuizQuestion.id).all()
+
+
+def build_answer_key(questions):
+    """Compile loaded questions into a tuple of AnswerKeyEntry."""
+    return tuple(
+        AnswerKeyEntry(
+            question_id=question.id,
+            question_text=question.question_text,
+            question_type=question.question_type,
+            correct_option_ids=frozenset(option.id for option in question.options if option.is_correct)
+        )
+        for question in questions
+    )
+
+
+class AnswerKeyCache:
+    """Cache of compiled answer keys per quiz content id."""
+
+    def __init__(self, backend=None, ttl=600):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, prefix='QUIZ_ANSWER_KEY_CACHE'):
+        return cls(cache_backend_from_env(prefix, default_max_entries=1024),
+                   ttl=int(os.getenv(f'{prefix}_TTL', 600)))
+
+    @staticmethod
+    def _key(content_id):
+        return f"answer_key:{int(content_id)}"
+
+    def _encode(self, answer_key):
+        # The in-process backend keeps the compiled tuple, shared backends need bytes
+        if isinstance(self.backend, MemoryCacheBackend):
+            return answer_key
+        return json.dumps([
+            [entry.question_id, entry.question_text, entry.question_type, sorted(entry.correct_option_ids)]
+            for entry in answer_key
+        ])
+
+    def _decode(self, value):
+        if isinstance(self.backend, MemoryCacheBackend):
+            return value
+        return tuple(
+            AnswerKeyEntry(question_id, question_text, question_type, frozenset(correct_option_ids))
+            for question_id, question_text, question_type, correct_option_ids in json.loads(value)
+        )
+
+    def _count(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def get_answer_key(self, content_id):
+        """Return the compiled answer key for a quiz, building and caching it on a miss."""
+        if self.backend is None:
+            return build_answer_key(load_quiz_questions(content_id))
+        key = self._key(content_id)
+        try:
+            cached = self.backend.get(key)
+        except Exception as e:
+            print(f"Answer key cache read failed: {e}")
+            cached = None
+        if cached is not None:
+            self._count('hits')
+            return self._decode(cached)
+
+        self._count('misses')
+        answer_key = build_answer_key(load_quiz_questions(content_id))
+        if answer_key:
+            try:
+                self.backend.set(key, self._encode(answer_key), self.ttl)
+            except Exception as e:
+                print(f"Answer key cache write failed: {e}")
+        return answer_key
+
+    def invalidate(self, content_id):
+        """Drop the cached answer key of a quiz after its questions or options changed."""
+        if self.backend is None:
+            return
+        try:
+            self.backend.delete(self._key(content_id))
+        except Exception as e:
+            print(f"Answer key cache invalidation failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': type(self.backend).__name__ if self.backend else None,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+answer_key_cache = AnswerKeyCache.from_env()
+
+
+def is_answer_correct(entry, selected_options):
+    """Grade one answer against its answer key entry."""
+    if entry.question_type in ('single-choice', 'true-false'):
+        # Exactly one option selected and it is a correct one
+        return len(selected_options) == 1 and selected_options[0] in entry.correct_option_ids
+    if entry.question_type == 'multiple-choice':
+        # All correct options selected and no incorrect ones
+        return set(selected_options) == entry.correct_option_ids
+    return False
+
+
+def grade_quiz(answer_key, answers):
+    """Grade submitted answers in memory.
+
+    Args:
+        answer_key: Tuple of AnswerKeyEntry from build_answer_key
+        answers: List of {'question_id': ..., 'selected_options': [...]}
+
+    Returns:
+        A results dictionary with score, percentage, pass flag and per-question results
+    """
+    answer_map = {
+        answer.get('question_id'): answer.get('selected_options', [])
+        for answer in answers
+    }
+
+    correct_answers = 0
+    question_results = []
+    for entry in answer_key:
+        user_answer = answer_map.get(entry.question_id, [])
+        is_correct = is_answer_correct(entry, user_answer)
+        if is_correct:
+            correct_answers += 1
+        question_results.append({
+            'question_id': entry.question_id,
+            'question_text': entry.question_text,
+            'user_answer': user_answer,
+            'correct_options': sorted(entry.correct_option_ids),
+            'is_correct': is_correct
+        })
+
+    total_questions = len(answer_key)
+    percentage = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
+    return {
+        'score': correct_answers,
+        'total_questions': total_questions,
+        'percentage': round(percentage, 2),
+        'passed': percentage >= PASSING_PERCENTAGE,
+        'question_results': question_results
+    }
+
+
+def record_quiz_attempt(user_id, content_id, results, answers, time_taken_minutes=None):
+    """Add a QuizAttempt for graded results to the session (the caller commits)."""
+    previous_attempts = db.session.query(func.count(QuizAttempt.id)).filter(
+        QuizAttempt.user_id == user_id,
+        QuizAttempt.quiz_content_id == content_id
+    ).scalar() or 0
+    now = datetime.datetime.utcnow()
+    attempt = QuizAttempt(
+        user_id=user_id,
+        quiz_content_id=content_id,
+        attempt_number=previous_attempts + 1,
+        score=results['percentage'],
+        total_questions=results['total_questions'],
+        correct_answers=results['score'],
+        time_taken_minutes=time_taken_minutes,
+        started_at=now - datetime.timedelta(minutes=time_taken_minutes) if time_taken_minutes else now,
+        completed_at=now,
+        answers=json.dumps(answers)
+    )
+    db.session.add(attempt)
+    return attempt
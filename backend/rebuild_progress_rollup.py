@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Script to rebuild the organization x course progress rollup table.
+Run this after deploying the rollup table, or whenever the rollup may have
+drifted from CourseProgress (manual data fixes, bulk imports).
+"""
+
+from app import app, db
+from progress_rollup import rebuild_progress_rollup
+
+def rebuild_rollup():
+    """Recreate the rollup table if needed and refill it from CourseProgress."""
+    with app.app_context():
+        try:
+            db.create_all()
+            print("Rebuilding organization progress rollup...")
+            row_count = rebuild_progress_rollup()
+            print(f"✅ Wrote {row_count} organization/course rollup rows")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error rebuilding progress rollup: {str(e)}")
+            return False
+
+    return True
+
+if __name__ == "__main__":
+    success = rebuild_rollup()
+    if success:
+        print("\n🎉 Rollup rebuild completed successfully!")
+    else:
+        print("\n💥 Rollup rebuild failed!")
@@ -0,0 +1,289 @@
+"""
+TTL response cache with write-based invalidation for read-heavy endpoints.
+
+Cached views declare the tables their numbers come from. Committing a
+session that inserted, updated or deleted rows in one of those tables bumps
+the table's generation counter, and every cache key embeds the generations
+of its tables, so stale entries are simply never read again and age out.
+
+Two storage backends are available:
+    memory - in-process LRU with per-entry TTL (default)
+    redis  - any Redis-compatible server, shared by all workers
+             (requires the optional ``redis`` package)
+
+Configuration (environment variables, PREFIX is e.g. ANALYTICS_CACHE):
+    PREFIX_BACKEND      memory | redis | none
+    PREFIX_URL          redis://localhost:6379/0
+    PREFIX_TTL          seconds an entry stays valid (default 60)
+    PREFIX_MAX_ENTRIES  LRU size for the memory backend (default 256)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class MemoryCacheBackend:
+    """Thread-safe in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def incr_counter(self, name):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+            return self._counters[name]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Backend storing entries and generation counters in a Redis-compatible server."""
+
+    def __init__(self, url, namespace='response_cache'):
+        import redis  # Optional dependency, only needed for this backend
+        self.client = redis.Redis.from_url(url)
+        self.namespace = namespace
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def get(self, key):
+        return self.client.get(self._key(key))
+
+    def set(self, key, value, ttl):
+        self.client.set(self._key(key), value, ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def get_counter(self, name):
+        value = self.client.get(self._key(f"counter:{name}"))
+        return int(value) if value else 0
+
+    def incr_counter(self, name):
+        return self.client.incr(self._key(f"counter:{name}"))
+
+    def clear(self):
+        for key in self.client.scan_iter(self._key('*')):
+            self.client.delete(key)
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(self._key('*')))
+
+
+def cache_backend_from_env(prefix, default_max_entries=256):
+    """Build the storage backend selected by PREFIX_BACKEND, or None when caching is disabled."""
+    backend_name = os.getenv(f'{prefix}_BACKEND', 'memory').lower()
+    if backend_name == 'redis':
+        try:
+            return RedisCacheBackend(
+                os.getenv(f'{prefix}_URL', 'redis://localhost:6379/0'),
+                namespace=prefix.lower()
+            )
+        except Exception as e:
+            print(f"Redis cache backend unavailable ({e}), falling back to in-process cache")
+            backend_name = 'memory'
+    if backend_name == 'memory':
+        return MemoryCacheBackend(int(os.getenv(f'{prefix}_MAX_ENTRIES', default_max_entries)))
+    return None
+
+
+class ResponseCache:
+    """Caches successful JSON responses of Flask views keyed by endpoint and query params."""
+
+    def __init__(self, backend=None, default_ttl=60):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.endpoint_stats = {}
+        self._lock = threading.Lock()
+        self._watched_tables = set()
+
+    @classmethod
+    def from_env(cls, prefix):
+        """Build a cache from PREFIX_* environment variables (see module docstring)."""
+        return cls(cache_backend_from_env(prefix), default_ttl=int(os.getenv(f'{prefix}_TTL', 60)))
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def _record(self, endpoint, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            counts = self.endpoint_stats.setdefault(endpoint, {'hits': 0, 'misses': 0})
+            counts[outcome] += 1
+
+    def _generations(self, tables):
+        return ','.join(f"{table}={self.backend.get_counter(f'generation:{table}')}" for table in tables)
+
+    def _cache_key(self, endpoint, tables):
+        params = '&'.join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+        return f"{endpoint}?{params}#{self._generations(tables)}"
+
+    def cached(self, depends_on, ttl=None):
+        """Decorator caching a view's 200 responses until ttl expires or a dependency table changes.
+
+        Args:
+            depends_on: Table names whose writes invalidate the cached response
+            ttl: Seconds to keep a response (defaults to the cache's default_ttl)
+        """
+        tables = tuple(sorted(depends_on))
+        self._watched_tables.update(tables)
+
+        def decorator(f):
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                if not self.enabled:
+                    return f(*args, **kwargs)
+
+                try:
+                    key = self._cache_key(request.endpoint, tables)
+                    cached = self.backend.get(key)
+                except Exception as e:
+                    print(f"Response cache read failed: {e}")
+                    return f(*args, **kwargs)
+                if cached is not None:
+                    self._record(request.endpoint, 'hits')
+                    response = Response(cached, status=200, mimetype='application/json')
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self._record(request.endpoint, 'misses')
+                result = f(*args, **kwargs)
+                response = result[0] if isinstance(result, tuple) else result
+                status = result[1] if isinstance(result, tuple) and len(result) > 1 else getattr(response, 'status_code', 200)
+                if isinstance(response, Response) and status == 200 and response.mimetype == 'application/json':
+                    try:
+                        self.backend.set(key, response.get_data(), ttl or self.default_ttl)
+                    except Exception as e:
+                        print(f"Response cache write failed: {e}")
+                    response.headers['X-Cache'] = 'MISS'
+                return result
+            return decorated
+        return decorator
+
+    def invalidate(self, *tables):
+        """Invalidate every cached response that depends on one of the given tables."""
+        if not self.enabled:
+            return
+        for table in tables:
+            if table in self._watched_tables:
+                try:
+                    self.backend.incr_counter(f'generation:{table}')
+                except Exception as e:
+                    print(f"Response cache invalidation failed: {e}")
+                    continue
+                with self._lock:
+                    self.invalidations += 1
+
+    def clear(self):
+        if self.enabled:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': type(self.backend).__name__ if self.backend else None,
+                'ttl_seconds': self.default_ttl,
+                'entries': self.backend.size() if self.backend else 0,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups * 100, 2) if lookups else 0,
+                'invalidations': self.invalidations,
+                'watched_tables': sorted(self._watched_tables),
+                'endpoints': {endpoint: dict(counts) for endpoint, counts in self.endpoint_stats.items()}
+            }
+
+
+# Registered caches, invalidated together when a session commits
+_caches = []
+
+
+def register_cache(cache):
+    _caches.append(cache)
+    return cache
+
+
+def _changed_tables(session):
+    return session.info.setdefault('response_cache_changed_tables', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    changed = _changed_tables(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            changed.add(table)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_statement_tables(orm_execute_state):
+    # query.update()/delete() and insert()/update()/delete() statements bypass the flush
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and getattr(table, 'name', None):
+            _changed_tables(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_tables(session):
+    changed = session.info.pop('response_cache_changed_tables', None)
+    if changed:
+        for cache in _caches:
+            cache.invalidate(*changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_tables(session):
+    session.info.pop('response_cache_changed_tables', None)
+
+
+# Cache for the /api/analytics/* dashboard endpoints
+analytics_cache = register_cache(ResponseCache.from_env('ANALYTICS_CACHE'))
@@ -10,6 +10,7 @@ Handles all simulation-related functionality including:
 from flask import Blueprint, jsonify, request
 from models import db, Simulation, SimulationScenario, SimulationStep, SimulationAttempt, ModuleContent, User
 from auth_middleware import token_required, role_required
+from progress_events import publish_progress_event
 import json
 import datetime
 
@@ -678,6 +679,15 @@ def complete_simulation(attempt_id):
         if 'attempt_data' in data:
             attempt.attempt_data = json.dumps(data['attempt_data'])
         
+        publish_progress_event(current_user, 'simulation_completed', {
+            'simulation_id': attempt.simulation_id,
+            'attempt_id': attempt.id,
+            'score': attempt.score,
+            'completed_steps': attempt.completed_steps,
+            'total_steps': attempt.total_steps,
+            'time_taken_minutes': attempt.time_taken_minutes,
+            'passed': attempt.score >= 70 if attempt.score is not None else False
+        })
         db.session.commit()
         
         return jsonify({
@@ -5,48 +5,39 @@ This should be run after updating the course assignment logic to clean up any ex
 """
 
 from app import app, db
-from models import User, Organization
+from sqlalchemy import func
+from models import User, Organization, organization_courses
+from course_assignment import sync_employee_courses_with_organizations
 
 def sync_employee_courses():
     """Sync all employees' courses with their organization's courses."""
     with app.app_context():
         try:
-            # Get all organizations
-            organizations = Organization.query.all()
-            total_employees_updated = 0
-            
             print("Starting employee course synchronization...")
-            print(f"Found {len(organizations)} organizations")
-            
-            for org in organizations:
-                print(f"\nProcessing organization: {org.name}")
-                print(f"Organization has {len(org.courses)} assigned courses:")
-                for course in org.courses:
-                    print(f"  - {course.title} (ID: {course.id})")
-                
-                # Get all employees in this organization
-                employees = User.query.filter_by(org_id=org.id, role='employee').all()
-                print(f"Found {len(employees)} employees in this organization")
-                
-                for employee in employees:
-                    print(f"  Processing employee: {employee.username}")
-                    
-                    # Clear existing courses
-                    old_course_count = len(employee.courses)
-                    employee.courses.clear()
-                    
-                    # Assign organization's courses
-                    for course in org.courses:
-                        employee.courses.append(course)
-                    
-                    new_course_count = len(employee.courses)
-                    print(f"    Updated courses: {old_course_count} -> {new_course_count}")
-                    
-                total_employees_updated += len(employees)
-            
-            # Commit all changes
+
+            # One grouped query for the per-organization overview
+            overview = db.session.query(
+                Organization.name,
+                func.count(func.distinct(organization_courses.c.course_id)),
+                func.count(func.distinct(User.id))
+            ).outerjoin(
+                organization_courses, organization_courses.c.organization_id == Organization.id
+            ).outerjoin(
+                User, (User.org_id == Organization.id) & (User.role == 'employee')
+            ).group_by(Organization.id, Organization.name).all()
+
+            print(f"Found {len(overview)} organizations")
+            total_employees = 0
+            for org_name, course_count, employee_count in overview:
+                print(f"  - {org_name}: {course_count} assigned courses, {employee_count} employees")
+                total_employees += employee_count
+
+            # Set-based delete of stale assignments and insert of missing ones
+            removed_count, added_count = sync_employee_courses_with_organizations()
+
             db.session.commit()
-            print(f"\n✅ Successfully updated {total_employees_updated} employees")
+            print(f"\n✅ Successfully synced {total_employees} employees "
+                  f"({added_count} assignments added, {removed_count} removed)")
             print("Employee courses are now synced with organization assignments!")
             
         except Exception as e:
@@ -0,0 +1,168 @@
+"""
+JWT revocation list.
+
+Revocations are stored in the revoked_token table and mirrored in memory by
+every worker, so checking a token is a set lookup (by jti) and a dict lookup
+(by user cut-off) instead of a database round trip. Two kinds of entries exist:
+
+    jti            one revoked token (logout)
+    revoked_before every token of a user issued before that time
+                   (password change or reset)
+
+Each worker loads the table once and then applies new rows incrementally
+(rows with an id above the last one seen) at most every
+TOKEN_REVOCATION_REFRESH_SECONDS, so a revocation made by another worker takes
+effect within that interval. Revocations made by this worker apply as soon as
+their transaction commits. Rows whose tokens have all expired are pruned by a
+background thread.
+
+Refreshing and pruning use their own connections, never the request's
+session, so they cannot commit or abort the request's transaction.
+
+Configuration (environment variables):
+    TOKEN_REVOCATION_REFRESH_SECONDS   incremental refresh interval (default 5)
+    TOKEN_REVOCATION_PRUNE_SECONDS     interval between pruning runs (default 3600)
+"""
+
+import datetime
+import os
+import threading
+import time
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from models import db, RevokedToken
+
+
+def _timestamp(value):
+    return value.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+class RevocationList:
+    """In-memory mirror of the revoked_token table."""
+
+    def __init__(self, refresh_seconds=5, prune_seconds=3600):
+        self.refresh_seconds = refresh_seconds
+        self.prune_seconds = prune_seconds
+        self._jtis = {}  # jti -> expiry timestamp
+        self._user_cutoffs = {}  # user_id -> (cutoff timestamp, expiry timestamp)
+        self._last_id = 0
+        self._loaded = False
+        self._next_refresh = 0.0
+        self._next_prune = time.monotonic() + prune_seconds
+        self._lock = threading.Lock()
+
+    def is_revoked(self, payload):
+        """True if the decoded token payload has been revoked."""
+        self._maybe_refresh()
+        jti = payload.get('jti')
+        if jti is not None and jti in self._jtis:
+            return True
+        cutoff = self._user_cutoffs.get(payload.get('user_id'))
+        # iat has one-second resolution, so compare against the whole second of the cut-off
+        return cutoff is not None and payload.get('iat', 0) < int(cutoff[0])
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return
+        # Only one thread refreshes; the others keep using the current list unless nothing is loaded yet
+        if not self._lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            self._next_refresh = now + self.refresh_seconds
+            if now >= self._next_prune:
+                self._next_prune = now + self.prune_seconds
+                threading.Thread(target=self._prune, args=(current_app._get_current_object(),),
+                                 name='token-revocation-prune', daemon=True).start()
+            self._load_new_rows()
+        except Exception as e:
+            # Keep serving the current list; the next refresh retries
+            print(f"Token revocation refresh failed: {e}")
+        finally:
+            self._lock.release()
+
+    def _load_new_rows(self):
+        table = RevokedToken.__table__
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                select(table.c.id, table.c.jti, table.c.user_id, table.c.revoked_before, table.c.expires_at)
+                .where(table.c.id > self._last_id).order_by(table.c.id)
+            ).all()
+        for row in rows:
+            self._apply(row.jti, row.user_id, row.revoked_before, row.expires_at)
+            self._last_id = row.id
+        self._loaded = True
+
+    def _apply(self, jti, user_id, revoked_before, expires_at):
+        expires = _timestamp(expires_at)
+        if jti:
+            self._jtis[jti] = expires
+        if user_id is not None and revoked_before is not None:
+            cutoff = _timestamp(revoked_before)
+            current = self._user_cutoffs.get(user_id)
+            if current is None or cutoff > current[0]:
+                self._user_cutoffs[user_id] = (cutoff, expires)
+
+    def _prune(self, app):
+        now = datetime.datetime.utcnow()
+        try:
+            with app.app_context(), db.engine.begin() as connection:
+                connection.execute(RevokedToken.__table__.delete().where(RevokedToken.expires_at < now))
+        except Exception as e:
+            print(f"Token revocation prune failed: {e}")
+        cutoff = _timestamp(now)
+        with self._lock:
+            self._jtis = {jti: expires for jti, expires in self._jtis.items() if expires >= cutoff}
+            self._user_cutoffs = {user_id: entry for user_id, entry in self._user_cutoffs.items() if entry[1] >= cutoff}
+
+    def apply_committed(self, rows):
+        """Apply revocations committed by this worker without waiting for the next refresh."""
+        with self._lock:
+            for jti, user_id, revoked_before, expires_at in rows:
+                self._apply(jti, user_id, revoked_before, expires_at)
+
+
+revocation_list = RevocationList(
+    refresh_seconds=float(os.getenv('TOKEN_REVOCATION_REFRESH_SECONDS', 5)),
+    prune_seconds=float(os.getenv('TOKEN_REVOCATION_PRUNE_SECONDS', 3600))
+)
+
+
+def _queue(session, jti, user_id, revoked_before, expires_at, reason):
+    session.add(RevokedToken(jti=jti, user_id=user_id, revoked_before=revoked_before,
+                             expires_at=expires_at, reason=reason))
+    session.info.setdefault('token_revocations_pending', []).append((jti, user_id, revoked_before, expires_at))
+
+
+def revoke_token(payload, reason='logout'):
+    """Revoke one decoded token by its jti. Takes effect when the session commits."""
+    jti = payload.get('jti')
+    if not jti:
+        # Tokens issued before jti existed can only be revoked per user
+        return False
+    expires_at = datetime.datetime.utcfromtimestamp(payload['exp'])
+    _queue(db.session, jti, payload.get('user_id'), None, expires_at, reason)
+    return True
+
+
+def revoke_user_tokens(user_id, max_token_lifetime, reason='password_change'):
+    """Revoke every token of a user issued until now. Takes effect when the session commits.
+
+    max_token_lifetime is the longest lifetime of any token (the refresh token),
+    after which the row is no longer needed.
+    """
+    now = datetime.datetime.utcnow()
+    _queue(db.session, None, user_id, now, now + max_token_lifetime, reason)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_committed_revocations(session):
+    pending = session.info.pop('token_revocations_pending', None)
+    if pending:
+        revocation_list.apply_committed(pending)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_revocations(session):
+    session.info.pop('token_revocations_pending', None)
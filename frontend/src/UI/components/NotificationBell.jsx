@@ -17,15 +17,58 @@ const NotificationBell = () => {
 
         fetchUnreadCount();
 
-        // Poll for new notifications every 30 seconds
-        const interval = setInterval(() => {
-            const currentToken = getToken();
-            if (currentToken) {
-                fetchUnreadCount();
+        // Poll for new notifications every 30 seconds (fallback when the live stream is unavailable)
+        let interval = null;
+        const startPolling = () => {
+            if (interval) {
+                return;
             }
-        }, 30000);
+            interval = setInterval(() => {
+                const currentToken = getToken();
+                if (currentToken) {
+                    fetchUnreadCount();
+                }
+            }, 30000);
+        };
 
-        return () => clearInterval(interval);
+        // Live unread count updates pushed by the server
+        let stream = null;
+        if (typeof window.EventSource !== 'undefined') {
+            stream = new EventSource(`/api/notifications/stream?access_token=${encodeURIComponent(token)}`);
+            stream.addEventListener('unread_count', (event) => {
+                const data = JSON.parse(event.data);
+                if (typeof data.unread_count === 'number') {
+                    setUnreadCount(data.unread_count);
+                } else {
+                    setUnreadCount((count) => Math.max(0, count + data.delta));
+                }
+            });
+            stream.addEventListener('notification', (event) => {
+                const data = JSON.parse(event.data);
+                setUnreadCount((count) => count + data.unread_delta);
+            });
+            stream.addEventListener('notification_deleted', (event) => {
+                const data = JSON.parse(event.data);
+                setUnreadCount((count) => Math.max(0, count + data.unread_delta));
+            });
+            stream.onerror = () => {
+                // The browser retries dropped connections; a rejected one (e.g. expired token) is closed
+                if (stream.readyState === window.EventSource.CLOSED) {
+                    startPolling();
+                }
+            };
+        } else {
+            startPolling();
+        }
+
+        return () => {
+            if (stream) {
+                stream.close();
+            }
+            if (interval) {
+                clearInterval(interval);
+            }
+        };
     }, []);
 
     const fetchUnreadCount = async () => {